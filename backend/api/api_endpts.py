@@ -1,10 +1,19 @@
-from flask import Blueprint, request, jsonify
-from config import supabase
+from functools import wraps
+from flask import Blueprint, Response, request, jsonify, make_response, g
+from supabase import AuthApiError
+from config import supabase, AUTH_REQUIRED
 from services.stock import StockManager
 from services.sales import SalesManager
 from services.stitching import StitchingManager
 from services.billing import BillingManager
 from services.home import HomeAnalytics
+from services.customers import CustomerManager
+from services.cache import record_cache
+from services.columnar import encode_export
+from services.pagination import prime
+from services.etags import collection_etag, row_version, row_etag
+from services.search import list_query
+from services.auth import AuthError, token_verifier, bearer_token
 from flask_cors import cross_origin
 
 # Create Blueprint
@@ -15,18 +24,121 @@ billing_bp = Blueprint('billing', __name__)
 home_bp = Blueprint('home', __name__)
 auth_bp = Blueprint('auth', __name__)
 
+def require_auth(blueprint):
+    """Reject requests to `blueprint` without a valid access token, verified locally."""
+    @blueprint.before_request
+    def authenticate():
+        # CORS preflights carry no credentials
+        if not AUTH_REQUIRED or request.method == 'OPTIONS':
+            return None
+        try:
+            g.user = token_verifier.verify(bearer_token(request.headers.get('Authorization')))
+        except AuthError as e:
+            return jsonify({'error': str(e)}), 401
+    return blueprint
+
+# Every blueprint except auth needs a logged-in user
+for blueprint in (stock_bp, sales_bp, stitching_bp, billing_bp, home_bp):
+    require_auth(blueprint)
+
 # Initialize Services
 stock_manager = StockManager()
 sales_manager = SalesManager()
 stitching_manager = StitchingManager()
 billing_manager = BillingManager()
 home_analytics = HomeAnalytics()
+customer_manager = CustomerManager()
 
 """ 
     ALL THESE API ENDPOINTS DONT REQUIRE BASE URL ------- THEY JUST REQUIRE PARAMETERS ,i.e ID
     BASE URL IS DEFINED IN main.py
     """
 
+def bulk_response(result, noun):
+    """Build the response for a bulk create, 400 when no row was inserted."""
+    status = 201 if result['items'] or not result['errors'] else 400
+    return jsonify({
+        'message': f"{len(result['items'])} {noun} created, {len(result['errors'])} failed",
+        'data': result['items'],
+        'errors': result['errors']
+    }), status
+
+def export_route(export, filename, **filters):
+    """Serve a manager export as NDJSON, CSV or Parquet (?format=), 400 for bad parameters."""
+    try:
+        export_format = request.args.get('format', 'ndjson')
+        pages = export(request.args.get('page_size'), **filters)
+        chunks, content_type = encode_export(pages, export_format, filename)
+        return Response(prime(chunks), mimetype=content_type, headers={
+            'Content-Disposition': f'attachment; filename={filename}.{export_format}'
+        })
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+def tagged(response, etag):
+    """Attach a weak ETag that browsers must revalidate before reusing the response."""
+    response.set_etag(etag, weak=True)
+    response.headers['Cache-Control'] = 'private, no-cache'
+    return response
+
+def conditional(etag_for):
+    """
+    Serve a GET route with an ETag computed by etag_for(**view_args).
+
+    When If-None-Match already holds the current ETag, answer 304 without
+    running the view, so the page is neither fetched nor serialized. Without
+    an ETag (a missing row, or the lookup failed) the view answers as usual.
+    """
+    def decorate(view):
+        @wraps(view)
+        def wrapper(**kwargs):
+            try:
+                etag = etag_for(**kwargs)
+            except Exception:
+                etag = None
+            if etag is None:
+                return view(**kwargs)
+            if request.if_none_match.contains_weak(etag):
+                return tagged(Response(status=304), etag)
+            response = make_response(view(**kwargs))
+            if response.status_code != 200:
+                return response
+            return tagged(response, etag)
+        return wrapper
+    return decorate
+
+def conditional_row(table):
+    """
+    Serve a by-id GET route of `table` with the ETag of the row it returns.
+
+    The row's updated_at is read from the database first: a matching
+    If-None-Match is answered 304 without running the view, and a cached copy
+    of another version is dropped so the view loads the current one. The ETag
+    sent is built from the row in the body, so it never labels a stale body.
+    """
+    def decorate(view):
+        @wraps(view)
+        def wrapper(**kwargs):
+            record_id = next(iter(kwargs.values()))
+            try:
+                version = row_version(table, record_id)
+            except Exception:
+                version = None
+            if version is not None:
+                etag = row_etag(table, record_id, version)
+                if request.if_none_match.contains_weak(etag):
+                    return tagged(Response(status=304), etag)
+                record_cache.drop_stale(table, record_id, version)
+            response = make_response(view(**kwargs))
+            row = (response.get_json(silent=True) or {}).get('data') if response.status_code == 200 else None
+            if not isinstance(row, dict) or row.get('updated_at') is None:
+                return response
+            return tagged(response, row_etag(table, record_id, row['updated_at']))
+        return wrapper
+    return decorate
+
 # Create Stock Item
 @stock_bp.route('/', methods=['POST'])
 def create_stock():
@@ -44,20 +156,60 @@ def create_stock():
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+# Bulk Create Stock Items
+@stock_bp.route('/bulk', methods=['POST'])
+def create_stock_bulk():
+    try:
+        data = request.get_json()
+        result = stock_manager.create_stock_items(data)
+        return bulk_response(result, 'stock items')
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
 # Get All Stock Items
 @stock_bp.route('/', methods=['GET'])
+@conditional(lambda: collection_etag('stock', request.query_string))
 def get_all_stock():
     try:
-        result = stock_manager.get_all_stock()
+        result = stock_manager.get_all_stock(request.args.get('cursor'), request.args.get('limit'))
         return jsonify({
             'message': 'Stock items retrieved successfully',
+            'data': result['items'],
+            'next_cursor': result['next_cursor']
+        }), 200
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+# Get Stock Changes Since a Cursor or Timestamp
+@stock_bp.route('/changes', methods=['GET'])
+def get_stock_changes():
+    try:
+        result = stock_manager.get_stock_changes(
+            request.args.get('cursor'),
+            request.args.get('since'),
+            request.args.get('limit')
+        )
+        return jsonify({
+            'message': 'Stock changes retrieved successfully',
             'data': result
         }), 200
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+# Export All Stock Items
+@stock_bp.route('/export', methods=['GET'])
+def export_stock():
+    return export_route(stock_manager.export_stock, 'stock')
+
 # Get Stock Item by ID
 @stock_bp.route('/<item_id>', methods=['GET'])
+@conditional_row('stock')
 def get_stock_by_id(item_id):
     try:
         result = stock_manager.get_stock_by_id(item_id)
@@ -87,6 +239,36 @@ def update_stock(item_id):
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+# Reserve Stock Units (atomic, safe for concurrent sales)
+@stock_bp.route('/<item_id>/reserve', methods=['POST'])
+def reserve_stock(item_id):
+    try:
+        data = request.get_json(silent=True) or {}
+        result = stock_manager.reserve_stock(item_id, data.get('quantity', 1))
+        return jsonify({
+            'message': 'Stock reserved successfully',
+            'data': result
+        }), 200
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+# Release Reserved Stock Units
+@stock_bp.route('/<item_id>/release', methods=['POST'])
+def release_stock(item_id):
+    try:
+        data = request.get_json(silent=True) or {}
+        result = stock_manager.release_stock(item_id, data.get('quantity', 1))
+        return jsonify({
+            'message': 'Stock released successfully',
+            'data': result
+        }), 200
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
 # Delete Stock Item
 @stock_bp.route('/<item_id>', methods=['DELETE'])
 def delete_stock(item_id):
@@ -125,20 +307,68 @@ def create_sale():
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+# Bulk Create Sales Records
+@sales_bp.route('bulk', methods=['POST'])
+def create_sales_bulk():
+    try:
+        data = request.get_json()
+        result = sales_manager.create_sales(data)
+        return bulk_response(result, 'sales records')
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
 # Get All Sales
 @sales_bp.route('', methods=['GET'])
+@conditional(lambda: collection_etag('sales', request.query_string))
 def get_all_sales():
     try:
-        result = sales_manager.get_all_sales()
+        result = sales_manager.get_all_sales(
+            request.args.get('cursor'),
+            request.args.get('limit'),
+            **list_query('sales', request.args)
+        )
         return jsonify({
             'message': 'Sales records retrieved successfully',
+            'data': result['items'],
+            'next_cursor': result['next_cursor']
+        }), 200
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+# Get Sales Changes Since a Cursor or Timestamp
+@sales_bp.route('changes', methods=['GET'])
+def get_sales_changes():
+    try:
+        result = sales_manager.get_sales_changes(
+            request.args.get('cursor'),
+            request.args.get('since'),
+            request.args.get('limit')
+        )
+        return jsonify({
+            'message': 'Sales changes retrieved successfully',
             'data': result
         }), 200
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+# Export All Sales
+@sales_bp.route('export', methods=['GET'])
+def export_sales():
+    return export_route(
+        sales_manager.export_sales, 'sales',
+        start_date=request.args.get('start_date'),
+        end_date=request.args.get('end_date')
+    )
+
 # Get Sale by ID
 @sales_bp.route('<sale_id>', methods=['GET'])
+@conditional_row('sales')
 def get_sale_by_id(sale_id):
     try:
         result = sales_manager.get_sale_by_id(sale_id)
@@ -162,11 +392,12 @@ def update_sale(sale_id):
         # Try converting the ID to an integer if needed
         # Some databases require numeric IDs
         try:
-            numeric_id = int(sale_id)
-            result = sales_manager.update_sale(numeric_id, data)
+            sale_id = int(sale_id)
         except ValueError:
             # If conversion fails, use the original ID
-            result = sales_manager.update_sale(sale_id, data)
+            pass
+
+        result = sales_manager.update_sale(sale_id, data)
             
         return jsonify({
             'message': 'Sale record updated successfully',
@@ -217,20 +448,64 @@ def create_stitching():
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+# Bulk Create Stitching Records
+@stitching_bp.route('bulk', methods=['POST'])
+def create_stitching_bulk():
+    try:
+        data = request.get_json()
+        result = stitching_manager.create_stitching_records(data)
+        return bulk_response(result, 'stitching records')
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
 # Get All Stitching Records
 @stitching_bp.route('/', methods=['GET'])
+@conditional(lambda: collection_etag('stitching', request.query_string))
 def get_all_stitching():
     try:
-        result = stitching_manager.get_all_stitching_records()
+        result = stitching_manager.get_all_stitching_records(
+            request.args.get('cursor'),
+            request.args.get('limit'),
+            **list_query('stitching', request.args)
+        )
         return jsonify({
             'message': 'Stitching records retrieved successfully',
+            'data': result['items'],
+            'next_cursor': result['next_cursor']
+        }), 200
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+# Get Stitching Changes Since a Cursor or Timestamp
+@stitching_bp.route('changes', methods=['GET'])
+def get_stitching_changes():
+    try:
+        result = stitching_manager.get_stitching_changes(
+            request.args.get('cursor'),
+            request.args.get('since'),
+            request.args.get('limit')
+        )
+        return jsonify({
+            'message': 'Stitching changes retrieved successfully',
             'data': result
         }), 200
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+# Export All Stitching Records
+@stitching_bp.route('export', methods=['GET'])
+def export_stitching():
+    return export_route(stitching_manager.export_stitching_records, 'stitching')
+
 # Get Stitching Record by ID
 @stitching_bp.route('<stitching_id>', methods=['GET'])
+@conditional_row('stitching')
 def get_stitching_by_id(stitching_id):
     try:
         result = stitching_manager.get_stitching_record_by_id(stitching_id)
@@ -289,20 +564,66 @@ def create_bill():
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+# Create Bills for many items
+@billing_bp.route('/batch', methods=['POST'])
+def create_bills():
+    try:
+        data = request.get_json(silent=True)
+        if not isinstance(data, dict):
+            return jsonify({'error': 'Request body must be a JSON object with an item_ids list'}), 400
+        result = billing_manager.create_bills(data.get('item_ids'))
+        return bulk_response(result, 'bills')
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
 # Get All Bills
 @billing_bp.route('/', methods=['GET'])
+@conditional(lambda: collection_etag('billing', request.query_string))
 def get_all_bills():
     try:
-        result = billing_manager.get_all_bills()
+        result = billing_manager.get_all_bills(request.args.get('cursor'), request.args.get('limit'))
         return jsonify({
             'message': 'Billing records retrieved successfully',
+            'data': result['items'],
+            'next_cursor': result['next_cursor']
+        }), 200
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+# Get Billing Changes Since a Cursor or Timestamp
+@billing_bp.route('/changes', methods=['GET'])
+def get_bill_changes():
+    try:
+        result = billing_manager.get_bill_changes(
+            request.args.get('cursor'),
+            request.args.get('since'),
+            request.args.get('limit')
+        )
+        return jsonify({
+            'message': 'Billing changes retrieved successfully',
             'data': result
         }), 200
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+# Export All Bills
+@billing_bp.route('/export', methods=['GET'])
+def export_bills():
+    return export_route(
+        billing_manager.export_bills, 'billing',
+        start_date=request.args.get('start_date'),
+        end_date=request.args.get('end_date')
+    )
+
 # Get Bill by ID
 @billing_bp.route('/<bill_id>', methods=['GET'])
+@conditional_row('billing')
 def get_bill_by_id(bill_id):
     try:
         result = billing_manager.get_bill_by_id(bill_id)
@@ -367,6 +688,63 @@ def get_monthly_sales():
         }), 200
     except Exception as e:
         return jsonify({'error': str(e)}), 500
+
+# Get Sales Rollup by Day, Week or Month
+@home_bp.route('/sales-rollup', methods=['GET'])
+def get_sales_rollup():
+    try:
+        result = home_analytics.get_sales_rollup(
+            request.args.get('granularity', 'month'),
+            request.args.get('start_date'),
+            request.args.get('end_date')
+        )
+        return jsonify({
+            'message': 'Sales rollup retrieved successfully',
+            'data': result
+        }), 200
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+# Get Stock Report (margin, aging, unsold value, low stock)
+@home_bp.route('/stock-report', methods=['GET'])
+def get_stock_report():
+    try:
+        result = home_analytics.get_stock_report(
+            request.args.get('low_stock'),
+            request.args.get('limit')
+        )
+        return jsonify({
+            'message': 'Stock report retrieved successfully',
+            'data': result
+        }), 200
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+# Get Customer Ledger
+@home_bp.route('/customer-ledger', methods=['GET'])
+def get_customer_ledger():
+    try:
+        result = customer_manager.get_customer_ledger(request.args.get('cust_name'))
+        return jsonify({
+            'message': 'Customer ledger retrieved successfully',
+            'data': result
+        }), 200
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 404
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+# Get Record Cache Statistics
+@home_bp.route('/cache-stats', methods=['GET'])
+def get_cache_stats():
+    return jsonify({
+        'message': 'Cache statistics retrieved successfully',
+        'data': record_cache.stats()
+    }), 200
     
     
 # login 
@@ -408,3 +786,35 @@ def login():
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
+@auth_bp.route('/refresh', methods=['POST'])
+def refresh():
+    """Exchange a refresh token for a new Supabase session."""
+    try:
+        data = request.get_json(silent=True)
+        refresh_token = data.get("refresh_token") if isinstance(data, dict) else None
+
+        if not refresh_token:
+            return jsonify({"error": "refresh_token is required"}), 400
+
+        response = supabase.auth.refresh_session(refresh_token)
+
+        if response.session is None or response.user is None:
+            return jsonify({"error": "Session expired"}), 401
+
+        return jsonify({
+            "message": "Session refreshed",
+            "session": {
+                "access_token": response.session.access_token,
+                "refresh_token": response.session.refresh_token
+            },
+            "user": {
+                "id": response.user.id,
+                "email": response.user.email
+            }
+        }), 200
+
+    except AuthApiError as e:
+        return jsonify({"error": str(e)}), 401
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
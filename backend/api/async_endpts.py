@@ -0,0 +1,502 @@
+import contextvars
+from functools import wraps
+from quart import Blueprint, Response, request, jsonify, make_response, g
+from supabase import AuthApiError
+from config import supabase, AUTH_REQUIRED
+from services.aio import (
+    run_blocking, AsyncStockManager, AsyncSalesManager,
+    AsyncStitchingManager, AsyncBillingManager, AsyncHomeAnalytics, AsyncCustomerManager
+)
+from services.cache import record_cache
+from services.columnar import encode_export
+from services.pagination import prime
+from services.etags import collection_etag, row_version, row_etag
+from services.search import list_query
+from services.auth import AuthError, token_verifier, bearer_token
+
+# Async (Quart) mirror of api_endpts.py, served by asgi.py.
+# Routes and response formats must stay identical to the Flask blueprints.
+stock_bp = Blueprint('stock', __name__)
+sales_bp = Blueprint('sales', __name__)
+stitching_bp = Blueprint('stitching', __name__)
+billing_bp = Blueprint('billing', __name__)
+home_bp = Blueprint('home', __name__)
+auth_bp = Blueprint('auth', __name__)
+
+def require_auth(blueprint):
+    """Reject requests to `blueprint` without a valid access token, verified locally."""
+    @blueprint.before_request
+    async def authenticate():
+        if not AUTH_REQUIRED or request.method == 'OPTIONS':
+            return None
+        try:
+            token = bearer_token(request.headers.get('Authorization'))
+            # Known tokens are checked inline, new ones may need the JWKS fetched
+            g.user = token_verifier.cached(token) or await run_blocking(token_verifier.verify, token)
+        except AuthError as e:
+            return jsonify({'error': str(e)}), 401
+    return blueprint
+
+for blueprint in (stock_bp, sales_bp, stitching_bp, billing_bp, home_bp):
+    require_auth(blueprint)
+
+# Initialize Services
+stock_manager = AsyncStockManager()
+sales_manager = AsyncSalesManager()
+stitching_manager = AsyncStitchingManager()
+billing_manager = AsyncBillingManager()
+home_analytics = AsyncHomeAnalytics()
+customer_manager = AsyncCustomerManager()
+
+def tagged(response, etag):
+    """Attach a weak ETag that browsers must revalidate before reusing the response."""
+    response.set_etag(etag, weak=True)
+    response.headers['Cache-Control'] = 'private, no-cache'
+    return response
+
+def conditional(etag_for):
+    """Serve a GET route with an ETag, 304 without running the view when it matches If-None-Match."""
+    def decorate(view):
+        @wraps(view)
+        async def wrapper(**kwargs):
+            try:
+                # The lookup queries the database, so it runs on the I/O pool with the request context
+                etag = await run_blocking(contextvars.copy_context().run, etag_for, **kwargs)
+            except Exception:
+                etag = None
+            if etag is None:
+                return await view(**kwargs)
+            if request.if_none_match.contains_weak(etag):
+                return tagged(Response('', status=304), etag)
+            response = await make_response(await view(**kwargs))
+            if response.status_code != 200:
+                return response
+            return tagged(response, etag)
+        return wrapper
+    return decorate
+
+def conditional_row(table):
+    """Serve a by-id GET route with the ETag of the row it returns, see api_endpts.conditional_row."""
+    def decorate(view):
+        @wraps(view)
+        async def wrapper(**kwargs):
+            record_id = next(iter(kwargs.values()))
+            try:
+                version = await run_blocking(row_version, table, record_id)
+            except Exception:
+                version = None
+            if version is not None:
+                etag = row_etag(table, record_id, version)
+                if request.if_none_match.contains_weak(etag):
+                    return tagged(Response('', status=304), etag)
+                record_cache.drop_stale(table, record_id, version)
+            response = await make_response(await view(**kwargs))
+            row = ((await response.get_json(silent=True)) or {}).get('data') if response.status_code == 200 else None
+            if not isinstance(row, dict) or row.get('updated_at') is None:
+                return response
+            return tagged(response, row_etag(table, record_id, row['updated_at']))
+        return wrapper
+    return decorate
+
+async def respond(call, message, status=200, value_error_status=404):
+    """Await a manager call and wrap its result in the standard response."""
+    try:
+        result = await call
+        return jsonify({
+            'message': message,
+            'data': result
+        }), status
+    except ValueError as e:
+        return jsonify({'error': str(e)}), value_error_status
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+async def respond_page(call, message):
+    """Await a paginated manager call and wrap the page in the list response."""
+    try:
+        result = await call
+        return jsonify({
+            'message': message,
+            'data': result['items'],
+            'next_cursor': result['next_cursor']
+        }), 200
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+async def respond_bulk(call, noun):
+    """Await a bulk manager call, 400 when no row was inserted."""
+    try:
+        result = await call
+        status = 201 if result['items'] or not result['errors'] else 400
+        return jsonify({
+            'message': f"{len(result['items'])} {noun} created, {len(result['errors'])} failed",
+            'data': result['items'],
+            'errors': result['errors']
+        }), status
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+async def respond_export(export, filename, **filters):
+    """Stream a manager export as NDJSON, CSV or Parquet without blocking the event loop."""
+    try:
+        export_format = request.args.get('format', 'ndjson')
+        pages = export(request.args.get('page_size'), **filters)
+        chunks, content_type = encode_export(pages, export_format, filename)
+        # The first page is fetched before the response starts, so its errors get a status
+        chunks = await run_blocking(prime, chunks)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+    async def generate():
+        while True:
+            chunk = await run_blocking(next, chunks, None)
+            if chunk is None:
+                return
+            yield chunk
+    return Response(generate(), mimetype=content_type, headers={
+        'Content-Disposition': f'attachment; filename={filename}.{export_format}'
+    })
+
+# Stock Endpoints
+@stock_bp.route('/', methods=['POST'])
+async def create_stock():
+    data = await request.get_json()
+    return await respond(stock_manager.create_stock_item(data), 'Stock item created successfully', 201, 400)
+
+@stock_bp.route('/bulk', methods=['POST'])
+async def create_stock_bulk():
+    data = await request.get_json()
+    return await respond_bulk(stock_manager.create_stock_items(data), 'stock items')
+
+@stock_bp.route('/', methods=['GET'])
+@conditional(lambda: collection_etag('stock', request.query_string))
+async def get_all_stock():
+    return await respond_page(
+        stock_manager.get_all_stock(request.args.get('cursor'), request.args.get('limit')),
+        'Stock items retrieved successfully'
+    )
+
+@stock_bp.route('/changes', methods=['GET'])
+async def get_stock_changes():
+    return await respond(
+        stock_manager.get_stock_changes(request.args.get('cursor'), request.args.get('since'), request.args.get('limit')),
+        'Stock changes retrieved successfully',
+        value_error_status=400
+    )
+
+@stock_bp.route('/export', methods=['GET'])
+async def export_stock():
+    return await respond_export(stock_manager.manager.export_stock, 'stock')
+
+@stock_bp.route('/<item_id>', methods=['GET'])
+@conditional_row('stock')
+async def get_stock_by_id(item_id):
+    return await respond(stock_manager.get_stock_by_id(item_id), 'Stock item retrieved successfully')
+
+@stock_bp.route('/<item_id>', methods=['PUT'])
+async def update_stock(item_id):
+    data = await request.get_json()
+    return await respond(stock_manager.update_stock_item(item_id, data), 'Stock item updated successfully')
+
+@stock_bp.route('/<item_id>/reserve', methods=['POST'])
+async def reserve_stock(item_id):
+    data = await request.get_json(silent=True) or {}
+    return await respond(stock_manager.reserve_stock(item_id, data.get('quantity', 1)), 'Stock reserved successfully', 200, 400)
+
+@stock_bp.route('/<item_id>/release', methods=['POST'])
+async def release_stock(item_id):
+    data = await request.get_json(silent=True) or {}
+    return await respond(stock_manager.release_stock(item_id, data.get('quantity', 1)), 'Stock released successfully', 200, 400)
+
+@stock_bp.route('/<item_id>', methods=['DELETE'])
+async def delete_stock(item_id):
+    return await respond(stock_manager.delete_stock_item(item_id), 'Stock item deleted successfully')
+
+
+# Sales Endpoints
+@sales_bp.route('/', methods=['OPTIONS'])
+async def handle_sales_options():
+    return '', 204
+
+@sales_bp.route('', methods=['POST'])
+async def create_sale():
+    data = await request.get_json()
+    return await respond(sales_manager.create_sale(data), 'Sale created successfully', 201, 400)
+
+@sales_bp.route('bulk', methods=['POST'])
+async def create_sales_bulk():
+    data = await request.get_json()
+    return await respond_bulk(sales_manager.create_sales(data), 'sales records')
+
+@sales_bp.route('', methods=['GET'])
+@conditional(lambda: collection_etag('sales', request.query_string))
+async def get_all_sales():
+    try:
+        query = list_query('sales', request.args)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    return await respond_page(
+        sales_manager.get_all_sales(request.args.get('cursor'), request.args.get('limit'), **query),
+        'Sales records retrieved successfully'
+    )
+
+@sales_bp.route('changes', methods=['GET'])
+async def get_sales_changes():
+    return await respond(
+        sales_manager.get_sales_changes(request.args.get('cursor'), request.args.get('since'), request.args.get('limit')),
+        'Sales changes retrieved successfully',
+        value_error_status=400
+    )
+
+@sales_bp.route('export', methods=['GET'])
+async def export_sales():
+    return await respond_export(
+        sales_manager.manager.export_sales, 'sales',
+        start_date=request.args.get('start_date'),
+        end_date=request.args.get('end_date')
+    )
+
+@sales_bp.route('<sale_id>', methods=['GET'])
+@conditional_row('sales')
+async def get_sale_by_id(sale_id):
+    return await respond(sales_manager.get_sale_by_id(sale_id), 'Sale record retrieved successfully')
+
+@sales_bp.route('<sale_id>', methods=['PUT'])
+async def update_sale(sale_id):
+    data = await request.get_json()
+    # Some databases require numeric IDs
+    try:
+        sale_id = int(sale_id)
+    except ValueError:
+        pass
+    return await respond(sales_manager.update_sale(sale_id, data), 'Sale record updated successfully')
+
+@sales_bp.route('<sale_id>', methods=['DELETE'])
+async def delete_sale(sale_id):
+    return await respond(sales_manager.delete_sale(sale_id), 'Sale record deleted successfully')
+
+
+# Stitching Endpoints
+@stitching_bp.route('/', methods=['OPTIONS'])
+async def handle_stitching_options():
+    return '', 204
+
+@stitching_bp.route('', methods=['POST'])
+async def create_stitching():
+    data = await request.get_json()
+    return await respond(stitching_manager.create_stitching_record(data), 'Stitching record created successfully', 201, 400)
+
+@stitching_bp.route('bulk', methods=['POST'])
+async def create_stitching_bulk():
+    data = await request.get_json()
+    return await respond_bulk(stitching_manager.create_stitching_records(data), 'stitching records')
+
+@stitching_bp.route('/', methods=['GET'])
+@conditional(lambda: collection_etag('stitching', request.query_string))
+async def get_all_stitching():
+    try:
+        query = list_query('stitching', request.args)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    return await respond_page(
+        stitching_manager.get_all_stitching_records(request.args.get('cursor'), request.args.get('limit'), **query),
+        'Stitching records retrieved successfully'
+    )
+
+@stitching_bp.route('changes', methods=['GET'])
+async def get_stitching_changes():
+    return await respond(
+        stitching_manager.get_stitching_changes(request.args.get('cursor'), request.args.get('since'), request.args.get('limit')),
+        'Stitching changes retrieved successfully',
+        value_error_status=400
+    )
+
+@stitching_bp.route('export', methods=['GET'])
+async def export_stitching():
+    return await respond_export(stitching_manager.manager.export_stitching_records, 'stitching')
+
+@stitching_bp.route('<stitching_id>', methods=['GET'])
+@conditional_row('stitching')
+async def get_stitching_by_id(stitching_id):
+    return await respond(stitching_manager.get_stitching_record_by_id(stitching_id), 'Stitching record retrieved successfully')
+
+@stitching_bp.route('<stitching_id>', methods=['PUT'])
+async def update_stitching(stitching_id):
+    data = await request.get_json()
+    return await respond(stitching_manager.update_stitching_record(stitching_id, data), 'Stitching record updated successfully')
+
+@stitching_bp.route('<stitching_id>', methods=['DELETE'])
+async def delete_stitching(stitching_id):
+    return await respond(stitching_manager.delete_stitching_record(stitching_id), 'Stitching record deleted successfully')
+
+
+# Billing Endpoints
+@billing_bp.route('/', methods=['POST'])
+async def create_bill():
+    data = await request.get_json()
+    return await respond(billing_manager.create_bill(data), 'Bill created successfully', 201, 400)
+
+@billing_bp.route('/batch', methods=['POST'])
+async def create_bills():
+    data = await request.get_json(silent=True)
+    if not isinstance(data, dict):
+        return jsonify({'error': 'Request body must be a JSON object with an item_ids list'}), 400
+    return await respond_bulk(billing_manager.create_bills(data.get('item_ids')), 'bills')
+
+@billing_bp.route('/', methods=['GET'])
+@conditional(lambda: collection_etag('billing', request.query_string))
+async def get_all_bills():
+    return await respond_page(
+        billing_manager.get_all_bills(request.args.get('cursor'), request.args.get('limit')),
+        'Billing records retrieved successfully'
+    )
+
+@billing_bp.route('/changes', methods=['GET'])
+async def get_bill_changes():
+    return await respond(
+        billing_manager.get_bill_changes(request.args.get('cursor'), request.args.get('since'), request.args.get('limit')),
+        'Billing changes retrieved successfully',
+        value_error_status=400
+    )
+
+@billing_bp.route('/export', methods=['GET'])
+async def export_bills():
+    return await respond_export(
+        billing_manager.manager.export_bills, 'billing',
+        start_date=request.args.get('start_date'),
+        end_date=request.args.get('end_date')
+    )
+
+@billing_bp.route('/<bill_id>', methods=['GET'])
+@conditional_row('billing')
+async def get_bill_by_id(bill_id):
+    return await respond(billing_manager.get_bill_by_id(bill_id), 'Bill record retrieved successfully')
+
+@billing_bp.route('/<bill_id>', methods=['DELETE'])
+async def delete_bill(bill_id):
+    return await respond(billing_manager.delete_bill(bill_id), 'Bill record deleted successfully')
+
+
+# Home Analytics Endpoints
+@home_bp.route('/pending-orders', methods=['GET'])
+async def get_pending_orders():
+    return await respond(home_analytics.get_pending_orders(), 'Pending orders retrieved successfully', value_error_status=500)
+
+@home_bp.route('/summary', methods=['GET'])
+async def get_summary_metrics():
+    return await respond(home_analytics.get_summary_metrics(), 'Summary metrics retrieved successfully', value_error_status=500)
+
+@home_bp.route('/monthly-sales', methods=['GET'])
+async def get_monthly_sales():
+    return await respond(home_analytics.get_monthly_sales(), 'Monthly sales data retrieved successfully', value_error_status=500)
+
+@home_bp.route('/sales-rollup', methods=['GET'])
+async def get_sales_rollup():
+    return await respond(
+        home_analytics.get_sales_rollup(
+            request.args.get('granularity', 'month'),
+            request.args.get('start_date'),
+            request.args.get('end_date')
+        ),
+        'Sales rollup retrieved successfully',
+        value_error_status=400
+    )
+
+@home_bp.route('/stock-report', methods=['GET'])
+async def get_stock_report():
+    return await respond(
+        home_analytics.get_stock_report(request.args.get('low_stock'), request.args.get('limit')),
+        'Stock report retrieved successfully',
+        value_error_status=400
+    )
+
+@home_bp.route('/customer-ledger', methods=['GET'])
+async def get_customer_ledger():
+    return await respond(
+        customer_manager.get_customer_ledger(request.args.get('cust_name')),
+        'Customer ledger retrieved successfully'
+    )
+
+@home_bp.route('/cache-stats', methods=['GET'])
+async def get_cache_stats():
+    return jsonify({
+        'message': 'Cache statistics retrieved successfully',
+        'data': record_cache.stats()
+    }), 200
+
+
+# login
+@auth_bp.route('/login', methods=['OPTIONS'])
+async def handle_options():
+    return '', 204
+
+@auth_bp.route('/login', methods=['POST'])
+async def login():
+    """Authenticate user with Supabase."""
+    try:
+        data = await request.get_json()
+        email = data.get("email")
+        password = data.get("password")
+
+        if not email or not password:
+            return jsonify({"error": "Email and password are required"}), 400
+
+        response = await run_blocking(
+            supabase.auth.sign_in_with_password, {"email": email, "password": password}
+        )
+
+        if response.user is None:
+            return jsonify({"error": "Invalid credentials"}), 401
+
+        return jsonify({
+            "message": "Login successful",
+            "session": {
+                "access_token": response.session.access_token,
+                "refresh_token": response.session.refresh_token
+            },
+            "user": {
+                "id": response.user.id,
+                "email": response.user.email
+            }
+        }), 200
+
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+@auth_bp.route('/refresh', methods=['POST'])
+async def refresh():
+    """Exchange a refresh token for a new Supabase session."""
+    try:
+        data = await request.get_json(silent=True)
+        refresh_token = data.get("refresh_token") if isinstance(data, dict) else None
+
+        if not refresh_token:
+            return jsonify({"error": "refresh_token is required"}), 400
+
+        response = await run_blocking(supabase.auth.refresh_session, refresh_token)
+
+        if response.session is None or response.user is None:
+            return jsonify({"error": "Session expired"}), 401
+
+        return jsonify({
+            "message": "Session refreshed",
+            "session": {
+                "access_token": response.session.access_token,
+                "refresh_token": response.session.refresh_token
+            },
+            "user": {
+                "id": response.user.id,
+                "email": response.user.email
+            }
+        }), 200
+
+    except AuthApiError as e:
+        return jsonify({"error": str(e)}), 401
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
@@ -0,0 +1,90 @@
+"""
+Async (ASGI) entry point serving the same API as main.py.
+
+Run with an ASGI server, e.g.:
+    uvicorn asgi:app --host 0.0.0.0 --port 5000
+"""
+import time
+from quart import Quart, Response, g, request
+from quart.wrappers.response import DataBody
+from config import warm_up, check_connection
+from services.aio import run_blocking
+from services.auth import check_auth_config
+from services.metrics import observe_request, render_metrics
+from services.compression import compressed_body
+from quart_cors import cors
+from api.async_endpts import stock_bp, sales_bp, stitching_bp, billing_bp, home_bp, auth_bp
+
+app = Quart(__name__)
+
+app = cors(
+    app,
+    allow_origin="http://localhost:5173",
+    allow_methods=["GET", "POST", "PUT", "DELETE", "OPTIONS"],
+    allow_headers=["Content-Type", "Authorization"],
+    allow_credentials=True
+)
+
+# Same prefixes as main.py
+app.register_blueprint(stock_bp, url_prefix='/api/stock')
+app.register_blueprint(sales_bp, url_prefix='/api/sales')
+app.register_blueprint(stitching_bp, url_prefix='/api/stitching')
+app.register_blueprint(billing_bp, url_prefix='/api/billing')
+app.register_blueprint(home_bp, url_prefix='/api/analytics')
+app.register_blueprint(auth_bp, url_prefix='/api/auth')
+
+# Refuse to start without the settings to verify access tokens, the keys load in the background
+check_auth_config()
+
+@app.before_request
+async def start_request_timer():
+    g.request_started = time.perf_counter()
+
+@app.after_request
+async def compress(response):
+    # Streamed exports are sent as they are
+    if response.status_code != 200 or not isinstance(response.response, DataBody):
+        return response
+    if 'Content-Encoding' in response.headers:
+        return response
+    response.vary.add('Accept-Encoding')
+    body, encoding = await run_blocking(
+        compressed_body, await response.get_data(), response.mimetype, request.headers.get('Accept-Encoding')
+    )
+    if encoding:
+        response.set_data(body)
+        response.headers['Content-Encoding'] = encoding
+    return response
+
+@app.after_request
+async def record_request_metrics(response):
+    # Label by route pattern, not by URL, so ids don't create new series
+    route = request.url_rule.rule if request.url_rule else 'unmatched'
+    observe_request(request.method, route, response.status_code, g.request_started)
+    return response
+
+@app.before_serving
+async def start_warm_up():
+    # Connect to Supabase in the background, start-up does not wait for the database
+    warm_up()
+
+@app.route('/')
+async def home():
+    return {
+        "message": "Welcome to the Inventory and Sales Management API"
+    }
+
+@app.route('/health')
+async def health():
+    """Readiness check, 503 until Supabase answers a test query."""
+    status = await run_blocking(check_connection)
+    return {
+        "status": "ready" if status["ready"] else "unavailable",
+        "error": status["error"]
+    }, 200 if status["ready"] else 503
+
+@app.route('/metrics')
+async def metrics():
+    """Request and Supabase call metrics in the Prometheus text format."""
+    body, content_type = render_metrics()
+    return Response(body, content_type=content_type)
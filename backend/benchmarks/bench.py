@@ -0,0 +1,541 @@
+"""
+Benchmarks for every manager method and the main Flask routes, run against
+the in-memory Supabase stand-in (or the embedded SQLite engine with
+--engine sqlite), so no Supabase project is needed.
+
+    cd backend
+    python -m benchmarks.bench --size 1k --latency 0.02
+    python -m benchmarks.bench --size 100k --group sales --json results.json
+    python -m benchmarks.bench --compare results.json --threshold 0.2
+    python -m benchmarks.bench --engine sqlite --sqlite-path /tmp/bench.db
+
+Each benchmark reports its latency and the Supabase round trips it made per
+call, and the payload group the bytes each encoding produces. With
+--compare, the run fails when a benchmark's mean latency exceeds the
+baseline by more than the threshold.
+"""
+import os
+import sys
+import json
+import time
+import random
+import argparse
+import jwt
+import statistics
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, timedelta
+
+# The stand-ins commit every write at once, so the change feeds and ETags need no lag
+os.environ.setdefault('CHANGE_FEED_LAG', '0')
+
+from config import set_supabase_client
+from services.sqlite_engine import SQLiteEngine
+from services.search import list_query
+from benchmarks.fake_supabase import FakeSupabase
+from benchmarks.datagen import SIZES, seed, generate_stock, generate_sales, generate_stitching
+
+BENCHMARKS = []
+
+def benchmark(group, name, repeat=None):
+    """Register fn(ctx) as a benchmark; `repeat` overrides --iterations."""
+    def register(fn):
+        BENCHMARKS.append((group, name, repeat, fn))
+        return fn
+    return register
+
+class Context:
+    """Managers, Flask test client and id pickers shared by the benchmarks."""
+
+    def __init__(self, client, rows):
+        from services.auth import token_verifier
+        # Routes need an access token, signed with a local secret when none is configured
+        token_verifier.secret = token_verifier.secret or 'benchmark-secret-for-local-runs-only'
+        self.token_verifier = token_verifier
+        from main import app
+        from api import api_endpts
+        from services.cache import record_cache
+
+        self.client = client
+        self.rows = rows
+        self.http = app.test_client()
+        self.stock = api_endpts.stock_manager
+        self.sales = api_endpts.sales_manager
+        self.stitching = api_endpts.stitching_manager
+        self.billing = api_endpts.billing_manager
+        self.home = api_endpts.home_analytics
+        self.customers = api_endpts.customer_manager
+        self.record_cache = record_cache
+        self.rng = random.Random(7)
+        self.batch = 0
+        self.http.environ_base['HTTP_AUTHORIZATION'] = f"Bearer {self.access_token()}"
+        self.warm_ids = {}
+
+    def access_token(self, subject='benchmark'):
+        token_verifier = self.token_verifier
+        claims = {"sub": subject, "aud": token_verifier.audience, "exp": int(time.time()) + 3600}
+        if token_verifier.issuer:
+            claims["iss"] = token_verifier.issuer
+        return jwt.encode(claims, token_verifier.secret, algorithm='HS256')
+
+    def pick(self, table):
+        """A random id that currently exists in `table`."""
+        return self.client.random_id(table, self.rng)
+
+    def warm_id(self, table):
+        """The same existing id on every call, so its cache entry stays warm."""
+        if table not in self.warm_ids:
+            self.warm_ids[table] = self.pick(table)
+        return self.warm_ids[table]
+
+    def new_rows(self, generator, count, *args):
+        self.batch += 1
+        return list(generator(count, *args, seed=1000 + self.batch))
+
+    def clear_caches(self):
+        from services.events import notify_write
+        from services import stock_analytics
+        self.record_cache.clear()
+        for table in ('stock', 'sales', 'stitching', 'billing'):
+            notify_write(table, 'update', [])
+        # Synced from the change feed rather than write notifications
+        with stock_analytics._snapshot_lock:
+            stock_analytics._snapshot['table'] = None
+
+def consume(pages):
+    return sum(len(rows) for rows in pages)
+
+
+# Stock
+@benchmark('stock', 'create_stock_item')
+def bench_create_stock_item(ctx):
+    ctx.stock.create_stock_item(ctx.new_rows(generate_stock, 1)[0])
+
+@benchmark('stock', 'create_stock_items x100')
+def bench_create_stock_items(ctx):
+    ctx.stock.create_stock_items(ctx.new_rows(generate_stock, 100))
+
+@benchmark('stock', 'get_all_stock (first page)')
+def bench_get_all_stock(ctx):
+    ctx.stock.get_all_stock()
+
+@benchmark('stock', 'get_all_stock (last page)')
+def bench_get_all_stock_last(ctx):
+    ctx.stock.get_all_stock(cursor=ctx.client.max_id('stock') - 50)
+
+@benchmark('stock', 'export_stock', repeat=3)
+def bench_export_stock(ctx):
+    consume(ctx.stock.export_stock())
+
+@benchmark('stock', 'get_stock_by_id (cold)')
+def bench_get_stock_cold(ctx):
+    ctx.record_cache.clear()
+    ctx.stock.get_stock_by_id(ctx.pick('stock'))
+
+@benchmark('stock', 'get_stock_by_id (warm)')
+def bench_get_stock_warm(ctx):
+    ctx.stock.get_stock_by_id(ctx.warm_id('stock'))
+
+@benchmark('stock', 'update_stock_item')
+def bench_update_stock(ctx):
+    ctx.stock.update_stock_item(ctx.pick('stock'), {"quantity": ctx.rng.randint(0, 40)})
+
+@benchmark('stock', 'delete_stock_item')
+def bench_delete_stock(ctx):
+    ctx.stock.delete_stock_item(ctx.pick('stock'))
+
+def sell_concurrently(ctx, workers=8, sales_per_worker=4):
+    """Sell every unit of one new stock item from `workers` threads at once, failing on lost updates."""
+    units = workers * sales_per_worker
+    item = ctx.stock.create_stock_item({**ctx.new_rows(generate_stock, 1)[0], 'quantity': units, 'sold': False})
+    sales = ctx.new_rows(generate_sales, units)
+    for sale in sales:
+        sale.update(stitching=False, stock_item_id=item['item_id'])
+    with ThreadPoolExecutor(workers) as pool:
+        list(pool.map(ctx.sales.create_sale, sales))
+    left = ctx.client.table('stock').select('quantity').eq('item_id', item['item_id']).execute().data[0]
+    if left['quantity'] != 0:
+        raise AssertionError(f"{left['quantity']} of {units} units left after selling them all")
+
+@benchmark('stock', 'create_sale x32 from 8 threads, same item', repeat=5)
+def bench_contended_sales(ctx):
+    sell_concurrently(ctx)
+
+@benchmark('stock', 'create_sale x32 from 8 threads, same item (no SQL function)', repeat=5)
+def bench_contended_sales_optimistic(ctx):
+    function = ctx.client.functions.pop('reserve_stock')
+    try:
+        sell_concurrently(ctx)
+    finally:
+        ctx.client.functions['reserve_stock'] = function
+        type(ctx.stock).atomic_reserve = True
+
+
+# Sales
+@benchmark('sales', 'create_sale (with stitching)')
+def bench_create_sale(ctx):
+    sale = ctx.new_rows(generate_sales, 1)[0]
+    sale['stitching'] = True
+    ctx.sales.create_sale(sale)
+
+@benchmark('sales', 'create_sale (with stitching, no SQL function)')
+def bench_create_sale_two_step(ctx):
+    sale = ctx.new_rows(generate_sales, 1)[0]
+    sale['stitching'] = True
+    function = ctx.client.functions.pop('create_sale_with_stitching')
+    try:
+        ctx.sales.create_sale(sale)
+    finally:
+        ctx.client.functions['create_sale_with_stitching'] = function
+        type(ctx.sales).combined_create = True
+
+@benchmark('sales', 'create_sales x100')
+def bench_create_sales(ctx):
+    ctx.sales.create_sales(ctx.new_rows(generate_sales, 100))
+
+@benchmark('sales', 'get_all_sales (first page)')
+def bench_get_all_sales(ctx):
+    ctx.sales.get_all_sales()
+
+@benchmark('sales', 'get_all_sales (search, sorted by order_date)')
+def bench_search_sales(ctx):
+    ctx.sales.get_all_sales(**list_query('sales', {'search': 'Customer 12', 'sort': 'order_date', 'order': 'desc'}))
+
+@benchmark('sales', 'get_all_sales (mode + order_date range)')
+def bench_filter_sales(ctx):
+    ctx.sales.get_all_sales(**list_query('sales', {
+        'mode': 'upi', 'order_date_from': (date.today() - timedelta(days=30)).isoformat()
+    }))
+
+@benchmark('sales', 'export_sales', repeat=3)
+def bench_export_sales(ctx):
+    consume(ctx.sales.export_sales())
+
+@benchmark('sales', 'get_sale_by_id (cold)')
+def bench_get_sale_cold(ctx):
+    ctx.record_cache.clear()
+    ctx.sales.get_sale_by_id(ctx.pick('sales'))
+
+@benchmark('sales', 'get_sale_by_id (warm)')
+def bench_get_sale_warm(ctx):
+    ctx.sales.get_sale_by_id(ctx.warm_id('sales'))
+
+@benchmark('sales', 'update_sale')
+def bench_update_sale(ctx):
+    ctx.sales.update_sale(ctx.pick('sales'), {"mode": ctx.rng.choice(['cash', 'card', 'upi'])})
+
+@benchmark('sales', 'delete_sale')
+def bench_delete_sale(ctx):
+    ctx.sales.delete_sale(ctx.pick('sales'))
+
+
+# Stitching
+@benchmark('stitching', 'create_stitching_record')
+def bench_create_stitching(ctx):
+    record = ctx.new_rows(generate_stitching, 1, 0)[0]
+    record['item_id'] = ctx.pick('sales')
+    ctx.stitching.create_stitching_record(record)
+
+@benchmark('stitching', 'create_stitching_records x100')
+def bench_create_stitching_records(ctx):
+    records = ctx.new_rows(generate_stitching, 100, 0)
+    for record in records[:50]:
+        record['item_id'] = ctx.pick('sales')
+    ctx.stitching.create_stitching_records(records)
+
+@benchmark('stitching', 'get_all_stitching_records (first page)')
+def bench_get_all_stitching(ctx):
+    ctx.stitching.get_all_stitching_records()
+
+@benchmark('stitching', 'export_stitching_records', repeat=3)
+def bench_export_stitching(ctx):
+    consume(ctx.stitching.export_stitching_records())
+
+@benchmark('stitching', 'get_stitching_record_by_id (cold)')
+def bench_get_stitching_cold(ctx):
+    ctx.record_cache.clear()
+    ctx.stitching.get_stitching_record_by_id(ctx.pick('stitching'))
+
+@benchmark('stitching', 'update_stitching_record')
+def bench_update_stitching(ctx):
+    ctx.stitching.update_stitching_record(ctx.pick('stitching'), {"stitching_preference": "Slim fit"})
+
+@benchmark('stitching', 'delete_stitching_record')
+def bench_delete_stitching(ctx):
+    ctx.stitching.delete_stitching_record(ctx.pick('stitching'))
+
+
+# Billing
+@benchmark('billing', 'create_bill')
+def bench_create_bill(ctx):
+    ctx.billing.create_bill({"item_id": ctx.pick('sales')})
+
+@benchmark('billing', 'create_bills x50')
+def bench_create_bills(ctx):
+    ctx.billing.create_bills([ctx.pick('sales') for _ in range(50)])
+
+@benchmark('billing', 'get_all_bills (first page)')
+def bench_get_all_bills(ctx):
+    ctx.billing.get_all_bills()
+
+@benchmark('billing', 'export_bills', repeat=3)
+def bench_export_bills(ctx):
+    consume(ctx.billing.export_bills())
+
+@benchmark('billing', 'get_bill_by_id (cold)')
+def bench_get_bill_cold(ctx):
+    ctx.record_cache.clear()
+    ctx.billing.get_bill_by_id(ctx.pick('billing'))
+
+@benchmark('billing', 'delete_bill')
+def bench_delete_bill(ctx):
+    ctx.billing.delete_bill(ctx.pick('billing'))
+
+
+# Home analytics
+@benchmark('home', 'get_summary_metrics')
+def bench_summary(ctx):
+    ctx.home.get_summary_metrics()
+
+@benchmark('home', 'get_summary_metrics (no SQL function)', repeat=5)
+def bench_summary_fallback(ctx):
+    function = ctx.client.functions.pop('summary_metrics')
+    try:
+        ctx.home.get_summary_metrics()
+    finally:
+        ctx.client.functions['summary_metrics'] = function
+        type(ctx.home).summary_function = True
+
+@benchmark('home', 'get_stock_report (cold)', repeat=3)
+def bench_stock_report_cold(ctx):
+    ctx.clear_caches()
+    ctx.home.get_stock_report()
+
+@benchmark('home', 'get_stock_report (after a sale)', repeat=5)
+def bench_stock_report_after_write(ctx):
+    ctx.stock.reserve_stock(ctx.stock.create_stock_item({**ctx.new_rows(generate_stock, 1)[0], 'quantity': 1})['item_id'])
+    ctx.home.get_stock_report()
+
+@benchmark('home', 'get_pending_orders (cold)', repeat=5)
+def bench_pending_cold(ctx):
+    ctx.clear_caches()
+    ctx.home.get_pending_orders()
+
+@benchmark('home', 'get_pending_orders (warm)')
+def bench_pending_warm(ctx):
+    ctx.home.get_pending_orders()
+
+@benchmark('home', 'get_sales_rollup day x365 (cold)', repeat=5)
+def bench_sales_rollup_cold(ctx):
+    ctx.clear_caches()
+    ctx.home.get_sales_rollup('day', (date.today() - timedelta(days=364)).isoformat())
+
+@benchmark('home', 'get_sales_rollup day x365 (warm)')
+def bench_sales_rollup_warm(ctx):
+    ctx.home.get_sales_rollup('day', (date.today() - timedelta(days=364)).isoformat())
+
+@benchmark('home', 'get_customer_ledger')
+def bench_customer_ledger(ctx):
+    try:
+        ctx.customers.get_customer_ledger(f"Customer {ctx.rng.randint(1, 2000)}")
+    except ValueError:
+        pass  # customer without orders at small sizes, still a full lookup
+
+@benchmark('home', 'get_monthly_sales', repeat=5)
+def bench_monthly_sales(ctx):
+    ctx.home.get_monthly_sales()
+
+
+# Flask routes
+def get(ctx, url, headers=None, status=200):
+    response = ctx.http.get(url, headers=headers)
+    # Drain streamed bodies
+    response.get_data()
+    assert response.status_code == status, (url, response.status_code)
+    return response
+
+@benchmark('routes', 'GET /api/stock/')
+def bench_route_stock(ctx):
+    get(ctx, '/api/stock/')
+
+@benchmark('routes', 'GET /api/sales')
+def bench_route_sales(ctx):
+    get(ctx, '/api/sales')
+
+@benchmark('routes', 'GET /api/sales (If-None-Match, unchanged)')
+def bench_route_sales_not_modified(ctx):
+    from services.etags import collection_etag
+    get(ctx, '/api/sales', headers={'If-None-Match': f'W/"{collection_etag("sales")}"'}, status=304)
+
+@benchmark('routes', 'GET /api/stitching/')
+def bench_route_stitching(ctx):
+    get(ctx, '/api/stitching/')
+
+@benchmark('routes', 'GET /api/billing/')
+def bench_route_billing(ctx):
+    get(ctx, '/api/billing/')
+
+@benchmark('routes', 'GET /api/sales/<sale_id>')
+def bench_route_sale(ctx):
+    get(ctx, f"/api/sales/{ctx.pick('sales')}")
+
+@benchmark('routes', 'GET /api/analytics/summary')
+def bench_route_summary(ctx):
+    get(ctx, '/api/analytics/summary')
+
+@benchmark('routes', 'GET /api/analytics/pending-orders (cold)', repeat=5)
+def bench_route_pending(ctx):
+    ctx.clear_caches()
+    get(ctx, '/api/analytics/pending-orders')
+
+@benchmark('routes', 'GET /api/sales/export?format=csv', repeat=3)
+def bench_route_export_csv(ctx):
+    get(ctx, '/api/sales/export?format=csv')
+
+@benchmark('routes', 'POST /api/sales')
+def bench_route_create_sale(ctx):
+    response = ctx.http.post('/api/sales', json=ctx.new_rows(generate_sales, 1)[0])
+    assert response.status_code == 201, response.status_code
+
+
+
+# Payload encoding, on the pending-orders response (four full row sets)
+def pending_orders_body(ctx):
+    return {'message': 'Pending orders retrieved successfully', 'data': ctx.home.get_pending_orders()}
+
+@benchmark('payload', 'pending-orders json (stdlib)')
+def bench_json_stdlib(ctx):
+    return len(json.dumps(pending_orders_body(ctx)).encode())
+
+@benchmark('payload', 'pending-orders json (orjson)')
+def bench_json_orjson(ctx):
+    import orjson
+    return len(orjson.dumps(pending_orders_body(ctx)))
+
+@benchmark('payload', 'pending-orders gzip')
+def bench_gzip(ctx):
+    from services.compression import compress
+    return len(compress(ctx.http.application.json.dumps(pending_orders_body(ctx)).encode(), 'gzip'))
+
+@benchmark('payload', 'pending-orders brotli')
+def bench_brotli(ctx):
+    from services.compression import compress
+    return len(compress(ctx.http.application.json.dumps(pending_orders_body(ctx)).encode(), 'br'))
+
+@benchmark('payload', 'GET /api/analytics/pending-orders (identity)')
+def bench_route_pending_identity(ctx):
+    return len(get(ctx, '/api/analytics/pending-orders').data)
+
+@benchmark('payload', 'GET /api/analytics/pending-orders (br)')
+def bench_route_pending_br(ctx):
+    return len(get(ctx, '/api/analytics/pending-orders', headers={'Accept-Encoding': 'br'}).data)
+
+
+# Auth
+@benchmark('auth', 'verify access token (first use)')
+def bench_verify_new_token(ctx):
+    ctx.batch += 1
+    ctx.token_verifier.verify(ctx.access_token(f"user-{ctx.batch}"))
+
+@benchmark('auth', 'verify access token (cached)')
+def bench_verify_cached_token(ctx):
+    ctx.token_verifier.verify(ctx.http.environ_base['HTTP_AUTHORIZATION'][7:])
+
+def run(ctx, iterations, groups=None, names=None):
+    results = []
+    for group, name, repeat, fn in BENCHMARKS:
+        if groups and group not in groups:
+            continue
+        if names and not any(part in name for part in names):
+            continue
+        count = repeat or iterations
+        fn(ctx)  # warm-up call, not measured
+        ctx.client.reset_calls()
+        timings = []
+        for _ in range(count):
+            started = time.perf_counter()
+            size = fn(ctx)
+            timings.append((time.perf_counter() - started) * 1000)
+        timings.sort()
+        results.append({
+            "group": group,
+            "name": name,
+            "iterations": count,
+            "mean_ms": statistics.mean(timings),
+            "p50_ms": timings[len(timings) // 2],
+            "p95_ms": timings[min(len(timings) - 1, int(len(timings) * 0.95))],
+            "round_trips": sum(ctx.client.calls.values()) / count,
+            # Benchmarks that produce a payload return its size in bytes
+            "bytes": size
+        })
+        print_row(results[-1])
+    return results
+
+def print_row(result):
+    print(f"{result['group']:<10} {result['name']:<45} {result['iterations']:>5} "
+          f"{result['mean_ms']:>10.2f} {result['p50_ms']:>10.2f} {result['p95_ms']:>10.2f} "
+          f"{result['round_trips']:>8.1f} {result['bytes'] if result['bytes'] is not None else '':>10}")
+
+def compare(results, baseline_path, threshold, size, latency, engine='memory'):
+    """Return the benchmarks whose mean latency regressed past the threshold."""
+    with open(baseline_path) as f:
+        baseline_run = json.load(f)
+    baseline_engine = baseline_run.get('engine', 'memory')
+    if (baseline_run['size'], baseline_run['latency'], baseline_engine) != (size, latency, engine):
+        print(f"Note: baseline was run with --engine {baseline_engine} "
+              f"--size {baseline_run['size']} --latency {baseline_run['latency']}")
+    baseline = {(row['group'], row['name']): row for row in baseline_run['results']}
+    regressions = []
+    for result in results:
+        before = baseline.get((result['group'], result['name']))
+        # Ignore sub-0.1ms noise on calls that are already near free
+        if before and result['mean_ms'] > max(before['mean_ms'] * (1 + threshold), before['mean_ms'] + 0.1):
+            regressions.append((result, before))
+    return regressions
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--size', choices=list(SIZES), default='1k', help="rows seeded in each table")
+    parser.add_argument('--engine', choices=['memory', 'sqlite'], default='memory', help="storage engine to run against")
+    parser.add_argument('--sqlite-path', default=':memory:', help="database file for --engine sqlite")
+    parser.add_argument('--latency', type=float, default=0.0, help="artificial seconds per Supabase call (memory engine)")
+    parser.add_argument('--iterations', type=int, default=20)
+    parser.add_argument('--group', action='append', help="only run this group (repeatable)")
+    parser.add_argument('--name', action='append', help="only run benchmarks whose name contains this")
+    parser.add_argument('--json', help="write the results to this file")
+    parser.add_argument('--compare', help="baseline results file from --json")
+    parser.add_argument('--threshold', type=float, default=0.2, help="allowed mean slowdown vs baseline")
+    args = parser.parse_args(argv)
+
+    if args.engine == 'sqlite':
+        # Real query planning and disk I/O instead of simulated network latency
+        client = SQLiteEngine(args.sqlite_path)
+        args.latency = 0.0
+    else:
+        client = FakeSupabase()
+    set_supabase_client(client)
+    started = time.perf_counter()
+    rows = seed(client, args.size)
+    print(f"Seeded {rows} rows per table into {args.engine} in {time.perf_counter() - started:.1f}s, "
+          f"latency {args.latency * 1000:.0f}ms per call\n")
+    if args.engine == 'memory':
+        client.latency = args.latency
+
+    ctx = Context(client, rows)
+    print(f"{'group':<10} {'benchmark':<45} {'runs':>5} {'mean ms':>10} {'p50 ms':>10} {'p95 ms':>10} {'trips':>8} {'bytes':>10}")
+    results = run(ctx, args.iterations, args.group, args.name)
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump({"engine": args.engine, "size": args.size, "latency": args.latency, "results": results}, f, indent=2)
+
+    if args.compare:
+        regressions = compare(results, args.compare, args.threshold, args.size, args.latency, args.engine)
+        for result, before in regressions:
+            print(f"REGRESSION {result['group']} {result['name']}: "
+                  f"{before['mean_ms']:.2f}ms -> {result['mean_ms']:.2f}ms")
+        if regressions:
+            return 1
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,94 @@
+"""
+Seeded data generators for the benchmark tables.
+
+Rows follow the columns the managers read and write. The same seed always
+gives the same data, so runs can be compared.
+"""
+import random
+from datetime import date, timedelta
+
+SIZES = {
+    '1k': 1_000,
+    '100k': 100_000,
+    '1m': 1_000_000
+}
+
+ITEM_NAMES = ['Kurta', 'Saree', 'Lehenga', 'Suit', 'Dupatta', 'Blouse', 'Sherwani', 'Shirt', 'Trousers', 'Salwar']
+SIZE_LABELS = ['XS', 'S', 'M', 'L', 'XL', 'XXL', 'Free']
+MODES = ['cash', 'card', 'upi']
+PREFERENCES = ['Regular fit', 'Slim fit', 'Loose fit', 'Custom']
+CUSTOMERS = [f"Customer {number}" for number in range(1, 2001)]
+
+def _order_date(rng, today):
+    return (today - timedelta(days=rng.randint(0, 730))).isoformat()
+
+def generate_stock(count, seed=42, today=None):
+    rng = random.Random(seed)
+    today = today or date.today()
+    for _ in range(count):
+        cost_price = rng.randint(200, 5000)
+        yield {
+            "vendor_id": rng.randint(1, 50),
+            "item_name": rng.choice(ITEM_NAMES),
+            "size": rng.choice(SIZE_LABELS),
+            "quantity": rng.randint(0, 40),
+            "cost_price": cost_price,
+            "selling_price": cost_price + rng.randint(50, 3000),
+            "order_date": _order_date(rng, today),
+            "sold": rng.random() < 0.3
+        }
+
+def generate_sales(count, seed=43, today=None):
+    rng = random.Random(seed)
+    today = today or date.today()
+    for _ in range(count):
+        cost_price = rng.randint(200, 5000)
+        order_date = _order_date(rng, today)
+        yield {
+            "item_name": rng.choice(ITEM_NAMES),
+            "cost_price": cost_price,
+            "selling_price": cost_price + rng.randint(50, 3000),
+            "mode": rng.choice(MODES),
+            "cust_name": rng.choice(CUSTOMERS),
+            "order_date": order_date,
+            "expected_date": (date.fromisoformat(order_date) + timedelta(days=rng.randint(1, 30))).isoformat(),
+            "stitching": rng.random() < 0.4
+        }
+
+def generate_stitching(count, sale_count, seed=44, today=None):
+    """Stitching orders, most of them linked to one of the first `sale_count` sales."""
+    rng = random.Random(seed)
+    today = today or date.today()
+    for _ in range(count):
+        order_date = _order_date(rng, today)
+        tailor_price = rng.randint(100, 1500)
+        yield {
+            "item_id": rng.randint(1, sale_count) if sale_count and rng.random() < 0.8 else None,
+            "item_name": rng.choice(ITEM_NAMES),
+            "cust_name": rng.choice(CUSTOMERS),
+            "stitching_preference": rng.choice(PREFERENCES),
+            "tailor_price": tailor_price,
+            "selling_price": tailor_price + rng.randint(100, 1500),
+            "order_date": order_date,
+            "expected_date": (date.fromisoformat(order_date) + timedelta(days=rng.randint(3, 45))).isoformat()
+        }
+
+def generate_billing(count, sale_count, seed=45, today=None):
+    rng = random.Random(seed)
+    today = today or date.today()
+    for _ in range(count):
+        yield {
+            "item_id": rng.randint(1, sale_count),
+            "total_amount": rng.randint(300, 9000),
+            "bill_date": _order_date(rng, today),
+            "stitching_id": None
+        }
+
+def seed(client, size='1k'):
+    """Fill a FakeSupabase or SQLiteEngine with `size` rows in each table."""
+    count = SIZES[size] if isinstance(size, str) else int(size)
+    client.load('stock', generate_stock(count))
+    client.load('sales', generate_sales(count))
+    client.load('stitching', generate_stitching(count, count))
+    client.load('billing', generate_billing(count, count))
+    return count
@@ -0,0 +1,461 @@
+"""
+In-memory stand-in for the Supabase client.
+
+Implements the part of the PostgREST query builder the managers use:
+table().select().eq().neq().gt().gte().lt().lte().in_().ilike().or_()
+.not_.is_().order().limit().insert().update().delete().execute(), plus rpc()
+for the SQL functions in sql/. Every execute() sleeps for `latency` seconds
+to stand in for the network round trip and is counted in `calls`, so
+benchmarks report round trips as well as time.
+"""
+import re
+import time
+import functools
+import itertools
+import bisect
+import threading
+from collections import Counter
+from datetime import date
+from services.sqlite_engine import parse_logic, TOMBSTONES, _now
+
+# Primary key of each table, assigned on insert like a serial column
+PRIMARY_KEYS = {
+    'stock': 'item_id',
+    'sales': 'item_id',
+    'stitching': 'stitching_id',
+    'billing': 'bill_id',
+    TOMBSTONES: 'change_id'
+}
+
+# Tables stamped with updated_at and tombstoned on delete, like sql/change_tracking.sql
+TRACKED = ('stock', 'sales', 'stitching', 'billing')
+
+class FakeResponse:
+    def __init__(self, data, count=None):
+        self.data = data
+        self.count = count
+
+class FakeTable:
+    """Rows of one table kept by primary key, with the keys in sorted order."""
+
+    def __init__(self, name):
+        self.name = name
+        self.key = PRIMARY_KEYS.get(name)
+        self.rows = {}
+        self.ids = []
+        self.next_id = 1
+        # Row ids by last write; updated_at only grows, so this is the (updated_at, key) order
+        self.touched = {}
+
+    def insert(self, row):
+        row = dict(row)
+        if self.key:
+            row.setdefault(self.key, self.next_id)
+            self.next_id = max(self.next_id, row[self.key]) + 1
+        if self.name in TRACKED:
+            self.touch(row)
+        # margin is a generated column on stock and sales
+        if self.name in ('stock', 'sales') and 'selling_price' in row and 'cost_price' in row:
+            row['margin'] = row['selling_price'] - row['cost_price']
+        row_id = row.get(self.key, len(self.ids) + 1)
+        if row_id not in self.rows:
+            bisect.insort(self.ids, row_id)
+        self.rows[row_id] = row
+        return row
+
+    def touch(self, row):
+        row['updated_at'] = _now()
+        row_id = row[self.key]
+        self.touched.pop(row_id, None)
+        self.touched[row_id] = True
+
+    def remove(self, row_id):
+        del self.rows[row_id]
+        self.touched.pop(row_id, None)
+        self.ids.pop(bisect.bisect_left(self.ids, row_id))
+
+class FakeQuery:
+    def __init__(self, client, table):
+        self.client = client
+        self.table = table
+        self.action = 'select'
+        self.columns = '*'
+        self.count = None
+        self.payload = None
+        self.filters = []
+        self.order_by = []
+        self.max_rows = None
+
+    # Actions
+    def select(self, columns='*', count=None):
+        self.columns = columns
+        self.count = count
+        return self
+
+    def insert(self, payload):
+        self.action, self.payload = 'insert', payload
+        return self
+
+    def update(self, payload):
+        self.action, self.payload = 'update', payload
+        return self
+
+    def delete(self):
+        self.action = 'delete'
+        return self
+
+    # Filters
+    def _filter(self, operator, column, value):
+        self.filters.append((operator, column, value))
+        return self
+
+    def eq(self, column, value):
+        return self._filter('eq', column, value)
+
+    def neq(self, column, value):
+        return self._filter('neq', column, value)
+
+    def gt(self, column, value):
+        return self._filter('gt', column, value)
+
+    def gte(self, column, value):
+        return self._filter('gte', column, value)
+
+    def lt(self, column, value):
+        return self._filter('lt', column, value)
+
+    def lte(self, column, value):
+        return self._filter('lte', column, value)
+
+    def in_(self, column, values):
+        return self._filter('in', column, list(values))
+
+    def is_(self, column, value):
+        return self._filter('is', column, value)
+
+    def ilike(self, column, pattern):
+        return self._filter('ilike', column, pattern)
+
+    def or_(self, filters):
+        return self._filter('or', None, parse_logic(filters))
+
+    @property
+    def not_(self):
+        return _Negated(self)
+
+    # Modifiers
+    def order(self, column, desc=False, nullsfirst=None):
+        self.order_by.append((column, desc, nullsfirst))
+        return self
+
+    def limit(self, size):
+        self.max_rows = size
+        return self
+
+    def execute(self):
+        return self.client._execute(self)
+
+class _Negated:
+    def __init__(self, query):
+        self.query = query
+
+    def is_(self, column, value):
+        return self.query._filter('not.is', column, value)
+
+class FakeRPC:
+    def __init__(self, client, name, params):
+        self.client = client
+        self.name = name
+        self.params = params or {}
+
+    def execute(self):
+        return self.client._rpc(self)
+
+class FakeSupabase:
+    """Drop-in replacement for the Supabase client, see config.set_supabase_client."""
+
+    def __init__(self, latency=0.0):
+        self.latency = latency
+        self.calls = Counter()
+        self.tables = {}
+        self.functions = {
+            'summary_metrics': self._summary_metrics,
+            'create_sale_with_stitching': self._create_sale_with_stitching,
+            'reserve_stock': self._reserve_stock,
+            'change_head': self._change_head
+        }
+        self._lock = threading.RLock()
+
+    def table(self, name):
+        return FakeQuery(self, name)
+
+    def rpc(self, name, params=None):
+        return FakeRPC(self, name, params)
+
+    def get_table(self, name):
+        if name not in self.tables:
+            self.tables[name] = FakeTable(name)
+        return self.tables[name]
+
+    def load(self, name, rows):
+        """Insert seed rows without latency or call counting."""
+        table = self.get_table(name)
+        with self._lock:
+            for row in rows:
+                table.insert(row)
+
+    def reset_calls(self):
+        self.calls.clear()
+
+    def random_id(self, name, rng):
+        """A random existing primary key of `name`."""
+        return rng.choice(self.get_table(name).ids)
+
+    def max_id(self, name):
+        ids = self.get_table(name).ids
+        return ids[-1] if ids else None
+
+    # Execution
+    def _round_trip(self, label):
+        self.calls[label] += 1
+        if self.latency:
+            time.sleep(self.latency)
+
+    def _execute(self, query):
+        self._round_trip(f"{query.table}.{query.action}")
+        if query.table == 'monthly_sales':
+            return FakeResponse(self._monthly_sales())
+
+        table = self.get_table(query.table)
+        with self._lock:
+            if query.action == 'insert':
+                payload = query.payload if isinstance(query.payload, list) else [query.payload]
+                return FakeResponse([dict(table.insert(row)) for row in payload])
+
+            matched = self._match(table, query)
+            if query.action == 'update':
+                for row in matched:
+                    row.update(query.payload)
+                    if table.name in TRACKED:
+                        table.touch(row)
+                return FakeResponse([dict(row) for row in matched])
+            if query.action == 'delete':
+                for row in matched:
+                    table.remove(row[table.key])
+                    if table.name in TRACKED:
+                        self.get_table(TOMBSTONES).insert(
+                            {"table_name": table.name, "row_id": row[table.key], "deleted_at": _now()}
+                        )
+                return FakeResponse([dict(row) for row in matched])
+
+            count = len(matched) if query.count else None
+            if query.max_rows is not None:
+                matched = matched[:query.max_rows]
+            return FakeResponse([self._project(row, query.columns) for row in matched], count)
+
+    def _match(self, table, query):
+        """Return the rows matching every filter, in the requested order."""
+        filters = list(query.filters)
+        key = table.key
+
+        # Primary key lookups don't scan the table
+        for operator, column, value in filters:
+            if column == key and operator in ('eq', 'in'):
+                values = value if operator == 'in' else [value]
+                candidates = [table.rows[row_id] for row_id in map(_as_id, values) if row_id in table.rows]
+                break
+        else:
+            candidates = None
+
+        if candidates is None and query.order_by == [(key, False, None)] and query.max_rows is not None and not query.count:
+            # Keyset page: walk the sorted keys within the key bounds and stop at the limit
+            start, stop = 0, len(table.ids)
+            remaining = []
+            for operator, column, value in filters:
+                if column != key or operator not in ('gt', 'gte', 'lt', 'lte'):
+                    remaining.append((operator, column, value))
+                elif operator == 'gt':
+                    start = max(start, bisect.bisect_right(table.ids, _as_id(value)))
+                elif operator == 'gte':
+                    start = max(start, bisect.bisect_left(table.ids, _as_id(value)))
+                elif operator == 'lt':
+                    stop = min(stop, bisect.bisect_left(table.ids, _as_id(value)))
+                elif operator == 'lte':
+                    stop = min(stop, bisect.bisect_right(table.ids, _as_id(value)))
+            matched = []
+            for row_id in table.ids[start:stop]:
+                row = table.rows[row_id]
+                if all(_test(row, *condition) for condition in remaining):
+                    matched.append(row)
+                    if len(matched) >= query.max_rows:
+                        break
+            return matched
+
+        if candidates is None and table.touched and query.order_by[:1] and query.order_by[0][0] == 'updated_at' \
+                and query.max_rows is not None and not query.count and all(_feed_filter(*f) for f in filters):
+            # Change feed page: newest writes first, or the writes after a cursor, like the updated_at index
+            after = [f for f in filters if f[0] == 'or']
+            before = [f for f in filters if f[0] != 'or']
+            if query.order_by[0][1] or not after:
+                ids = reversed(table.touched) if query.order_by[0][1] else iter(table.touched)
+                rows = (table.rows[row_id] for row_id in ids)
+                matched = (row for row in rows if all(_test(row, *condition) for condition in filters))
+                return list(itertools.islice(matched, query.max_rows))
+            matched = []
+            for row_id in reversed(table.touched):
+                row = table.rows[row_id]
+                if not all(_test(row, *condition) for condition in after):
+                    break
+                if all(_test(row, *condition) for condition in before):
+                    matched.append(row)
+            return matched[::-1][:query.max_rows]
+
+        if candidates is None:
+            candidates = [table.rows[row_id] for row_id in table.ids]
+        matched = [row for row in candidates if all(_test(row, *condition) for condition in filters)]
+        # Stable sorts from the last order column to the first
+        for column, descending, nullsfirst in reversed(query.order_by):
+            present = [row for row in matched if row.get(column) is not None]
+            missing = [row for row in matched if row.get(column) is None]
+            present.sort(key=lambda row: row[column], reverse=descending)
+            # Postgres puts nulls last in ascending order and first in descending order
+            first = descending if nullsfirst is None else nullsfirst
+            matched = missing + present if first else present + missing
+        return matched
+
+    @staticmethod
+    def _project(row, columns):
+        names = _column_names(columns)
+        if names is None:
+            return dict(row)
+        return {column: row.get(column) for column in names}
+
+    def _rpc(self, call):
+        self._round_trip(f"rpc.{call.name}")
+        if call.name not in self.functions:
+            raise Exception(f"Could not find the function public.{call.name}")
+        with self._lock:
+            return FakeResponse(self.functions[call.name](call.params))
+
+    # Views and SQL functions from sql/
+    def _summary_metrics(self, params):
+        sales = self.get_table('sales').rows.values()
+        stitching = self.get_table('stitching').rows.values()
+        return [{
+            "total_sales": len(sales),
+            "total_stitching_orders": len(stitching),
+            "total_revenue": sum(row['selling_price'] for row in sales) + sum(row['selling_price'] for row in stitching)
+        }]
+
+    def _create_sale_with_stitching(self, params):
+        sales, stitching = self.get_table('sales'), self.get_table('stitching')
+        sale = sales.insert({'stitching': True, **params['sale_data']})
+        try:
+            order = stitching.insert({**params['stitching_data'], 'item_id': sale['item_id']})
+        except Exception:
+            # One transaction: the sale is rolled back with the failed stitching insert
+            sales.remove(sale['item_id'])
+            raise
+        return {"sale": dict(sale), "stitching": dict(order)}
+
+    def _reserve_stock(self, params):
+        row = self.get_table('stock').rows.get(_as_id(params['stock_item_id']))
+        amount = int(params['amount'])
+        if row is None or row.get('quantity') is None or row['quantity'] < amount:
+            return []
+        row['quantity'] -= amount
+        row['sold'] = row['quantity'] <= 0
+        self.get_table('stock').touch(row)
+        return [dict(row)]
+
+    def _change_head(self, params):
+        table = self.get_table(params['target_table'])
+        tombstones = [row for row in self.get_table(TOMBSTONES).rows.values() if row['table_name'] == table.name]
+        newest = table.rows[next(reversed(table.touched))] if table.touched else None
+        tombstone = max(tombstones, key=lambda row: (row['deleted_at'], row['change_id']), default=None)
+        return {
+            "updated_at": newest['updated_at'] if newest else None,
+            "deleted_at": tombstone['deleted_at'] if tombstone else None,
+            "change_id": tombstone['change_id'] if tombstone else None
+        }
+
+    def _monthly_sales(self):
+        totals = {}
+        for row in self.get_table('sales').rows.values():
+            month = str(row.get('order_date'))[:7]
+            orders, total = totals.get(month, (0, 0))
+            totals[month] = (orders + 1, total + row['selling_price'])
+        return [
+            {"month": month, "total_orders": orders, "total_sales": total}
+            for month, (orders, total) in sorted(totals.items())
+        ]
+
+def _feed_filter(operator, column, value):
+    """Filters of a change feed page: the cursor's or_() and the settled bound on updated_at."""
+    return operator == 'or' or (column == 'updated_at' and operator in ('lt', 'lte'))
+
+def _as_id(value):
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return value
+
+def _coerce(row_value, value):
+    """Compare filter values from URLs against the row's type, like PostgREST does."""
+    if isinstance(row_value, bool):
+        return str(value).lower() in ('true', '1') if isinstance(value, str) else bool(value)
+    if isinstance(row_value, (int, float)) and isinstance(value, str):
+        try:
+            return float(value)
+        except ValueError:
+            return value
+    if isinstance(row_value, str) and isinstance(value, (date, int, float)):
+        return str(value)
+    return value
+
+@functools.lru_cache(maxsize=256)
+def _column_names(columns):
+    """Column names of a select() list, None for *."""
+    if columns.strip() == '*':
+        return None
+    return tuple(name.strip() for name in columns.split(','))
+
+@functools.lru_cache(maxsize=256)
+def _like_pattern(value):
+    """Compile an ilike pattern, * or % matching any run of characters."""
+    pattern = '.*'.join(re.escape(part) for part in value.replace('%', '*').split('*'))
+    return re.compile(pattern, re.IGNORECASE | re.DOTALL)
+
+def _test(row, operator, column, value):
+    if operator in ('and', 'or'):
+        results = (_test(row, *condition) for condition in value)
+        return all(results) if operator == 'and' else any(results)
+    if operator.startswith('not.'):
+        return not _test(row, operator[4:], column, value)
+
+    row_value = row.get(column)
+    if operator == 'is':
+        return row_value is None if value in ('null', None) else row_value == value
+    if operator == 'ilike':
+        return row_value is not None and _like_pattern(str(value)).fullmatch(str(row_value)) is not None
+    if operator == 'in':
+        return any(row_value == _coerce(row_value, item) for item in value)
+    if row_value is None:
+        return False
+    value = _coerce(row_value, value)
+    try:
+        if operator == 'eq':
+            return row_value == value
+        if operator == 'neq':
+            return row_value != value
+        if operator == 'gt':
+            return row_value > value
+        if operator == 'gte':
+            return row_value >= value
+        if operator == 'lt':
+            return row_value < value
+        if operator == 'lte':
+            return row_value <= value
+    except TypeError:
+        return False
+    raise ValueError(f"Unsupported filter: {operator}")
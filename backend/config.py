@@ -1,23 +1,181 @@
 import os
-from supabase import create_client
+import threading
+import httpx
+from supabase import create_client, ClientOptions
 from dotenv import load_dotenv
+from services.metrics import SupabaseMetricsTransport
+from services.sqlite_engine import SQLiteEngine
 
 # Load environment variables
 load_dotenv()
 SUPABASE_URL = os.getenv('SUPABASE_URL')
 SUPABASE_KEY = os.getenv('SUPABASE_KEY')
 
+# Storage engine: 'supabase' (hosted, default) or 'sqlite' (embedded, single shop)
+STORAGE_ENGINE = os.getenv('STORAGE_ENGINE', 'supabase')
+SQLITE_PATH = os.getenv('SQLITE_PATH', 'inventory.db')
+
+# Access tokens are verified locally (services/auth.py); HS256 projects set the JWT secret.
+# The single-shop SQLite install has no Supabase Auth, so it checks no tokens by default
+AUTH_REQUIRED = os.getenv('AUTH_REQUIRED', 'false' if STORAGE_ENGINE == 'sqlite' else 'true').lower() == 'true'
+SUPABASE_JWT_SECRET = os.getenv('SUPABASE_JWT_SECRET')
+JWT_AUDIENCE = os.getenv('JWT_AUDIENCE', 'authenticated')
+JWT_LEEWAY = int(os.getenv('JWT_LEEWAY', 30))
+JWKS_CACHE_TTL = int(os.getenv('JWKS_CACHE_TTL', 600))
+JWKS_FETCH_TIMEOUT = float(os.getenv('JWKS_FETCH_TIMEOUT', 5))
+VERIFIED_TOKEN_CACHE_SIZE = int(os.getenv('VERIFIED_TOKEN_CACHE_SIZE', 1024))
+# Password of the single-shop login (STORAGE_ENGINE=sqlite), any password when unset
+LOCAL_LOGIN_PASSWORD = os.getenv('LOCAL_LOGIN_PASSWORD')
+
+# Pagination settings for the list endpoints
+DEFAULT_PAGE_SIZE = int(os.getenv('DEFAULT_PAGE_SIZE', 100))
+MAX_PAGE_SIZE = int(os.getenv('MAX_PAGE_SIZE', 1000))
+
+# Streaming exports: rows per page and pages fetched ahead of the client
+EXPORT_PAGE_SIZE = int(os.getenv('EXPORT_PAGE_SIZE', 1000))
+EXPORT_PREFETCH_PAGES = int(os.getenv('EXPORT_PREFETCH_PAGES', 2))
+
+# Read-through cache for by-id lookups
+RECORD_CACHE_SIZE = int(os.getenv('RECORD_CACHE_SIZE', 1024))
+RECORD_CACHE_TTL = float(os.getenv('RECORD_CACHE_TTL', 60))
+
+# Seconds the dashboard's pending orders and closed rollup buckets are reused,
+# bounding how long writes from other workers or Supabase take to show up
+ANALYTICS_CACHE_TTL = float(os.getenv('ANALYTICS_CACHE_TTL', 60))
+
+# Seconds the change feeds stay behind the newest writes, so a transaction
+# that stamped its rows earlier has committed before a cursor moves past them
+CHANGE_FEED_LAG = float(os.getenv('CHANGE_FEED_LAG', 5))
+
+# Attempts and first back-off (seconds, doubled per attempt) of a stock
+# reservation that lost a race, when the database lacks sql/reserve_stock.sql
+STOCK_RESERVE_RETRIES = int(os.getenv('STOCK_RESERVE_RETRIES', 8))
+STOCK_RESERVE_BACKOFF = float(os.getenv('STOCK_RESERVE_BACKOFF', 0.01))
+
+# Unsold stock items with at most this many units are reported as low stock
+LOW_STOCK_THRESHOLD = int(os.getenv('LOW_STOCK_THRESHOLD', 5))
+# item_id ranges of the stock table fetched concurrently for the stock report
+STOCK_REPORT_FETCH_WORKERS = int(os.getenv('STOCK_REPORT_FETCH_WORKERS', 8))
+
+# Rows sent per insert by the bulk create endpoints
+BULK_CHUNK_SIZE = int(os.getenv('BULK_CHUNK_SIZE', 50))
+
+# HTTP connection pool shared by every Supabase call
+SUPABASE_MAX_CONNECTIONS = int(os.getenv('SUPABASE_MAX_CONNECTIONS', 32))
+SUPABASE_MAX_KEEPALIVE = int(os.getenv('SUPABASE_MAX_KEEPALIVE', 16))
+SUPABASE_KEEPALIVE_EXPIRY = float(os.getenv('SUPABASE_KEEPALIVE_EXPIRY', 60))
+SUPABASE_CONNECT_TIMEOUT = float(os.getenv('SUPABASE_CONNECT_TIMEOUT', 5))
+SUPABASE_READ_TIMEOUT = float(os.getenv('SUPABASE_READ_TIMEOUT', 30))
+SUPABASE_POOL_TIMEOUT = float(os.getenv('SUPABASE_POOL_TIMEOUT', 10))
+
+# Threads available for blocking Supabase calls in async (ASGI) mode
+ASYNC_IO_THREADS = int(os.getenv('ASYNC_IO_THREADS', 32))
+
+# Response compression: bodies below COMPRESS_MIN_SIZE bytes are sent as they are
+COMPRESS_MIN_SIZE = int(os.getenv('COMPRESS_MIN_SIZE', 1024))
+GZIP_LEVEL = int(os.getenv('GZIP_LEVEL', 6))
+BROTLI_QUALITY = int(os.getenv('BROTLI_QUALITY', 5))
+
+# Serialize JSON responses with orjson when it is installed
+FAST_JSON = os.getenv('FAST_JSON', 'true').lower() == 'true'
+
+_client = None
+_client_injected = False
+_client_lock = threading.Lock()
+_readiness = {"ready": False, "error": "Supabase connection not checked yet"}
+_warm_up_started = False
+
+def create_http_client():
+    """
+    Create the pooled HTTP client behind the Supabase client.
+
+    httpx.Client is thread-safe, so threaded Flask workers and the async I/O
+    pool all reuse its warm keep-alive connections instead of opening new ones.
+    """
+    transport = httpx.HTTPTransport(
+        limits=httpx.Limits(
+            max_connections=SUPABASE_MAX_CONNECTIONS,
+            max_keepalive_connections=SUPABASE_MAX_KEEPALIVE,
+            keepalive_expiry=SUPABASE_KEEPALIVE_EXPIRY
+        ),
+        http2=True
+    )
+    return httpx.Client(
+        # Every call is timed for the /metrics endpoint
+        transport=SupabaseMetricsTransport(transport),
+        timeout=httpx.Timeout(
+            SUPABASE_READ_TIMEOUT,
+            connect=SUPABASE_CONNECT_TIMEOUT,
+            pool=SUPABASE_POOL_TIMEOUT
+        ),
+        follow_redirects=True
+    )
+
 def get_supabase_client():
-    """Create and return a Supabase client."""
-    print("Testing Supabase connection...")
+    """Return the shared Supabase client (or SQLite engine), creating it on first use."""
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None and STORAGE_ENGINE == 'sqlite':
+                _client = SQLiteEngine(SQLITE_PATH, LOCAL_LOGIN_PASSWORD)
+            elif _client is None:
+                # A worker forked after this (gunicorn --preload) gets its own, see _reset_after_fork
+                _client = create_client(
+                    SUPABASE_URL,
+                    SUPABASE_KEY,
+                    options=ClientOptions(httpx_client=create_http_client())
+                )
+    return _client
+
+def set_supabase_client(client):
+    """Use `client` for every Supabase call, e.g. an in-memory stand-in for benchmarks."""
+    global _client, _client_injected
+    with _client_lock:
+        _client = client
+        _client_injected = client is not None
+
+class LazySupabaseClient:
+    """Stands in for the Supabase client and creates it on first attribute access."""
+
+    def __getattr__(self, name):
+        return getattr(get_supabase_client(), name)
+
+supabase = LazySupabaseClient()
+
+def check_connection():
+    """Run a test query and record whether the database is reachable."""
     try:
-        client = create_client(SUPABASE_URL, SUPABASE_KEY)
-        # Test query to verify the connection
-        response = client.table('sales').select('*').limit(1).execute()
-        print("Supabase connection successful. Test response:", response.data)
-        return client
+        get_supabase_client().table('sales').select('item_id').limit(1).execute()
+        _readiness.update(ready=True, error=None)
     except Exception as e:
         print(f"Supabase connection error: {e}")
-        return None
+        _readiness.update(ready=False, error=str(e))
+    return dict(_readiness)
+
+def warm_up(background=True):
+    """Create the client and open a connection ahead of the first request."""
+    global _warm_up_started
+    if not background:
+        return check_connection()
+    _warm_up_started = True
+    threading.Thread(target=check_connection, name='supabase-warm-up', daemon=True).start()
+
+def _reset_after_fork():
+    """
+    Drop the parent's client in a forked worker.
+
+    main.py warms up at import, so with gunicorn --preload the client and its
+    HTTP/2 connections exist before the fork. Sockets shared between workers
+    interleave their requests, so each worker creates its own client and
+    warms it up again.
+    """
+    global _client, _client_lock
+    _client_lock = threading.Lock()
+    if _client_injected:
+        return
+    _client = None
+    _readiness.update(ready=False, error="Supabase connection not checked yet")
+    if _warm_up_started:
+        warm_up()
 
-supabase = get_supabase_client()
+os.register_at_fork(after_in_child=_reset_after_fork)
@@ -1,9 +1,19 @@
-from flask import Flask
+import time
+from flask import Flask, Response, g, request
+from config import warm_up, check_connection, FAST_JSON
 from api.api_endpts import stock_bp, sales_bp, stitching_bp, billing_bp, home_bp, auth_bp
 from flask_cors import CORS
+from services.auth import check_auth_config
+from services.metrics import observe_request, render_metrics
+from services.compression import compress_response
+from services.fastjson import OrjsonProvider
 
 app = Flask(__name__)
 
+# Faster JSON encoding for every jsonify in the blueprints
+if FAST_JSON and OrjsonProvider is not None:
+    app.json = OrjsonProvider(app)
+
 CORS(app, resources={r"/*": {
     "origins": "http://localhost:5173",
     "methods": ["GET", "POST", "PUT", "DELETE", "OPTIONS"],
@@ -28,12 +38,48 @@ app.register_blueprint(home_bp, url_prefix='/api/analytics')
 # Register the Blueprint for authentication routes
 app.register_blueprint(auth_bp, url_prefix='/api/auth')
 
+@app.before_request
+def start_request_timer():
+    g.request_started = time.perf_counter()
+
+@app.after_request
+def compress(response):
+    return compress_response(response, request.headers.get('Accept-Encoding'))
+
+@app.after_request
+def record_request_metrics(response):
+    # Label by route pattern, not by URL, so ids don't create new series
+    route = request.url_rule.rule if request.url_rule else 'unmatched'
+    observe_request(request.method, route, response.status_code, g.request_started)
+    return response
+
+# Refuse to start without the settings to verify access tokens, the keys load in the background
+check_auth_config()
+
+# Connect to Supabase in the background, start-up does not wait for the database
+warm_up()
+
 @app.route('/')
 def home():
     return {
         "message": "Welcome to the Inventory and Sales Management API"
     }
 
+@app.route('/health')
+def health():
+    """Readiness check, 503 until Supabase answers a test query."""
+    status = check_connection()
+    return {
+        "status": "ready" if status["ready"] else "unavailable",
+        "error": status["error"]
+    }, 200 if status["ready"] else 503
+
+@app.route('/metrics')
+def metrics():
+    """Request and Supabase call metrics in the Prometheus text format."""
+    body, content_type = render_metrics()
+    return Response(body, content_type=content_type)
+
 if __name__ == '__main__':
     # Run the application
     app.run(debug=True, host='0.0.0.0', port=5000)
@@ -0,0 +1,112 @@
+"""
+Async versions of the service managers, used by the ASGI app (asgi.py).
+
+The Supabase client calls are blocking, so each one runs on a shared thread
+pool and the event loop stays free to serve other requests. Methods that
+make several independent calls run them concurrently with asyncio.gather;
+everything else awaits the matching method of the sync manager.
+"""
+import asyncio
+from datetime import date
+from functools import partial
+from concurrent.futures import ThreadPoolExecutor
+from config import ASYNC_IO_THREADS
+from services.stock import StockManager
+from services.sales import SalesManager
+from services.stitching import StitchingManager
+from services.billing import BillingManager
+from services.home import HomeAnalytics, _pending_cache
+from services.customers import CustomerManager
+from services.rpc import missing_function
+
+_io_pool = ThreadPoolExecutor(max_workers=ASYNC_IO_THREADS, thread_name_prefix='supabase-io')
+
+async def run_blocking(func, *args, **kwargs):
+    """Run a blocking call on the I/O pool and await its result."""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_io_pool, partial(func, *args, **kwargs))
+
+class AsyncManager:
+    """Awaitable wrapper around a sync manager: every method becomes a coroutine."""
+    manager_class = None
+
+    def __init__(self):
+        self.manager = self.manager_class()
+
+    def __getattr__(self, name):
+        method = getattr(self.manager, name)
+        if not callable(method):
+            return method
+
+        async def call(*args, **kwargs):
+            return await run_blocking(method, *args, **kwargs)
+        call.__name__ = name
+        return call
+
+class AsyncStockManager(AsyncManager):
+    manager_class = StockManager
+
+class AsyncSalesManager(AsyncManager):
+    manager_class = SalesManager
+
+class AsyncStitchingManager(AsyncManager):
+    manager_class = StitchingManager
+
+class AsyncBillingManager(AsyncManager):
+    manager_class = BillingManager
+
+    async def create_bill(self, data):
+        """Create a new bill, fetching the stitching and sales rows concurrently."""
+        try:
+            item_id = data.get('item_id')
+            if not item_id:
+                raise ValueError("item_id is required for billing")
+
+            stitching_result, sales_result = await asyncio.gather(
+                *[run_blocking(lookup) for lookup in self.manager._item_lookups(item_id)]
+            )
+            return await run_blocking(self.manager._insert_bill, item_id, stitching_result, sales_result)
+
+        except Exception as e:
+            raise Exception(f"Error creating bill: {str(e)}")
+
+class AsyncHomeAnalytics(AsyncManager):
+    manager_class = HomeAnalytics
+
+    async def get_summary_metrics(self):
+        """Fetch key metrics for the dashboard."""
+        if HomeAnalytics.summary_function:
+            try:
+                return await run_blocking(self.manager._fetch_summary_metrics)
+            except Exception as e:
+                if not missing_function(e):
+                    raise Exception(f"Error fetching summary metrics: {str(e)}")
+                HomeAnalytics.summary_function = False
+        try:
+            results = await asyncio.gather(
+                *[run_blocking(query) for query in self.manager._summary_queries()]
+            )
+            return self.manager._summarize(*results)
+        except Exception as e:
+            raise Exception(f"Error fetching summary metrics: {str(e)}")
+
+    async def get_pending_orders(self):
+        """Fetch all pending and working orders, querying both tables concurrently."""
+        try:
+            today = date.today().isoformat()
+
+            cached = self.manager._cached_pending_orders(today)
+            if cached is not None:
+                return cached
+
+            version = _pending_cache['version']
+            sales_rows, stitching_rows = await asyncio.gather(
+                run_blocking(self.manager._fetch_open_orders, 'sales'),
+                run_blocking(self.manager._fetch_open_orders, 'stitching')
+            )
+            return self.manager._classify_pending_orders(sales_rows, stitching_rows, today, version)
+        except Exception as e:
+            raise Exception(f"Error fetching pending orders: {str(e)}")
+
+class AsyncCustomerManager(AsyncManager):
+    manager_class = CustomerManager
@@ -0,0 +1,142 @@
+"""
+Local verification of the Supabase access tokens returned by /api/auth/login.
+
+Tokens are checked here, with no call to Supabase. The checks are the
+signature, expiry, audience and issuer. HS256 tokens use the project's JWT
+secret (SUPABASE_JWT_SECRET). Tokens signed with asymmetric keys use the
+project's JWKS, which is fetched once and cached. Verified tokens are
+remembered until they expire, so a repeated token costs one dictionary
+lookup. check_auth_config runs at start-up, so a deployment missing the
+settings to verify a token fails there rather than with a 401 on every
+request; the JWKS is fetched in the background, start-up never waits for it.
+"""
+import time
+import threading
+from collections import OrderedDict
+import jwt
+from config import (
+    AUTH_REQUIRED, SUPABASE_URL, SUPABASE_JWT_SECRET, JWT_AUDIENCE, JWT_LEEWAY,
+    JWKS_CACHE_TTL, JWKS_FETCH_TIMEOUT, VERIFIED_TOKEN_CACHE_SIZE
+)
+
+class AuthError(Exception):
+    """The request has no valid access token."""
+
+class TokenVerifier:
+    def __init__(self, secret=SUPABASE_JWT_SECRET, audience=JWT_AUDIENCE, supabase_url=SUPABASE_URL,
+                 leeway=JWT_LEEWAY, cache_size=VERIFIED_TOKEN_CACHE_SIZE):
+        self.secret = secret
+        self.audience = audience
+        self.issuer = f"{supabase_url.rstrip('/')}/auth/v1" if supabase_url else None
+        self.leeway = leeway
+        self.cache_size = cache_size
+        self._jwks = None
+        self._verified = OrderedDict()
+        self._lock = threading.Lock()
+
+    def cached(self, token):
+        """Return the claims of an already verified, unexpired token, else None."""
+        with self._lock:
+            entry = self._verified.get(token)
+            if entry is None:
+                return None
+            if entry['exp'] + self.leeway < time.time():
+                del self._verified[token]
+                return None
+            self._verified.move_to_end(token)
+            return entry
+
+    def verify(self, token):
+        """Return the token's claims, raising AuthError when it is not valid."""
+        claims = self.cached(token)
+        if claims is not None:
+            return claims
+        try:
+            algorithm = jwt.get_unverified_header(token).get('alg')
+            if algorithm == 'HS256':
+                if not self.secret:
+                    raise AuthError("HS256 tokens need SUPABASE_JWT_SECRET")
+                key = self.secret
+            else:
+                key = self._signing_key(token)
+            claims = jwt.decode(
+                token,
+                key,
+                algorithms=[algorithm] if algorithm in ('HS256', 'RS256', 'ES256', 'EdDSA') else [],
+                audience=self.audience,
+                issuer=self.issuer,
+                leeway=self.leeway,
+                options={'require': ['exp', 'sub']}
+            )
+        except AuthError:
+            raise
+        except jwt.ExpiredSignatureError:
+            raise AuthError("Access token has expired")
+        except jwt.PyJWTError as e:
+            raise AuthError(f"Invalid access token: {str(e)}")
+
+        with self._lock:
+            self._verified[token] = claims
+            while len(self._verified) > self.cache_size:
+                self._verified.popitem(last=False)
+        return claims
+
+    def _signing_key(self, token):
+        """Public key for the token's kid from the project's JWKS (cached, refetched for new kids)."""
+        if self.issuer is None:
+            raise AuthError("Asymmetric tokens need SUPABASE_URL to find the signing keys")
+        try:
+            return self.jwks_client().get_signing_key_from_jwt(token).key
+        except jwt.PyJWKClientError as e:
+            raise AuthError(f"Unknown signing key: {str(e)}")
+
+    def jwks_client(self):
+        """Client of the project's JWKS endpoint, created on first use."""
+        if self._jwks is None:
+            self._jwks = jwt.PyJWKClient(
+                f"{self.issuer}/.well-known/jwks.json", cache_keys=True, lifespan=JWKS_CACHE_TTL,
+                timeout=JWKS_FETCH_TIMEOUT
+            )
+        return self._jwks
+
+# Shared by all blueprints
+token_verifier = TokenVerifier()
+
+def check_auth_config(verifier=token_verifier, required=AUTH_REQUIRED):
+    """
+    Raise RuntimeError when access tokens could not be verified at all.
+
+    Only the settings are checked, start-up makes no network call. Without
+    SUPABASE_JWT_SECRET every token must be signed with a key from the
+    project's JWKS, which is fetched on a background thread (warm_up_jwks).
+    """
+    if not required or verifier.secret:
+        return
+    if verifier.issuer is None:
+        raise RuntimeError("AUTH_REQUIRED needs SUPABASE_JWT_SECRET or SUPABASE_URL to verify access tokens")
+    threading.Thread(target=warm_up_jwks, args=(verifier,), name='jwks-warm-up', daemon=True).start()
+
+def warm_up_jwks(verifier=token_verifier):
+    """
+    Fetch the project's JWKS ahead of the first asymmetric token.
+
+    Failures are only printed: an unreachable JWKS is fetched again on the
+    first request, and a project with no keys there signs with HS256 and
+    needs SUPABASE_JWT_SECRET.
+    """
+    try:
+        verifier.jwks_client().get_jwk_set()
+    except (jwt.PyJWKClientConnectionError, OSError) as e:
+        print(f"Could not fetch the Supabase signing keys: {e}")
+    except (jwt.PyJWKSetError, jwt.PyJWKClientError) as e:
+        print(
+            f"The Supabase project has no asymmetric signing keys ({e}), "
+            "set SUPABASE_JWT_SECRET to verify its HS256 access tokens"
+        )
+
+def bearer_token(authorization):
+    """Extract the token from an Authorization header, raising AuthError when absent."""
+    scheme, _, token = (authorization or '').partition(' ')
+    if scheme.lower() != 'bearer' or not token.strip():
+        raise AuthError("Missing bearer token")
+    return token.strip()
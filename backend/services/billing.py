@@ -1,5 +1,13 @@
 from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
 from config import supabase
+from services.pagination import fetch_page, iter_pages, date_range_filters
+from services.events import notify_write
+from services.cache import record_cache
+from services.changes import change_feed
+
+# Runs the independent stitching and sales lookups of a bill side by side
+_lookup_pool = ThreadPoolExecutor(max_workers=8)
 
 class BillingManager:
     def create_bill(self, data):
@@ -9,73 +17,174 @@ class BillingManager:
             if not item_id:
                 raise ValueError("item_id is required for billing")
 
-            # Initialize billing data
-            total_amount = 0
-            bill_details = {}
-
-            # Fetch stitching data
-            stitching_result = supabase.table('stitching').select('*').eq('item_id', item_id).execute()
-            if stitching_result.data:
-                stitching_data = stitching_result.data[0]
-                total_amount += stitching_data['selling_price']
-                bill_details.update({
-                    "stitching_id": stitching_data['stitching_id'],
-                    "stitching_price": stitching_data['selling_price'],
-                    "stitching_preference": stitching_data['stitching_preference']
-                })
-
-            # Fetch sales data
-            sales_result = supabase.table('sales').select('*').eq('item_id', item_id).execute()
-            if sales_result.data:
-                sales_data = sales_result.data[0]
-                total_amount += sales_data['selling_price']
-                bill_details.update({
-                    "sale_price": sales_data['selling_price'],
-                    "customer_name": sales_data['cust_name'],
-                    "order_date": sales_data['order_date']
-                })
-
-            if not bill_details:
-                raise ValueError(f"No related stitching or sales record found for item_id: {item_id}")
-
-            # Insert billing record
-            bill_data = {
-                "item_id": item_id,
-                "total_amount": total_amount,
-                "bill_date": datetime.now().strftime('%Y-%m-%d'),
-                "stitching_id": bill_details.get("stitching_id")
-            }
-            result = supabase.table('billing').insert(bill_data).execute()
-            bill_details.update(bill_data)
-
-            return bill_details
+            # Fetch stitching and sales data concurrently, the lookups are independent
+            stitching_lookup, sales_lookup = [_lookup_pool.submit(lookup) for lookup in self._item_lookups(item_id)]
+            return self._insert_bill(item_id, stitching_lookup.result(), sales_lookup.result())
 
         except Exception as e:
             raise Exception(f"Error creating bill: {str(e)}")
 
-    def get_all_bills(self):
-        """Retrieve all billing records."""
+    @staticmethod
+    def _item_lookups(item_id):
+        """The independent stitching and sales queries behind a bill."""
+        return [
+            lambda: supabase.table('stitching').select('*').eq('item_id', item_id).execute(),
+            lambda: supabase.table('sales').select('*').eq('item_id', item_id).execute()
+        ]
+
+    def _insert_bill(self, item_id, stitching_result, sales_result):
+        """Build the bill from the lookup results and insert the billing record."""
+        bill_details, bill_data = self._build_bill(
+            item_id,
+            stitching_result.data[0] if stitching_result.data else None,
+            sales_result.data[0] if sales_result.data else None
+        )
+
+        # Insert billing record
+        result = supabase.table('billing').insert(bill_data).execute()
+        notify_write('billing', 'insert', result.data)
+        bill_details.update(bill_data)
+
+        return bill_details
+
+    def create_bills(self, item_ids):
+        """Create bills for many item_ids with two lookups and a single insert, one bill per distinct id."""
         try:
-            result = supabase.table('billing').select('*').execute()
-            return result.data
+            if not isinstance(item_ids, list) or not item_ids:
+                raise ValueError("item_ids must be a non-empty list")
+
+            # Keep the first occurrence of each id, errors still point into the request
+            first_index = {}
+            for index, item_id in enumerate(item_ids):
+                first_index.setdefault(str(item_id), (index, item_id))
+            item_ids = [item_id for _, item_id in first_index.values()]
+
+            # Fetch all related stitching and sales rows concurrently
+            stitching_lookup = _lookup_pool.submit(
+                lambda: supabase.table('stitching').select('*').in_('item_id', item_ids).execute()
+            )
+            sales_lookup = _lookup_pool.submit(
+                lambda: supabase.table('sales').select('*').in_('item_id', item_ids).execute()
+            )
+            stitching_by_item = self._first_by_item_id(stitching_lookup.result().data)
+            sales_by_item = self._first_by_item_id(sales_lookup.result().data)
+
+            bills, errors = [], []
+            for index, item_id in first_index.values():
+                try:
+                    bills.append(self._build_bill(
+                        item_id,
+                        stitching_by_item.get(str(item_id)),
+                        sales_by_item.get(str(item_id))
+                    ))
+                except ValueError as e:
+                    errors.append({"index": index, "error": str(e)})
+
+            if bills:
+                # Insert all billing records in one call
+                result = supabase.table('billing').insert([bill_data for _, bill_data in bills]).execute()
+                notify_write('billing', 'insert', result.data)
+                for bill_details, bill_data in bills:
+                    bill_details.update(bill_data)
+
+            return {
+                "items": [bill_details for bill_details, _ in bills],
+                "errors": errors
+            }
+
+        except ValueError:
+            raise
+        except Exception as e:
+            raise Exception(f"Error creating bills: {str(e)}")
+
+    @staticmethod
+    def _first_by_item_id(rows):
+        """Index rows by item_id, keeping the first row of each item."""
+        by_item = {}
+        for row in rows:
+            by_item.setdefault(str(row['item_id']), row)
+        return by_item
+
+    @staticmethod
+    def _build_bill(item_id, stitching_data, sales_data):
+        """Return the bill details and the billing row for an item."""
+        total_amount = 0
+        bill_details = {}
+
+        if stitching_data:
+            total_amount += stitching_data['selling_price']
+            bill_details.update({
+                "stitching_id": stitching_data['stitching_id'],
+                "stitching_price": stitching_data['selling_price'],
+                "stitching_preference": stitching_data['stitching_preference']
+            })
+
+        if sales_data:
+            total_amount += sales_data['selling_price']
+            bill_details.update({
+                "sale_price": sales_data['selling_price'],
+                "customer_name": sales_data['cust_name'],
+                "order_date": sales_data['order_date']
+            })
+
+        if not bill_details:
+            raise ValueError(f"No related stitching or sales record found for item_id: {item_id}")
+
+        bill_data = {
+            "item_id": item_id,
+            "total_amount": total_amount,
+            "bill_date": datetime.now().strftime('%Y-%m-%d'),
+            "stitching_id": bill_details.get("stitching_id")
+        }
+        return bill_details, bill_data
+
+    def get_all_bills(self, cursor=None, limit=None):
+        """Retrieve a page of billing records."""
+        try:
+            return fetch_page('billing', 'bill_id', cursor, limit)
+        except ValueError:
+            raise
         except Exception as e:
             raise Exception(f"Error retrieving billing records: {str(e)}")
 
+    def export_bills(self, page_size=None, start_date=None, end_date=None):
+        """Yield all billing records, one page at a time, optionally within a bill_date range."""
+        return iter_pages('billing', 'bill_id', page_size, filters=date_range_filters('bill_date', start_date, end_date))
+
+    def get_bill_changes(self, cursor=None, since=None, limit=None):
+        """Retrieve the billing records inserted, updated or deleted since a cursor or timestamp."""
+        try:
+            return change_feed.changes_since('billing', cursor, since, limit)
+        except ValueError:
+            raise
+        except Exception as e:
+            raise Exception(f"Error retrieving billing changes: {str(e)}")
+
     def get_bill_by_id(self, bill_id):
         """Retrieve a specific bill by ID."""
         try:
-            result = supabase.table('billing').select('*').eq('bill_id', bill_id).execute()
-            if not result.data:
-                raise ValueError(f"Bill record with ID {bill_id} not found")
-            return result.data[0]
+            return record_cache.get_or_load('billing', bill_id, lambda: self._load_bill(bill_id))
+        except ValueError:
+            raise
         except Exception as e:
             raise Exception(f"Error retrieving bill record: {str(e)}")
 
+    def _load_bill(self, bill_id):
+        """Fetch a single billing row from the database."""
+        result = supabase.table('billing').select('*').eq('bill_id', bill_id).execute()
+        if not result.data:
+            raise ValueError(f"Bill record with ID {bill_id} not found")
+        return result.data[0]
+
     def delete_bill(self, bill_id):
         """Delete a bill record."""
         try:
-            self.get_bill_by_id(bill_id)  # Ensure it exists
             result = supabase.table('billing').delete().eq('bill_id', bill_id).execute()
+            if not result.data:
+                raise ValueError(f"Bill record with ID {bill_id} not found")
+            notify_write('billing', 'delete', result.data)
             return result.data[0]
+        except ValueError:
+            raise
         except Exception as e:
             raise Exception(f"Error deleting bill record: {str(e)}")
@@ -0,0 +1,43 @@
+from config import supabase, BULK_CHUNK_SIZE
+from services.events import notify_write
+
+def validate_rows(rows, validate):
+    """
+    Validate every row in one pass.
+
+    Returns the (index, row) pairs that passed and a list of per-row errors,
+    where index is the row's position in the request payload.
+    """
+    if not isinstance(rows, list):
+        raise ValueError("Expected a list of records")
+
+    valid, errors = [], []
+    for index, row in enumerate(rows):
+        try:
+            if not isinstance(row, dict):
+                raise ValueError("Record must be an object")
+            validate(row)
+            valid.append((index, row))
+        except ValueError as e:
+            errors.append({"index": index, "error": str(e)})
+    return valid, errors
+
+def insert_in_chunks(table, rows, chunk_size=None):
+    """
+    Insert (index, row) pairs with one request per chunk.
+
+    Returns the inserted (index, record) pairs and the errors of chunks that
+    failed; a failed chunk does not stop the remaining ones.
+    """
+    chunk_size = chunk_size or BULK_CHUNK_SIZE
+    inserted, errors = [], []
+    for start in range(0, len(rows), chunk_size):
+        chunk = rows[start:start + chunk_size]
+        try:
+            result = supabase.table(table).insert([row for _, row in chunk]).execute()
+        except Exception as e:
+            errors.extend({"index": index, "error": str(e)} for index, _ in chunk)
+            continue
+        notify_write(table, 'insert', result.data)
+        inserted.extend(zip([index for index, _ in chunk], result.data))
+    return inserted, errors
@@ -0,0 +1,122 @@
+import time
+import threading
+from collections import OrderedDict
+from config import RECORD_CACHE_SIZE, RECORD_CACHE_TTL
+from services.events import on_write
+
+# Primary key of each table, used to key cached rows
+PRIMARY_KEYS = {
+    'stock': 'item_id',
+    'sales': 'item_id',
+    'stitching': 'stitching_id',
+    'billing': 'bill_id'
+}
+
+class RecordCache:
+    """Bounded LRU cache of single rows keyed by (table, id), with a TTL."""
+
+    def __init__(self, max_size=RECORD_CACHE_SIZE, ttl=RECORD_CACHE_TTL):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        # Keys being loaded, with the generation each load started at
+        self._loading = {}
+        self._generation = 0
+        self._lock = threading.Lock()
+
+    def get_or_load(self, table, record_id, loader):
+        """Return the cached row, or call loader() and cache what it returns."""
+        key = (table, str(record_id))
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] > time.monotonic():
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return dict(entry[1])
+            self.misses += 1
+            self._generation += 1
+            generation = self._loading[key] = self._generation
+
+        try:
+            row = loader()
+        except Exception:
+            with self._lock:
+                if self._loading.get(key) == generation:
+                    del self._loading[key]
+            raise
+
+        with self._lock:
+            # A write or invalidation during the load dropped the key, so the row may be stale
+            if self._loading.get(key) == generation:
+                del self._loading[key]
+                self._store(key, row)
+        return dict(row)
+
+    def set(self, table, record_id, row):
+        """Store a row, evicting the least recently used entry when full."""
+        key = (table, str(record_id))
+        with self._lock:
+            self._loading.pop(key, None)
+            self._store(key, row)
+
+    def _store(self, key, row):
+        if self.max_size <= 0:
+            return
+        self._entries[key] = (time.monotonic() + self.ttl, dict(row))
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+    def invalidate(self, table, record_id):
+        """Remove a row from the cache if present, and drop any load of it in flight."""
+        key = (table, str(record_id))
+        with self._lock:
+            self._entries.pop(key, None)
+            self._loading.pop(key, None)
+
+    def drop_stale(self, table, record_id, updated_at):
+        """Remove a cached row unless it is the version stamped `updated_at`."""
+        key = (table, str(record_id))
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[1].get('updated_at') != updated_at:
+                del self._entries[key]
+
+    def clear(self):
+        """Remove all rows and reset the counters."""
+        with self._lock:
+            self._entries.clear()
+            self._loading.clear()
+            self.hits = 0
+            self.misses = 0
+
+    def stats(self):
+        """Return the hit/miss counters and current size."""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0,
+                "size": len(self._entries),
+                "max_size": self.max_size,
+                "ttl": self.ttl
+            }
+
+record_cache = RecordCache()
+
+@on_write
+def _refresh_cached_rows(table, action, rows):
+    """Keep cached rows in step with inserts, updates and deletes."""
+    key = PRIMARY_KEYS.get(table)
+    if key is None:
+        return
+    for row in rows:
+        if key not in row:
+            continue
+        if action == 'delete':
+            record_cache.invalidate(table, row[key])
+        else:
+            record_cache.set(table, row[key], row)
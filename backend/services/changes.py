@@ -0,0 +1,213 @@
+"""
+Change feed of the rows written to each table, for delta sync.
+
+The feed is read from the database, so it sees every write whichever worker
+served it, and writes made straight in Supabase too (sql/change_tracking.sql):
+each table stamps updated_at on insert and update, and each delete leaves a
+tombstone in deleted_rows. A client loads a snapshot once, then polls
+changes_since with the cursor of its last response (or a timestamp) and gets
+only the rows inserted or updated since, plus the ids deleted since.
+
+A cursor holds the (updated_at, primary key) of the last row seen and the
+(deleted_at, change_id) of the last tombstone seen. Stamps are taken when a
+row is written, not when its transaction commits, so a row stamped earlier
+can show up after one stamped later; the feed only hands out changes stamped
+more than CHANGE_FEED_LAG seconds ago, by which time every transaction that
+stamped them has committed. Without a cursor or a timestamp the response has
+reset=True and the head cursor; take it before loading the snapshot, the
+changes of the last CHANGE_FEED_LAG seconds are then sent again rather than
+missed.
+"""
+import json
+import base64
+from datetime import datetime, timedelta, timezone
+from config import supabase, CHANGE_FEED_LAG, MAX_PAGE_SIZE
+from services.cache import PRIMARY_KEYS
+from services.rpc import missing_function
+from services.pagination import fetch_page, encode_cursor, decode_cursor, resolve_page_size
+
+TOMBSTONES = 'deleted_rows'
+TOMBSTONE_COLUMNS = 'change_id, row_id, deleted_at'
+
+class ChangeFeed:
+    """Rows changed after a cursor, read from updated_at and the deleted_rows tombstones."""
+    # Cleared when the database lacks change_head from sql/change_tracking.sql, until restart
+    head_function = True
+
+    def changes_since(self, table, cursor=None, since=None, limit=None):
+        """
+        Return the rows of `table` changed after a cursor or an ISO timestamp.
+
+        At most `limit` changed rows and `limit` deleted ids are read; has_more
+        tells the client to poll again straight away with the returned cursor.
+        """
+        key = PRIMARY_KEYS[table]
+        page_size = resolve_page_size(limit)
+
+        if cursor:
+            rows_after, deleted_after = self._parse_cursor(cursor)
+        elif since:
+            rows_after = deleted_after = encode_cursor(self._parse_timestamp(since), 0)
+        else:
+            return self._response([], [], self.head_cursor(table), False, reset=True)
+
+        settled = self._settled()
+        rows = fetch_page(
+            table, key, rows_after, page_size,
+            filters=[('lt', 'updated_at', settled)], sort='updated_at'
+        )
+        tombstones = fetch_page(
+            TOMBSTONES, 'change_id', deleted_after, page_size, columns=TOMBSTONE_COLUMNS,
+            filters=[('eq', 'table_name', table), ('lt', 'deleted_at', settled)], sort='deleted_at'
+        )
+
+        if rows['items']:
+            last = rows['items'][-1]
+            rows_after = encode_cursor(last['updated_at'], last[key])
+        if tombstones['items']:
+            last = tombstones['items'][-1]
+            deleted_after = encode_cursor(last['deleted_at'], last['change_id'])
+
+        deleted = list(dict.fromkeys(row['row_id'] for row in tombstones['items']))
+        gone = set(deleted)
+        upserted = [row for row in rows['items'] if row[key] not in gone]
+        has_more = rows['next_cursor'] is not None or tombstones['next_cursor'] is not None
+        return self._response(upserted, deleted, self._cursor(rows_after, deleted_after), has_more)
+
+    def head_cursor(self, table):
+        """Cursor of `table` positioned at the settled point, without a query."""
+        position = encode_cursor(self._settled(), 0)
+        return self._cursor(position, position)
+
+    def last_change(self, table):
+        """
+        Return (updated_at of the newest row, deleted_at and change_id of the
+        newest tombstone) of `table`, None where it has none.
+
+        One rpc round trip (sql/change_tracking.sql), two queries while the
+        function is not installed.
+        """
+        if ChangeFeed.head_function:
+            try:
+                result = supabase.rpc('change_head', {'target_table': table}).execute()
+                head = result.data[0] if isinstance(result.data, list) else result.data
+                return head['updated_at'], head['deleted_at'], head['change_id']
+            except Exception as e:
+                if not missing_function(e):
+                    raise
+                ChangeFeed.head_function = False
+
+        newest = supabase.table(table).select('updated_at').order('updated_at', desc=True).limit(1).execute().data
+        tombstone = (
+            supabase.table(TOMBSTONES)
+            .select(TOMBSTONE_COLUMNS)
+            .eq('table_name', table)
+            .order('deleted_at', desc=True)
+            .order('change_id', desc=True)
+            .limit(1)
+            .execute()
+            .data
+        )
+        return (
+            newest[0]['updated_at'] if newest else None,
+            tombstone[0]['deleted_at'] if tombstone else None,
+            tombstone[0]['change_id'] if tombstone else None
+        )
+
+    def is_settled(self, stamp):
+        """True when `stamp` is older than the lag, so every write stamped before it has committed."""
+        return _moment(stamp) < _moment(self._settled())
+
+    def pull_changes(self, table, cursor):
+        """
+        Read every change after `cursor`: (upserted rows, deleted ids, new cursor).
+
+        Changes inside the lag are returned too, so the caller sees its own
+        writes at once, but the new cursor stops before them and they are read
+        again by the next pull.
+        """
+        key = PRIMARY_KEYS[table]
+        settled = _moment(self._settled())
+        rows_after, deleted_after = self._parse_cursor(cursor)
+
+        upserted = {}
+        for row in self._drain(table, key, 'updated_at', rows_after):
+            upserted[row[key]] = row
+            if _moment(row['updated_at']) < settled:
+                rows_after = encode_cursor(row['updated_at'], row[key])
+
+        deleted = {}
+        tombstones = self._drain(
+            TOMBSTONES, 'change_id', 'deleted_at', deleted_after,
+            columns=TOMBSTONE_COLUMNS, filters=[('eq', 'table_name', table)]
+        )
+        for row in tombstones:
+            upserted.pop(row['row_id'], None)
+            deleted[row['row_id']] = True
+            if _moment(row['deleted_at']) < settled:
+                deleted_after = encode_cursor(row['deleted_at'], row['change_id'])
+
+        return list(upserted.values()), list(deleted), self._cursor(rows_after, deleted_after)
+
+    @staticmethod
+    def _drain(table, key, sort, position, columns='*', filters=None):
+        """Yield every row after `position` in (sort, key) order."""
+        while True:
+            page = fetch_page(table, key, position, MAX_PAGE_SIZE, columns, filters, sort=sort)
+            yield from page['items']
+            position = page['next_cursor']
+            if position is None:
+                return
+
+    @staticmethod
+    def _settled():
+        """Stamps before this moment belong to committed transactions."""
+        moment = datetime.now(timezone.utc) - timedelta(seconds=CHANGE_FEED_LAG)
+        return moment.isoformat(timespec='microseconds')
+
+    @staticmethod
+    def _response(upserted, deleted, cursor, has_more, reset=False):
+        return {
+            "upserted": upserted,
+            "deleted": deleted,
+            "cursor": cursor,
+            "has_more": has_more,
+            "reset": reset,
+            "as_of": datetime.now(timezone.utc).isoformat()
+        }
+
+    @staticmethod
+    def _cursor(rows_after, deleted_after):
+        position = {"rows": rows_after, "deleted": deleted_after}
+        return base64.urlsafe_b64encode(json.dumps(position).encode()).decode()
+
+    @staticmethod
+    def _parse_cursor(cursor):
+        """Return the row position and the tombstone position of a cursor."""
+        try:
+            position = json.loads(base64.urlsafe_b64decode(str(cursor).encode()))
+            rows_after, deleted_after = position['rows'], position['deleted']
+            decode_cursor(rows_after)
+            decode_cursor(deleted_after)
+        except (ValueError, TypeError, KeyError):
+            raise ValueError(f"Invalid cursor: {cursor}")
+        return rows_after, deleted_after
+
+    @staticmethod
+    def _parse_timestamp(since):
+        """Normalize a timestamp to the UTC ISO form updated_at is compared in."""
+        try:
+            moment = _moment(since)
+        except ValueError:
+            raise ValueError(f"Invalid timestamp: {since}")
+        return moment.isoformat(timespec='microseconds')
+
+def _moment(value):
+    """Parse an ISO timestamp as an aware UTC datetime, naive ones taken as UTC."""
+    moment = datetime.fromisoformat(str(value).replace('Z', '+00:00'))
+    if moment.tzinfo is None:
+        moment = moment.replace(tzinfo=timezone.utc)
+    return moment.astimezone(timezone.utc)
+
+# Shared by all managers
+change_feed = ChangeFeed()
@@ -0,0 +1,150 @@
+"""
+NDJSON, CSV and Parquet encoders for the table exports.
+
+Each takes the page iterator returned by the managers' export_* methods and
+yields the encoded file in chunks, one chunk per page, so an export never
+holds more than a page of rows in memory.
+"""
+import io
+import csv
+import json
+
+CONTENT_TYPES = {
+    'ndjson': 'application/x-ndjson',
+    'csv': 'text/csv',
+    'parquet': 'application/vnd.apache.parquet'
+}
+
+# Parquet types of the columns of each table, in table order
+COLUMN_TYPES = {
+    'stock': {
+        'item_id': 'int64', 'vendor_id': 'int64', 'item_name': 'string', 'size': 'string',
+        'quantity': 'int64', 'cost_price': 'float64', 'selling_price': 'float64', 'margin': 'float64',
+        'order_date': 'string', 'sold': 'bool_', 'updated_at': 'string'
+    },
+    'sales': {
+        'item_id': 'int64', 'item_name': 'string', 'cost_price': 'float64', 'selling_price': 'float64',
+        'margin': 'float64', 'mode': 'string', 'cust_name': 'string', 'order_date': 'string',
+        'expected_date': 'string', 'stitching': 'bool_', 'shipping': 'string', 'cust_address': 'string',
+        'additional_details': 'string', 'updated_at': 'string'
+    },
+    'stitching': {
+        'stitching_id': 'int64', 'item_id': 'int64', 'item_name': 'string', 'cust_name': 'string',
+        'stitching_preference': 'string', 'tailor_price': 'float64', 'selling_price': 'float64',
+        'order_date': 'string', 'expected_date': 'string', 'additional_details': 'string', 'updated_at': 'string'
+    },
+    'billing': {
+        'bill_id': 'int64', 'item_id': 'int64', 'total_amount': 'float64', 'bill_date': 'string',
+        'stitching_id': 'int64', 'updated_at': 'string'
+    }
+}
+
+def encode_export(pages, export_format='ndjson', table=None):
+    """Return the chunk iterator and content type for an export format of `table`."""
+    encoders = {
+        'ndjson': iter_ndjson,
+        'csv': iter_csv,
+        'parquet': lambda pages: iter_parquet(pages, table)
+    }
+    if export_format not in encoders:
+        raise ValueError(f"Unsupported export format: {export_format}")
+    return encoders[export_format](pages), CONTENT_TYPES[export_format]
+
+def iter_ndjson(pages):
+    """Yield newline-delimited JSON, one line per row."""
+    for rows in pages:
+        yield ''.join(json.dumps(row, default=str) + '\n' for row in rows)
+
+def iter_csv(pages):
+    """Yield CSV text, the header taken from the first row."""
+    buffer = io.StringIO()
+    writer = None
+    for rows in pages:
+        for row in rows:
+            if writer is None:
+                writer = csv.DictWriter(buffer, fieldnames=list(row), extrasaction='ignore')
+                writer.writeheader()
+            writer.writerow(row)
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+
+def iter_parquet(pages, table=None):
+    """Yield a Parquet file of `table` with one row group per page."""
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError:
+        raise ValueError("Parquet export requires the pyarrow package")
+
+    def generate():
+        sink = _ChunkSink()
+        writer = None
+        for rows in pages:
+            if not rows:
+                continue
+            if writer is None:
+                schema = _parquet_schema(pa, table, rows[0])
+                writer = pq.ParquetWriter(sink, schema, compression='zstd')
+            writer.write_table(_page_table(pa, rows, schema))
+            yield sink.drain()
+
+        if writer is None:
+            # No rows: still a valid file, with the table's columns and no row group
+            writer = pq.ParquetWriter(sink, _parquet_schema(pa, table), compression='zstd')
+        writer.close()
+        yield sink.drain()
+
+    return generate()
+
+def _parquet_schema(pa, table, row=None):
+    """
+    Schema of the export, from the table's column types rather than the data.
+
+    The file's schema is fixed by its first row group, so it must not depend
+    on what the first page happens to hold: a column that is null there may
+    hold numbers further down. Columns missing from COLUMN_TYPES are text.
+    Without a row the schema has every column of the table.
+    """
+    types = COLUMN_TYPES.get(table, {})
+    return pa.schema([(name, getattr(pa, types.get(name, 'string'))()) for name in (row or types)])
+
+def _page_table(pa, rows, schema):
+    """Convert a page to the export schema, writing unexpected values of text columns as text."""
+    try:
+        return pa.Table.from_pylist(rows, schema=schema)
+    except (pa.ArrowTypeError, pa.ArrowInvalid):
+        text = [field.name for field in schema if pa.types.is_string(field.type)]
+        rows = [
+            {**row, **{name: str(row[name]) for name in text if row.get(name) is not None}}
+            for row in rows
+        ]
+        return pa.Table.from_pylist(rows, schema=schema)
+
+class _ChunkSink:
+    """Write-only file that hands out what was written so far in chunks."""
+
+    def __init__(self):
+        self.closed = False
+        self._chunks = []
+        self._position = 0
+
+    def write(self, data):
+        self._chunks.append(bytes(data))
+        self._position += len(data)
+        return len(data)
+
+    def tell(self):
+        # Parquet footers store absolute offsets, so count every byte written
+        return self._position
+
+    def flush(self):
+        pass
+
+    def close(self):
+        self.closed = True
+
+    def drain(self):
+        data = b''.join(self._chunks)
+        self._chunks = []
+        return data
@@ -0,0 +1,68 @@
+"""
+Negotiated gzip / brotli compression of response bodies.
+
+Bodies under COMPRESS_MIN_SIZE are sent as they are, where the CPU time would
+outweigh the bytes saved. Brotli is used when the brotli package is installed
+and the client accepts it, gzip otherwise. Streamed exports are left alone.
+"""
+import gzip
+from config import COMPRESS_MIN_SIZE, GZIP_LEVEL, BROTLI_QUALITY
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# Textual responses worth compressing; Parquet is already compressed
+COMPRESSIBLE_TYPES = ('application/json', 'application/x-ndjson', 'text/csv', 'text/plain', 'text/html')
+
+def choose_encoding(accept_encoding):
+    """Pick 'br' or 'gzip' from an Accept-Encoding header, or None."""
+    accepted = {}
+    for part in (accept_encoding or '').split(','):
+        name, _, params = part.strip().partition(';')
+        quality = 1.0
+        if params.strip().startswith('q='):
+            try:
+                quality = float(params.strip()[2:])
+            except ValueError:
+                quality = 0.0
+        accepted[name.strip().lower()] = quality
+
+    if brotli is not None and accepted.get('br', 0) > 0:
+        return 'br'
+    if accepted.get('gzip', accepted.get('*', 0)) > 0:
+        return 'gzip'
+    return None
+
+def compress(body, encoding):
+    """Compress bytes with 'br' or 'gzip'."""
+    if encoding == 'br':
+        return brotli.compress(body, quality=BROTLI_QUALITY)
+    return gzip.compress(body, compresslevel=GZIP_LEVEL)
+
+def compressed_body(body, mimetype, accept_encoding):
+    """
+    Return (body, encoding) for a response, encoding None when it is sent as is.
+
+    Only textual bodies of at least COMPRESS_MIN_SIZE bytes are compressed.
+    """
+    if mimetype not in COMPRESSIBLE_TYPES or len(body) < COMPRESS_MIN_SIZE:
+        return body, None
+    encoding = choose_encoding(accept_encoding)
+    if encoding is None:
+        return body, None
+    return compress(body, encoding), encoding
+
+def compress_response(response, accept_encoding):
+    """Compress a buffered Flask response in place when the client accepts it."""
+    if response.status_code != 200 or response.is_streamed or response.direct_passthrough:
+        return response
+    if 'Content-Encoding' in response.headers:
+        return response
+    response.vary.add('Accept-Encoding')
+    body, encoding = compressed_body(response.get_data(), response.mimetype, accept_encoding)
+    if encoding:
+        response.set_data(body)
+        response.headers['Content-Encoding'] = encoding
+    return response
@@ -0,0 +1,112 @@
+"""
+Customer ledgers built from the rows of one customer, matched on normalized cust_name.
+
+Sales and stitching orders are fetched with a case-insensitive cust_name
+match (the trigram indexes of sql/search_indexes.sql), so every ledger reads
+the database as it is now and no table is held in memory. Bills carry no
+customer name; they are found through the sale (item_id) or stitching order
+they belong to.
+"""
+import re
+from datetime import date
+from services.pagination import iter_pages
+from services.home import HomeAnalytics
+
+# Ids per billing lookup, keeping the in.(...) filter well within URL limits
+BILL_LOOKUP_CHUNK = 100
+
+# Wildcards and escapes become * in the name pattern, the exact match is made in Python
+_LIKE_UNSAFE = re.compile(r'[*%_\\]+')
+
+def normalize_name(name):
+    """Case- and whitespace-insensitive form of a customer name."""
+    return ' '.join(str(name or '').split()).casefold()
+
+def find_customer(cust_name):
+    """Return (name, sales, stitching, bills) of a customer, None when unknown."""
+    name = normalize_name(cust_name)
+    if not _LIKE_UNSAFE.sub('', name).strip():
+        # The pattern would match every customer
+        raise ValueError(f"Invalid customer name: {cust_name}")
+    # Any run of whitespace may separate the words, the exact match is checked below
+    pattern = '*' + '*'.join(_LIKE_UNSAFE.sub('*', word) for word in name.split()) + '*'
+
+    def orders(table, key):
+        pages = iter_pages(table, key, filters=[('ilike', 'cust_name', pattern)])
+        return [row for page in pages for row in page if normalize_name(row.get('cust_name')) == name]
+
+    sales = orders('sales', 'item_id')
+    stitching = orders('stitching', 'stitching_id')
+    if not (sales or stitching):
+        return None
+
+    bills = {}
+    for column, ids in (('item_id', [row['item_id'] for row in sales]),
+                        ('stitching_id', [row['stitching_id'] for row in stitching])):
+        for start in range(0, len(ids), BILL_LOOKUP_CHUNK):
+            chunk = ids[start:start + BILL_LOOKUP_CHUNK]
+            for page in iter_pages('billing', 'bill_id', filters=[('in_', column, chunk)]):
+                bills.update((row['bill_id'], row) for row in page)
+
+    display_name = ' '.join((sales or stitching)[-1]['cust_name'].split())
+    return display_name, sales, stitching, list(bills.values())
+
+
+class CustomerManager:
+    def get_customer_ledger(self, cust_name):
+        """Fetch a customer's sales, stitching orders and bills with totals and open orders."""
+        try:
+            if not cust_name or not normalize_name(cust_name):
+                raise ValueError("cust_name is required")
+            found = find_customer(cust_name)
+            if found is None:
+                raise ValueError(f"No orders found for customer {cust_name}")
+            name, sales, stitching, bills = found
+            return self._build_ledger(name, sales, stitching, bills, date.today().isoformat())
+        except ValueError:
+            raise
+        except Exception as e:
+            raise Exception(f"Error fetching customer ledger: {str(e)}")
+
+    @staticmethod
+    def _build_ledger(name, sales, stitching, bills, today):
+        """Combine a customer's records into the ledger response."""
+        by_date = lambda row: str(row.get('order_date') or row.get('bill_date') or '')
+        sales.sort(key=by_date)
+        stitching.sort(key=by_date)
+        bills.sort(key=by_date)
+
+        sales_amount = sum(row.get('selling_price') or 0 for row in sales)
+        stitching_amount = sum(row.get('selling_price') or 0 for row in stitching)
+        billed_amount = sum(row.get('total_amount') or 0 for row in bills)
+
+        # Same split as the dashboard: pending once the expected date has passed
+        pending_sales, working_sales = HomeAnalytics._split_by_expected_date(
+            [row for row in sales if row.get('expected_date')], today
+        )
+        pending_stitching, working_stitching = HomeAnalytics._split_by_expected_date(
+            [row for row in stitching if row.get('expected_date')], today
+        )
+
+        return {
+            "customer": name,
+            "sales": sales,
+            "stitching": stitching,
+            "bills": bills,
+            "totals": {
+                "sales_count": len(sales),
+                "sales_amount": sales_amount,
+                "stitching_count": len(stitching),
+                "stitching_amount": stitching_amount,
+                "bill_count": len(bills),
+                "billed_amount": billed_amount,
+                "unbilled_amount": sales_amount + stitching_amount - billed_amount
+            },
+            "pending_orders": {
+                "pending_sales": pending_sales,
+                "working_sales": working_sales,
+                "pending_stitching": pending_stitching,
+                "working_stitching": working_stitching
+            }
+        }
+
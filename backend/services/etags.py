@@ -0,0 +1,35 @@
+"""
+ETags of the list and detail routes, derived from the database.
+
+A collection's tag is built from its newest updated_at and its newest
+deletion tombstone (sql/change_tracking.sql), read in one round trip; a
+row's tag from the updated_at of the row sent. Either changes with every
+write, whichever worker served it or when it was made straight in Supabase,
+so a 304 never hides fresh data. While a table's newest change is inside the
+change feed lag an earlier write may still be committing, so it gets no tag.
+"""
+import json
+import hashlib
+from config import supabase
+from services.cache import PRIMARY_KEYS
+from services.changes import change_feed
+
+def collection_etag(table, query_string=b''):
+    """ETag of one page of `table`, distinguished by the request's query string."""
+    updated_at, deleted_at, change_id = change_feed.last_change(table)
+    if not all(change_feed.is_settled(stamp) for stamp in (updated_at, deleted_at) if stamp):
+        return None
+    head = json.dumps([updated_at, deleted_at, change_id])
+    digest = hashlib.sha1(head.encode() + b'?' + query_string).hexdigest()[:16]
+    return f"{table}-{digest}"
+
+def row_version(table, record_id):
+    """updated_at of one row in the database, None when the row is missing."""
+    key = PRIMARY_KEYS[table]
+    rows = supabase.table(table).select('updated_at').eq(key, record_id).limit(1).execute().data
+    return rows[0]['updated_at'] if rows else None
+
+def row_etag(table, record_id, updated_at):
+    """ETag of one version of a row, unchanged by writes to other rows of the table."""
+    digest = hashlib.sha1(str(updated_at).encode()).hexdigest()[:16]
+    return f"{table}-{record_id}-{digest}"
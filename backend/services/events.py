@@ -0,0 +1,19 @@
+"""
+Write notifications shared by the service managers.
+
+Managers call notify_write after every successful insert, update or delete so
+that caches and indexes built on top of the tables can stay in sync without
+the managers knowing about them.
+"""
+
+_listeners = []
+
+def on_write(callback):
+    """Register a callback(table, action, rows) run after every write."""
+    _listeners.append(callback)
+    return callback
+
+def notify_write(table, action, rows=None):
+    """Tell all listeners that rows of `table` were inserted, updated or deleted."""
+    for callback in _listeners:
+        callback(table, action, rows or [])
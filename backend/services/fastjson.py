@@ -0,0 +1,35 @@
+"""
+Optional orjson-backed JSON provider for the Flask app (FAST_JSON=true).
+
+orjson serializes the list and analytics payloads several times faster than
+the standard library encoder. Keys keep their row order instead of being
+sorted. OrjsonProvider is None when orjson is not installed.
+"""
+from flask.json.provider import DefaultJSONProvider
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+class _OrjsonProvider(DefaultJSONProvider):
+    """DefaultJSONProvider with orjson doing the encoding and decoding."""
+
+    # Non-string keys, e.g. integer ids, are written as strings like json.dumps does
+    options = orjson.OPT_NON_STR_KEYS if orjson else 0
+
+    def dumps(self, obj, **kwargs):
+        return self.encode(obj).decode()
+
+    def loads(self, s, **kwargs):
+        return orjson.loads(s)
+
+    def encode(self, obj):
+        # DefaultJSONProvider.default covers Decimal and the other types orjson lacks
+        return orjson.dumps(obj, default=self.default, option=self.options)
+
+    def response(self, *args, **kwargs):
+        obj = self._prepare_response_obj(args, kwargs)
+        return self._app.response_class(self.encode(obj) + b'\n', mimetype=self.mimetype)
+
+OrjsonProvider = _OrjsonProvider if orjson else None
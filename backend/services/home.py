@@ -1,28 +1,73 @@
-from config import supabase
+import time
+from config import supabase, ANALYTICS_CACHE_TTL
 from datetime import date
+from services.events import on_write
+from services.rpc import missing_function
+from services.rollups import sales_rollup
+from services.stock_analytics import stock_report
+
+# Columns shown for pending and working orders on the dashboard
+SALES_ORDER_COLUMNS = 'item_id, item_name, cust_name, mode, selling_price, order_date, expected_date'
+STITCHING_ORDER_COLUMNS = 'stitching_id, item_id, item_name, cust_name, stitching_preference, selling_price, order_date, expected_date'
+
+# Classified pending orders, valid for `date` until the next sales/stitching write or `expires`
+_pending_cache = {'date': None, 'result': None, 'expires': 0.0, 'version': 0}
 
 class HomeAnalytics:
+    # Cleared when the database lacks sql/summary_metrics.sql, until restart
+    summary_function = True
+
     def get_summary_metrics(self):
         """Fetch key metrics for the dashboard."""
+        if HomeAnalytics.summary_function:
+            try:
+                return self._fetch_summary_metrics()
+            except Exception as e:
+                if not missing_function(e):
+                    raise Exception(f"Error fetching summary metrics: {str(e)}")
+                # Function not installed yet, compute the metrics from the tables
+                HomeAnalytics.summary_function = False
+        return self._compute_summary_metrics()
+
+    def _fetch_summary_metrics(self):
+        """Fetch key metrics aggregated in the database (sql/summary_metrics.sql)."""
+        result = supabase.rpc('summary_metrics').execute()
+        metrics = result.data[0] if isinstance(result.data, list) else result.data
+        return {
+            "total_sales": metrics['total_sales'],
+            "total_stitching_orders": metrics['total_stitching_orders'],
+            "total_revenue": metrics['total_revenue']
+        }
+
+    def _compute_summary_metrics(self):
+        """Fetch key metrics by summing the table rows on the client."""
         try:
+            return self._summarize(*[query() for query in self._summary_queries()])
+        except Exception as e:
+            raise Exception(f"Error fetching summary metrics: {str(e)}")
+
+    @staticmethod
+    def _summary_queries():
+        """The independent queries behind the client-side summary metrics."""
+        return [
             # Total Sales Count
-            total_sales = supabase.table('sales').select('item_id', count='exact').execute().count
-            
+            lambda: supabase.table('sales').select('item_id', count='exact').execute(),
             # Total Stitching Orders
-            total_stitching_orders = supabase.table('stitching').select('stitching_id', count='exact').execute().count
-            
+            lambda: supabase.table('stitching').select('stitching_id', count='exact').execute(),
             # Total Revenue (Sales + Stitching)
-            sales_revenue = supabase.table('sales').select('selling_price').execute()
-            stitching_revenue = supabase.table('stitching').select('selling_price').execute()
-            total_revenue = sum(item['selling_price'] for item in sales_revenue.data) + sum(item['selling_price'] for item in stitching_revenue.data)
-            
-            return {
-                "total_sales": total_sales,
-                "total_stitching_orders": total_stitching_orders,
-                "total_revenue": total_revenue
-            }
-        except Exception as e:
-            raise Exception(f"Error fetching summary metrics: {str(e)}")
+            lambda: supabase.table('sales').select('selling_price').execute(),
+            lambda: supabase.table('stitching').select('selling_price').execute()
+        ]
+
+    @staticmethod
+    def _summarize(sales_count, stitching_count, sales_revenue, stitching_revenue):
+        """Combine the results of _summary_queries into the summary metrics."""
+        total_revenue = sum(item['selling_price'] for item in sales_revenue.data) + sum(item['selling_price'] for item in stitching_revenue.data)
+        return {
+            "total_sales": sales_count.count,
+            "total_stitching_orders": stitching_count.count,
+            "total_revenue": total_revenue
+        }
 
     def get_monthly_sales(self):
         """Fetch monthly sales data."""
@@ -31,29 +76,92 @@ class HomeAnalytics:
             return result.data
         except Exception as e:
             raise Exception(f"Error fetching monthly sales data: {str(e)}")
-    
+
+    def get_sales_rollup(self, granularity='month', start_date=None, end_date=None):
+        """Fetch sales and stitching revenue, cost and margin by day, week or month."""
+        try:
+            return sales_rollup(granularity, start_date, end_date)
+        except ValueError:
+            raise
+        except Exception as e:
+            raise Exception(f"Error fetching sales rollup: {str(e)}")
+
+    def get_stock_report(self, low_stock_threshold=None, limit=None):
+        """Fetch margin by vendor, size and item, stock aging, unsold value and low-stock alerts."""
+        try:
+            return stock_report(low_stock_threshold, limit)
+        except ValueError:
+            raise
+        except Exception as e:
+            raise Exception(f"Error fetching stock report: {str(e)}")
+
     def get_pending_orders(self):
         """Fetch all pending and working orders based on expected date."""
         try:
             today = date.today().isoformat()
-            
-            # Fetch pending sales (expected_date has passed)
-            pending_sales = supabase.table('sales').select('*').lt('expected_date', today).execute()
-            
-            # Fetch working sales (between order_date and expected_date)
-            working_sales = supabase.table('sales').select('*').gte('expected_date', today).execute()
-            
-            # Fetch pending stitching (expected_date has passed)
-            pending_stitching = supabase.table('stitching').select('*').lt('expected_date', today).execute()
-            
-            # Fetch working stitching (between order_date and expected_date)
-            working_stitching = supabase.table('stitching').select('*').gte('expected_date', today).execute()
-            
-            return {
-                "pending_sales": pending_sales.data,
-                "working_sales": working_sales.data,
-                "pending_stitching": pending_stitching.data,
-                "working_stitching": working_stitching.data
-            }
+
+            # Serve from cache until the date changes, a sales/stitching write happens or it expires
+            cached = self._cached_pending_orders(today)
+            if cached is not None:
+                return cached
+
+            version = _pending_cache['version']
+            return self._classify_pending_orders(
+                self._fetch_open_orders('sales'),
+                self._fetch_open_orders('stitching'),
+                today,
+                version
+            )
         except Exception as e:
             raise Exception(f"Error fetching pending orders: {str(e)}")
+
+    @staticmethod
+    def _cached_pending_orders(today):
+        """Return the cached classification if it is still valid for today."""
+        if _pending_cache['date'] == today and _pending_cache['expires'] > time.monotonic():
+            return _pending_cache['result']
+        return None
+
+    @staticmethod
+    def _fetch_open_orders(table):
+        """Fetch the dashboard columns of every row with an expected date."""
+        columns = SALES_ORDER_COLUMNS if table == 'sales' else STITCHING_ORDER_COLUMNS
+        return supabase.table(table).select(columns).not_.is_('expected_date', 'null').execute().data
+
+    def _classify_pending_orders(self, sales_rows, stitching_rows, today, version):
+        """Split both tables into pending and working orders and cache the result."""
+        pending_sales, working_sales = self._split_by_expected_date(sales_rows, today)
+        pending_stitching, working_stitching = self._split_by_expected_date(stitching_rows, today)
+
+        result = {
+            "pending_sales": pending_sales,
+            "working_sales": working_sales,
+            "pending_stitching": pending_stitching,
+            "working_stitching": working_stitching
+        }
+
+        # Only cache if no write happened while we were fetching
+        if _pending_cache['version'] == version:
+            _pending_cache.update(date=today, result=result, expires=time.monotonic() + ANALYTICS_CACHE_TTL)
+
+        return result
+
+    @staticmethod
+    def _split_by_expected_date(rows, today):
+        """Split rows into pending (expected_date has passed) and working orders in one pass."""
+        pending, working = [], []
+        for row in rows:
+            # ISO dates compare correctly as strings
+            if row['expected_date'][:10] < today:
+                pending.append(row)
+            else:
+                working.append(row)
+        return pending, working
+
+
+@on_write
+def _invalidate_pending_orders(table, action, rows):
+    """Drop the cached pending orders when sales or stitching change."""
+    if table in ('sales', 'stitching'):
+        _pending_cache['version'] += 1
+        _pending_cache['result'] = None
@@ -0,0 +1,99 @@
+"""
+Prometheus metrics for the API and for every Supabase call.
+
+Request latency and error counts are recorded by the hooks that main.py and
+asgi.py install; Supabase calls are timed by SupabaseMetricsTransport, which
+wraps the HTTP transport of the shared client in config.py.
+"""
+import os
+import time
+import httpx
+from prometheus_client import (
+    Counter, Histogram, CollectorRegistry, CONTENT_TYPE_LATEST, generate_latest, multiprocess
+)
+
+REQUEST_LATENCY = Histogram(
+    'api_request_duration_seconds', 'API request latency by route',
+    ['method', 'route']
+)
+REQUEST_ERRORS = Counter(
+    'api_request_errors_total', 'API error responses by route and status code',
+    ['method', 'route', 'status']
+)
+QUERY_LATENCY = Histogram(
+    'supabase_query_duration_seconds', 'Supabase call latency by table and operation',
+    ['table', 'operation']
+)
+QUERY_ROWS = Counter(
+    'supabase_query_rows_total', 'Rows returned by Supabase calls by table and operation',
+    ['table', 'operation']
+)
+
+# PostgREST verbs for each HTTP method
+OPERATIONS = {
+    'GET': 'select',
+    'HEAD': 'count',
+    'POST': 'insert',
+    'PATCH': 'update',
+    'PUT': 'upsert',
+    'DELETE': 'delete'
+}
+
+def observe_request(method, route, status, started):
+    """Record the latency of a finished request and count it if it failed."""
+    REQUEST_LATENCY.labels(method, route).observe(time.perf_counter() - started)
+    if status >= 400:
+        REQUEST_ERRORS.labels(method, route, str(status)).inc()
+
+def render_metrics():
+    """Return all metrics in the Prometheus text format and its content type."""
+    if 'PROMETHEUS_MULTIPROC_DIR' in os.environ:
+        # Several workers, merge the per-process metric files
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        return generate_latest(registry), CONTENT_TYPE_LATEST
+    return generate_latest(), CONTENT_TYPE_LATEST
+
+def describe_call(request):
+    """Return the (table, operation) labels of a Supabase HTTP request."""
+    parts = request.url.path.strip('/').split('/')
+    if parts[:2] == ['rest', 'v1'] and len(parts) > 2:
+        if parts[2] == 'rpc' and len(parts) > 3:
+            return parts[3], 'rpc'
+        return parts[2], OPERATIONS.get(request.method, request.method.lower())
+    # Auth, storage and other Supabase services
+    return parts[0] if parts and parts[0] else 'unknown', request.method.lower()
+
+def count_rows(response):
+    """
+    Count the rows in a PostgREST response from its Content-Range header.
+
+    None when the header gives no range; the body is never parsed here, the
+    client parses it once already.
+    """
+    span = response.headers.get('content-range', '').split('/')[0]
+    first, _, last = span.partition('-')
+    if not (first.isdigit() and last.isdigit()):
+        return None
+    return int(last) - int(first) + 1
+
+class SupabaseMetricsTransport(httpx.BaseTransport):
+    """HTTP transport that times every Supabase call and counts the rows it returns."""
+
+    def __init__(self, transport):
+        self.transport = transport
+
+    def handle_request(self, request):
+        table, operation = describe_call(request)
+        started = time.perf_counter()
+        response = self.transport.handle_request(request)
+        # Read the body so the timing covers the full transfer
+        response.read()
+        QUERY_LATENCY.labels(table, operation).observe(time.perf_counter() - started)
+        rows = count_rows(response) if response.is_success else None
+        if rows is not None:
+            QUERY_ROWS.labels(table, operation).inc(rows)
+        return response
+
+    def close(self):
+        self.transport.close()
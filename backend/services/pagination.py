@@ -0,0 +1,177 @@
+import json
+import queue
+import itertools
+import base64
+import threading
+from datetime import date, timedelta
+from config import supabase, DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE, EXPORT_PAGE_SIZE, EXPORT_PREFETCH_PAGES
+
+def resolve_page_size(limit=None):
+    """Return a page size within the configured bounds."""
+    if limit is None or limit == '':
+        return DEFAULT_PAGE_SIZE
+    try:
+        page_size = int(limit)
+    except (TypeError, ValueError):
+        raise ValueError(f"Invalid page size: {limit}")
+    if page_size < 1:
+        raise ValueError(f"Invalid page size: {limit}")
+    return min(page_size, MAX_PAGE_SIZE)
+
+def fetch_page(table, key, cursor=None, limit=None, columns='*', filters=None, sort=None, descending=False):
+    """
+    Fetch one page of rows ordered by the primary key, or by `sort` then the key.
+
+    Rows are returned strictly after `cursor` (keyset pagination), so the cost
+    of a page does not grow with its position in the table. One extra row is
+    requested to tell whether another page follows. `filters` is a list of
+    (operator, column, value) tuples such as ('gte', 'order_date', '2024-01-01'),
+    or ('or', None, logic_tree) for an or_() filter. Pages sorted on another
+    column use an opaque cursor holding the sort value and the key.
+    """
+    page_size = resolve_page_size(limit)
+    query = supabase.table(table).select(columns)
+    for operator, column, value in filters or []:
+        query = query.or_(value) if operator == 'or' else getattr(query, operator)(column, value)
+
+    if sort and sort != key:
+        query = query.order(sort, desc=descending, nullsfirst=False).order(key)
+        if cursor is not None and cursor != '':
+            query = query.or_(after_cursor(sort, key, cursor, descending))
+    else:
+        query = query.order(key, desc=descending)
+        if cursor is not None and cursor != '':
+            query = query.lt(key, cursor) if descending else query.gt(key, cursor)
+    rows = query.limit(page_size + 1).execute().data
+
+    next_cursor = None
+    if len(rows) > page_size:
+        rows = rows[:page_size]
+        last = rows[-1]
+        next_cursor = encode_cursor(last[sort], last[key]) if sort and sort != key else last[key]
+
+    return {
+        "items": rows,
+        "next_cursor": next_cursor
+    }
+
+def quote(value):
+    """Quote a value for a PostgREST logic tree."""
+    return '"' + str(value).replace('\\', '\\\\').replace('"', '\\"') + '"'
+
+def encode_cursor(sort_value, key_value):
+    """Opaque cursor of a page sorted on another column than the primary key."""
+    return base64.urlsafe_b64encode(json.dumps([sort_value, key_value]).encode()).decode()
+
+def decode_cursor(cursor):
+    try:
+        sort_value, key_value = json.loads(base64.urlsafe_b64decode(str(cursor).encode()))
+    except (ValueError, TypeError):
+        raise ValueError(f"Invalid cursor: {cursor}")
+    return sort_value, key_value
+
+def after_cursor(sort, key, cursor, descending=False):
+    """
+    Logic tree selecting the rows after `cursor` in (sort, key) order.
+
+    Rows are ordered by sort (nulls last), then by key, so ties on the sort
+    column are broken by the primary key and every row appears exactly once.
+    """
+    sort_value, key_value = decode_cursor(cursor)
+    if sort_value is None:
+        return f'and({sort}.is.null,{key}.gt.{quote(key_value)})'
+    beyond = 'lt' if descending else 'gt'
+    return (
+        f'{sort}.{beyond}.{quote(sort_value)},'
+        f'and({sort}.eq.{quote(sort_value)},{key}.gt.{quote(key_value)}),'
+        f'{sort}.is.null'
+    )
+
+def date_range_filters(column, start_date=None, end_date=None):
+    """
+    Build fetch_page filters for an inclusive date range on `column`.
+
+    The end date is compared as before the next day, so timestamps later in
+    the end day are included. ValueError when either is not a date.
+    """
+    filters = []
+    if start_date:
+        filters.append(('gte', column, _parse_date(start_date, 'start').isoformat()))
+    if end_date:
+        filters.append(('lt', column, (_parse_date(end_date, 'end') + timedelta(days=1)).isoformat()))
+    return filters
+
+def _parse_date(value, bound):
+    try:
+        return date.fromisoformat(str(value)[:10])
+    except ValueError:
+        raise ValueError(f"Invalid {bound} date: {value}")
+
+def iter_pages(table, key, page_size=None, columns='*', filters=None):
+    """
+    Yield every row of a table, one page (list of rows) at a time.
+
+    Pages are fetched on a background thread up to EXPORT_PREFETCH_PAGES ahead
+    of the consumer, so the next request is in flight while the current page
+    is being sent. Memory stays bounded by the prefetch depth.
+    """
+    page_size = resolve_page_size(page_size or EXPORT_PAGE_SIZE)
+
+    def pages():
+        cursor = None
+        while True:
+            page = fetch_page(table, key, cursor, page_size, columns, filters)
+            yield page['items']
+            cursor = page['next_cursor']
+            if cursor is None:
+                return
+
+    return prefetch(pages(), EXPORT_PREFETCH_PAGES)
+
+def prime(chunks):
+    """
+    Produce the first chunk of an export now and return an iterator over all of them.
+
+    An export is streamed after the response has started, so a failing query
+    would otherwise only show up as a truncated file; primed, its first page
+    is fetched while the route can still answer with an error status.
+    """
+    first = next(chunks, None)
+    return iter(()) if first is None else itertools.chain([first], chunks)
+
+def prefetch(iterator, depth):
+    """Consume `iterator` on a background thread, keeping up to `depth` items ready."""
+    buffer = queue.Queue(maxsize=max(depth, 1))
+    stopped = threading.Event()
+    done = object()
+
+    def put(item):
+        # Give up once the consumer has gone away, e.g. the client disconnected
+        while not stopped.is_set():
+            try:
+                buffer.put(item, timeout=0.5)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def produce():
+        try:
+            for item in iterator:
+                if not put(item):
+                    return
+            put(done)
+        except Exception as e:
+            put(e)
+
+    threading.Thread(target=produce, name='page-prefetch', daemon=True).start()
+    try:
+        while True:
+            item = buffer.get()
+            if item is done:
+                return
+            if isinstance(item, Exception):
+                raise item
+            yield item
+    finally:
+        stopped.set()
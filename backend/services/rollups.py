@@ -0,0 +1,202 @@
+"""
+Time-bucketed revenue, cost and margin rollups for sales and stitching.
+
+Only the columns a rollup needs are fetched, and the rows are aggregated with
+pyarrow compute kernels rather than a Python loop. Totals of closed buckets
+(those that ended before the current one) only change when a backdated row is
+written, so they are cached and each call recomputes just the buckets it has
+not seen yet, normally the current one. Cached buckets expire after
+ANALYTICS_CACHE_TTL, so backdated writes from other workers show up too.
+"""
+import time
+import threading
+from datetime import date, timedelta
+from config import ANALYTICS_CACHE_TTL
+from services.events import on_write
+from services.pagination import iter_pages
+
+GRANULARITIES = ('day', 'week', 'month')
+
+# Buckets returned when no start date is given
+DEFAULT_BUCKETS = {'day': 30, 'week': 12, 'month': 12}
+
+# Upper bound on buckets per rollup, e.g. about 5 years of days
+MAX_BUCKETS = 2000
+
+# Table -> (primary key, column holding the cost of the order)
+SOURCES = {
+    'sales': ('item_id', 'cost_price'),
+    'stitching': ('stitching_id', 'tailor_price')
+}
+
+EMPTY_TOTALS = {"orders": 0, "revenue": 0.0, "cost": 0.0, "margin": 0.0}
+
+# (expiry, totals) of closed buckets by (table, granularity, bucket start)
+_closed_buckets = {}
+_closed_versions = {table: 0 for table in SOURCES}
+_closed_lock = threading.Lock()
+
+def bucket_start(day, granularity):
+    """Return the first day of the bucket containing `day` (weeks start on Monday)."""
+    if granularity == 'week':
+        return day - timedelta(days=day.weekday())
+    if granularity == 'month':
+        return day.replace(day=1)
+    return day
+
+def next_bucket(start, granularity):
+    """Return the first day of the bucket after the one starting at `start`."""
+    if granularity == 'week':
+        return start + timedelta(days=7)
+    if granularity == 'month':
+        return (start.replace(day=28) + timedelta(days=4)).replace(day=1)
+    return start + timedelta(days=1)
+
+def previous_bucket(start, granularity):
+    """Return the first day of the bucket before the one starting at `start`."""
+    if granularity == 'week':
+        return start - timedelta(days=7)
+    if granularity == 'month':
+        return (start - timedelta(days=1)).replace(day=1)
+    return start - timedelta(days=1)
+
+def parse_date(value, name):
+    try:
+        return date.fromisoformat(str(value)[:10])
+    except ValueError:
+        raise ValueError(f"Invalid {name}: {value}")
+
+def sales_rollup(granularity='month', start_date=None, end_date=None, today=None):
+    """
+    Return one row per bucket between start_date and end_date (inclusive).
+
+    The range is widened to whole buckets. Each row has the bucket's orders,
+    revenue, cost and margin for sales and stitching, and their totals.
+    """
+    if granularity not in GRANULARITIES:
+        raise ValueError(f"Invalid granularity: {granularity}")
+
+    today = today or date.today()
+    end = parse_date(end_date, 'end_date') if end_date else today
+    if start_date:
+        start = bucket_start(parse_date(start_date, 'start_date'), granularity)
+    else:
+        start = bucket_start(end, granularity)
+        for _ in range(DEFAULT_BUCKETS[granularity] - 1):
+            start = previous_bucket(start, granularity)
+    if start > end:
+        raise ValueError("start_date must not be after end_date")
+
+    buckets = []
+    bucket = start
+    while bucket <= end:
+        buckets.append(bucket)
+        if len(buckets) > MAX_BUCKETS:
+            raise ValueError(f"Too many {granularity} buckets, the limit is {MAX_BUCKETS}")
+        bucket = next_bucket(bucket, granularity)
+
+    current = bucket_start(today, granularity)
+    totals = {table: _table_totals(table, granularity, buckets, current) for table in SOURCES}
+
+    rows = []
+    for bucket in buckets:
+        row = {"period": bucket.isoformat()}
+        for table in SOURCES:
+            for measure, value in totals[table][bucket].items():
+                row[f"{table}_{measure}"] = value
+        row["total_revenue"] = row["sales_revenue"] + row["stitching_revenue"]
+        row["total_margin"] = row["sales_margin"] + row["stitching_margin"]
+        rows.append(row)
+    return rows
+
+def _table_totals(table, granularity, buckets, current):
+    """Return {bucket: totals} for `table`, aggregating only uncached buckets."""
+    totals, missing = {}, []
+    now = time.monotonic()
+    with _closed_lock:
+        version = _closed_versions[table]
+        for bucket in buckets:
+            cached = _closed_buckets.get((table, granularity, bucket)) if bucket < current else None
+            if cached is None or cached[0] <= now:
+                missing.append(bucket)
+            else:
+                totals[bucket] = cached[1]
+
+    if missing:
+        fetched = _aggregate(table, granularity, missing[0], next_bucket(missing[-1], granularity))
+        expires = time.monotonic() + ANALYTICS_CACHE_TTL
+        with _closed_lock:
+            # Only cache if no write happened while we were fetching
+            store = _closed_versions[table] == version
+            for bucket in missing:
+                totals[bucket] = fetched.get(bucket, EMPTY_TOTALS)
+                if store and bucket < current:
+                    _closed_buckets[(table, granularity, bucket)] = (expires, totals[bucket])
+    return totals
+
+def _aggregate(table, granularity, start, end):
+    """Sum the orders of `table` dated in [start, end) into buckets."""
+    try:
+        import pyarrow as pa
+        import pyarrow.compute as pc
+    except ImportError:
+        raise Exception("Sales rollups require the pyarrow package")
+
+    key, cost_column = SOURCES[table]
+    schema = pa.schema([
+        ('order_date', pa.string()),
+        ('selling_price', pa.float64()),
+        (cost_column, pa.float64())
+    ])
+    filters = [('gte', 'order_date', start.isoformat()), ('lt', 'order_date', end.isoformat())]
+    pages = iter_pages(table, key, columns=f'{key}, order_date, selling_price, {cost_column}', filters=filters)
+    data = pa.concat_tables([pa.Table.from_pylist(rows, schema=schema) for rows in pages if rows] or [schema.empty_table()])
+
+    # Rows whose order_date is malformed parse to null and are left out
+    parsed = pc.strptime(pc.utf8_slice_codeunits(data['order_date'], 0, 10), format='%Y-%m-%d', unit='s', error_is_null=True)
+    data = data.filter(pc.is_valid(parsed))
+    days = pc.cast(pc.drop_null(parsed), pa.date32())
+    revenue = pc.fill_null(data['selling_price'], 0.0)
+    cost = pc.fill_null(data[cost_column], 0.0)
+    grouped = pa.table({
+        'bucket': pc.floor_temporal(days, unit=granularity, week_starts_monday=True),
+        'revenue': revenue,
+        'cost': cost,
+        'margin': pc.subtract(revenue, cost)
+    }).group_by('bucket').aggregate([
+        ([], 'count_all'),
+        ('revenue', 'sum'),
+        ('cost', 'sum'),
+        ('margin', 'sum')
+    ])
+
+    return {
+        row['bucket']: {
+            "orders": row['count_all'],
+            "revenue": round(row['revenue_sum'], 2),
+            "cost": round(row['cost_sum'], 2),
+            "margin": round(row['margin_sum'], 2)
+        }
+        for row in grouped.to_pylist()
+    }
+
+
+@on_write
+def _invalidate_closed_buckets(table, action, rows):
+    """Drop the cached buckets a sales or stitching write may have changed."""
+    if table not in SOURCES:
+        return
+    with _closed_lock:
+        _closed_versions[table] += 1
+        try:
+            days = [parse_date(row.get('order_date'), 'order_date') for row in rows]
+        except ValueError:
+            days = []
+        if action == 'update' or not days:
+            # The row's previous order date is unknown, so any bucket may have changed
+            for cached in [cached for cached in _closed_buckets if cached[0] == table]:
+                del _closed_buckets[cached]
+            return
+        for day in days:
+            for granularity in GRANULARITIES:
+                _closed_buckets.pop((table, granularity, bucket_start(day, granularity)), None)
@@ -0,0 +1,10 @@
+"""
+Helpers for calling the SQL functions in sql/.
+
+The functions are installed by hand in the Supabase SQL editor, so a manager
+that calls one falls back to plain table queries while it is missing.
+"""
+
+def missing_function(error):
+    """True when an rpc failed because the SQL function is not installed."""
+    return 'PGRST202' in str(error) or 'Could not find the function' in str(error)
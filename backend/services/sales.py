@@ -1,7 +1,16 @@
 from datetime import datetime
-from config import supabase
+from config import supabase, BULK_CHUNK_SIZE
+from services.pagination import fetch_page, iter_pages, date_range_filters
+from services.events import notify_write
+from services.cache import record_cache
+from services.changes import change_feed
+from services.bulk import validate_rows
+from services.rpc import missing_function
+from services.stock import StockManager
 
 class SalesManager:
+    REQUIRED_FIELDS = ['item_name', 'cost_price', 'selling_price', 'mode', 'cust_name', 'order_date']
+
     @staticmethod
     def validate_sales_data(data, required_fields):
         """Validate if all required fields are present in the data."""
@@ -10,59 +19,230 @@ class SalesManager:
             raise ValueError(f"Missing required fields: {missing_fields}")
         return True
 
+    # Cleared when the database lacks sql/create_sale_with_stitching.sql, until restart
+    combined_create = True
+
     def create_sale(self, data):
-        """Create a new sale entry with stitching reference if required."""
+        """
+        Create a new sale entry with stitching reference if required.
+
+        A sale that names the stock it is sold from (stock_item_id, and
+        stock_quantity units, 1 by default) first reserves those units, and
+        puts them back if the sale cannot be created.
+        """
         try:
-            required_fields = ['item_name', 'cost_price', 'selling_price', 'mode', 'cust_name', 'order_date']
-            self.validate_sales_data(data, required_fields)
-
-            # Insert sale record first
-            result = supabase.table('sales').insert(data).execute()
-            sale_record = result.data[0]
-
-            # Handle stitching reference creation only after successful sale
-            if data.get('stitching', False):
-                stitching_data = {
-                    "item_id": sale_record["item_id"],
-                    "stitching_preference": "TBD",
-                    "tailor_price": 0,
-                    "selling_price": 0,
-                    "item_name": data['item_name'],
-                    "cust_name": data['cust_name'],
-                    "expected_date": data.get('order_date'),
-                    "order_date": data.get('order_date', datetime.now().isoformat())
-                }
-                supabase.table('stitching').insert(stitching_data).execute()
-
-            return sale_record
+            self.validate_sales_data(data, self.REQUIRED_FIELDS)
+            data = dict(data)
+            stock_item_id = data.pop('stock_item_id', None)
+            stock_quantity = data.pop('stock_quantity', 1)
+            if stock_item_id is None:
+                return self._insert_sale(data)
 
+            stock = StockManager()
+            stock.reserve_stock(stock_item_id, stock_quantity)
+            try:
+                return self._insert_sale(data)
+            except Exception:
+                stock.release_stock(stock_item_id, stock_quantity)
+                raise
+
+        except ValueError:
+            raise
         except Exception as e:
             raise Exception(f"Error creating sale: {str(e)}")
 
-    def get_all_sales(self):
-        """Retrieve all sales records."""
+    def _insert_sale(self, data):
+        """Insert the sale, and its stitching order when it needs one."""
+        if data.get('stitching', False) and SalesManager.combined_create:
+            try:
+                return self._create_sale_with_stitching(data)
+            except Exception as e:
+                if not missing_function(e):
+                    raise
+                SalesManager.combined_create = False
+
+        # Insert sale record first
+        result = supabase.table('sales').insert(data).execute()
+        sale_record = result.data[0]
+
+        # Handle stitching reference creation only after successful sale
+        if data.get('stitching', False):
+            stitching_data = self.stitching_reference(data, sale_record)
+            try:
+                stitching_result = supabase.table('stitching').insert(stitching_data).execute()
+            except Exception:
+                # Never leave a sale without its stitching order
+                supabase.table('sales').delete().eq('item_id', sale_record['item_id']).execute()
+                raise
+            notify_write('sales', 'insert', result.data)
+            notify_write('stitching', 'insert', stitching_result.data)
+        else:
+            notify_write('sales', 'insert', result.data)
+
+        return sale_record
+
+    def _create_sale_with_stitching(self, data):
+        """Insert the sale and its stitching order in one round trip and one transaction."""
+        result = supabase.rpc('create_sale_with_stitching', {
+            'sale_data': data,
+            'stitching_data': self.stitching_reference(data)
+        }).execute()
+        created = result.data[0] if isinstance(result.data, list) else result.data
+        notify_write('sales', 'insert', [created['sale']])
+        notify_write('stitching', 'insert', [created['stitching']])
+        return created['sale']
+
+    @staticmethod
+    def stitching_reference(data, sale_record=None):
+        """
+        Build the placeholder stitching record for a sale that needs stitching.
+
+        Without a sale record the item_id is left for the database to fill in.
+        """
+        reference = {
+            "stitching_preference": "TBD",
+            "tailor_price": 0,
+            "selling_price": 0,
+            "item_name": data['item_name'],
+            "cust_name": data['cust_name'],
+            "expected_date": data.get('order_date'),
+            "order_date": data.get('order_date', datetime.now().isoformat())
+        }
+        if sale_record is not None:
+            reference = {"item_id": sale_record["item_id"], **reference}
+        return reference
+
+    def create_sales(self, items):
+        """
+        Create many sales, inserted in chunks, reporting per-row errors.
+
+        Like create_sale, a row naming stock_item_id reserves its units
+        first, and a row that needs stitching is only kept together with its
+        stitching order. A row is either in items or in errors, and the
+        stock of a row that failed is put back.
+        """
         try:
-            result = supabase.table('sales').select('*').execute()
-            return result.data
+            valid, errors = validate_rows(
+                items, lambda data: self.validate_sales_data(data, self.REQUIRED_FIELDS)
+            )
+
+            stock = StockManager()
+            rows, reserved = [], {}
+            for index, data in valid:
+                data = dict(data)
+                stock_item_id = data.pop('stock_item_id', None)
+                stock_quantity = data.pop('stock_quantity', 1)
+                if stock_item_id is not None:
+                    try:
+                        stock.reserve_stock(stock_item_id, stock_quantity)
+                    except Exception as e:
+                        errors.append({"index": index, "error": str(e)})
+                        continue
+                    reserved[index] = (stock_item_id, stock_quantity)
+                rows.append((index, data))
+
+            created = []
+            try:
+                errors += self._insert_sales_in_chunks(rows, created)
+            finally:
+                # Put back the stock of every row that did not become a sale, even when a chunk raised
+                kept = {index for index, _ in created}
+                for index, (stock_item_id, stock_quantity) in reserved.items():
+                    if index not in kept:
+                        stock.release_stock(stock_item_id, stock_quantity)
+
+            return {
+                "items": [record for _, record in created],
+                "errors": sorted(errors, key=lambda error: error['index'])
+            }
+        except ValueError:
+            raise
+        except Exception as e:
+            raise Exception(f"Error creating sales: {str(e)}")
+
+    def _insert_sales_in_chunks(self, rows, created):
+        """
+        Insert (index, sale) pairs and their stitching orders, two requests per chunk.
+
+        Every sale is appended to `created` as soon as it is inserted, so
+        when a later request raises the caller still knows which rows became
+        sales. When the stitching orders of a chunk cannot be inserted, the
+        sales that needed them are deleted again; those rows are returned as
+        errors.
+        """
+        errors = []
+        for start in range(0, len(rows), BULK_CHUNK_SIZE):
+            chunk = rows[start:start + BULK_CHUNK_SIZE]
+            try:
+                result = supabase.table('sales').insert([row for _, row in chunk]).execute()
+            except Exception as e:
+                errors.extend({"index": index, "error": str(e)} for index, _ in chunk)
+                continue
+            records = [(index, row, record) for (index, row), record in zip(chunk, result.data)]
+            created.extend((index, record) for index, _, record in records)
+
+            needs_stitching = [(index, row, record) for index, row, record in records if row.get('stitching', False)]
+            if needs_stitching:
+                try:
+                    stitching_result = supabase.table('stitching').insert([
+                        self.stitching_reference(row, record) for _, row, record in needs_stitching
+                    ]).execute()
+                except Exception as e:
+                    # Never leave a sale without its stitching order
+                    orphans = [record['item_id'] for _, _, record in needs_stitching]
+                    supabase.table('sales').delete().in_('item_id', orphans).execute()
+                    deleted = {index for index, _, _ in needs_stitching}
+                    created[:] = [entry for entry in created if entry[0] not in deleted]
+                    errors.extend({"index": index, "error": str(e)} for index in deleted)
+                    records = [entry for entry in records if entry[0] not in deleted]
+                else:
+                    notify_write('stitching', 'insert', stitching_result.data)
+
+            if records:
+                notify_write('sales', 'insert', [record for _, _, record in records])
+        return errors
+
+    def get_all_sales(self, cursor=None, limit=None, filters=None, sort=None, descending=False):
+        """Retrieve a page of sales records, filtered and sorted in the database (see services/search.py)."""
+        try:
+            return fetch_page('sales', 'item_id', cursor, limit, filters=filters, sort=sort, descending=descending)
+        except ValueError:
+            raise
         except Exception as e:
             raise Exception(f"Error retrieving sales records: {str(e)}")
 
+    def export_sales(self, page_size=None, start_date=None, end_date=None):
+        """Yield all sales records, one page at a time, optionally within a order_date range."""
+        return iter_pages('sales', 'item_id', page_size, filters=date_range_filters('order_date', start_date, end_date))
+
+    def get_sales_changes(self, cursor=None, since=None, limit=None):
+        """Retrieve the sales records inserted, updated or deleted since a cursor or timestamp."""
+        try:
+            return change_feed.changes_since('sales', cursor, since, limit)
+        except ValueError:
+            raise
+        except Exception as e:
+            raise Exception(f"Error retrieving sales changes: {str(e)}")
+
     def get_sale_by_id(self, sale_id):
         """Retrieve a specific sale by ID."""
         try:
-            result = supabase.table('sales').select('*').eq('item_id', sale_id).execute()
-            if not result.data:
-                raise ValueError(f"Sale record with ID {sale_id} not found")
-            return result.data[0]
+            return record_cache.get_or_load('sales', sale_id, lambda: self._load_sale(sale_id))
+        except ValueError:
+            raise
         except Exception as e:
             raise Exception(f"Error retrieving sale record: {str(e)}")
 
+    def _load_sale(self, sale_id):
+        """Fetch a single sales row from the database."""
+        result = supabase.table('sales').select('*').eq('item_id', sale_id).execute()
+        if not result.data:
+            raise ValueError(f"Sale record with ID {sale_id} not found")
+        return result.data[0]
+
     def update_sale(self, sale_id, data):
         """Update an existing sale."""
         try:
-            # Verify item exists
-            existing_sale = self.get_sale_by_id(sale_id)
-            
             # Remove generated columns that can't be updated directly
             update_data = {k: v for k, v in data.items() if k not in ['item_id', 'margin']}
             if 'expected_date' in update_data and update_data['expected_date'] == '':
@@ -70,22 +250,29 @@ class SalesManager:
             
             result = supabase.table('sales').update(update_data).eq('item_id', sale_id).execute()
             
-            if not result.data or len(result.data) == 0:
-                raise ValueError(f"No data returned when updating sale with ID {sale_id}")
-                
+            # No rows back means the sale does not exist
+            if not result.data:
+                raise ValueError(f"Sale record with ID {sale_id} not found")
+
+            notify_write('sales', 'update', result.data)
             return result.data[0]
         
+        except ValueError:
+            raise
         except Exception as e:
             raise Exception(f"Error updating sale record: {str(e)}")
         
     def delete_sale(self, sale_id):
         """Delete a sale record."""
         try:
-            # Verify item exists
-            self.get_sale_by_id(sale_id)
-
             result = supabase.table('sales').delete().eq('item_id', sale_id).execute()
+            if not result.data:
+                raise ValueError(f"Sale record with ID {sale_id} not found")
+
+            notify_write('sales', 'delete', result.data)
             return result.data[0]
         
+        except ValueError:
+            raise
         except Exception as e:
             raise Exception(f"Error deleting sale record: {str(e)}")
@@ -0,0 +1,62 @@
+"""
+Server-side filters, sorting and prefix search for the sales and stitching lists.
+
+list_query turns request arguments into fetch_page filters, so only the
+matching rows leave the database. The prefix search is a PostgREST logic
+tree, or(cust_name.ilike."Ra*",item_name.ilike."Ra*").
+"""
+import re
+from services.pagination import date_range_filters, quote
+
+# Exact-match filters per table
+FILTER_COLUMNS = {
+    'sales': ('cust_name', 'item_name', 'mode'),
+    'stitching': ('cust_name', 'item_name', 'stitching_preference')
+}
+
+# Date columns filtered by <column>_from / <column>_to (inclusive)
+DATE_COLUMNS = ('order_date', 'expected_date')
+
+# Columns with an index to sort on (sql/search_indexes.sql)
+SORT_COLUMNS = {
+    'sales': ('item_id', 'order_date', 'expected_date', 'cust_name', 'item_name'),
+    'stitching': ('stitching_id', 'order_date', 'expected_date', 'cust_name', 'item_name')
+}
+
+# Columns matched by the prefix search
+SEARCH_COLUMNS = ('cust_name', 'item_name')
+
+# Wildcards and escapes in search terms become *, which also matches them literally
+_SEARCH_UNSAFE = re.compile(r'[*%_\\]+')
+
+def list_query(table, args):
+    """Build the fetch_page filters and sort order for a list request, ValueError for bad values."""
+    filters = []
+    for column in FILTER_COLUMNS[table]:
+        if args.get(column):
+            filters.append(('eq', column, args.get(column)))
+    for column in DATE_COLUMNS:
+        filters += date_range_filters(column, args.get(f'{column}_from'), args.get(f'{column}_to'))
+
+    search = (args.get('search') or '').strip()
+    if search:
+        if not _SEARCH_UNSAFE.sub('', search).strip():
+            # The pattern would match every row
+            raise ValueError(f"Invalid search: {search}")
+        search = _SEARCH_UNSAFE.sub('*', search)
+        filters.append(('or', None, ','.join(
+            f'{column}.ilike.{quote(search + "*")}' for column in SEARCH_COLUMNS
+        )))
+
+    sort = args.get('sort') or None
+    if sort is not None and sort not in SORT_COLUMNS[table]:
+        raise ValueError(f"Cannot sort on {sort}, choose one of {list(SORT_COLUMNS[table])}")
+    order = args.get('order') or 'asc'
+    if order not in ('asc', 'desc'):
+        raise ValueError(f"Invalid order: {order}")
+
+    return {
+        "filters": filters,
+        "sort": sort,
+        "descending": order == 'desc'
+    }
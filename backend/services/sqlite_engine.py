@@ -0,0 +1,564 @@
+"""
+Embedded SQLite storage engine (STORAGE_ENGINE=sqlite).
+
+Speaks the same query-builder interface as the Supabase client --
+table().select().eq()...execute(), rpc() -- so the managers run unchanged on
+a local database file. The schema and indexes are in sql/sqlite_schema.sql.
+"""
+import os
+import hmac
+import time
+import sqlite3
+import threading
+from contextlib import nullcontext
+from types import SimpleNamespace
+from collections import Counter
+from datetime import datetime, timezone
+from services.metrics import QUERY_LATENCY, QUERY_ROWS
+
+SCHEMA_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'sql', 'sqlite_schema.sql')
+
+# Primary key of each table
+PRIMARY_KEYS = {
+    'stock': 'item_id',
+    'sales': 'item_id',
+    'stitching': 'stitching_id',
+    'billing': 'bill_id'
+}
+
+# Access and refresh token of a LocalAuth session
+LOCAL_TOKEN = 'local'
+
+# Tombstones of deleted rows, read by the change feeds
+TOMBSTONES = 'deleted_rows'
+
+OPERATORS = {
+    'eq': '=',
+    'neq': '!=',
+    'gt': '>',
+    'gte': '>=',
+    'lt': '<',
+    'lte': '<='
+}
+
+class SQLiteResponse:
+    def __init__(self, data, count=None):
+        self.data = data
+        self.count = count
+
+class SQLiteQuery:
+    """One table query, built like a PostgREST request and run as a single SQL statement."""
+
+    def __init__(self, engine, table):
+        self.engine = engine
+        self.table = table
+        self.action = 'select'
+        self.columns = '*'
+        self.count = None
+        self.payload = None
+        self.filters = []
+        self.order_by = []
+        self.max_rows = None
+        self.offset = None
+
+    # Actions
+    def select(self, columns='*', count=None):
+        self.columns = columns
+        self.count = count
+        return self
+
+    def insert(self, payload):
+        self.action, self.payload = 'insert', payload
+        return self
+
+    def update(self, payload):
+        self.action, self.payload = 'update', payload
+        return self
+
+    def delete(self):
+        self.action = 'delete'
+        return self
+
+    # Filters
+    def _filter(self, operator, column, value):
+        self.filters.append((operator, column, value))
+        return self
+
+    def eq(self, column, value):
+        return self._filter('eq', column, value)
+
+    def neq(self, column, value):
+        return self._filter('neq', column, value)
+
+    def gt(self, column, value):
+        return self._filter('gt', column, value)
+
+    def gte(self, column, value):
+        return self._filter('gte', column, value)
+
+    def lt(self, column, value):
+        return self._filter('lt', column, value)
+
+    def lte(self, column, value):
+        return self._filter('lte', column, value)
+
+    def in_(self, column, values):
+        return self._filter('in', column, list(values))
+
+    def is_(self, column, value):
+        return self._filter('is', column, value)
+
+    def ilike(self, column, pattern):
+        return self._filter('ilike', column, pattern)
+
+    def or_(self, filters):
+        return self._filter('or', None, parse_logic(filters))
+
+    @property
+    def not_(self):
+        return _Negated(self)
+
+    # Modifiers
+    def order(self, column, desc=False, nullsfirst=None):
+        self.order_by.append((column, desc, nullsfirst))
+        return self
+
+    def limit(self, size):
+        self.max_rows = int(size)
+        return self
+
+    def range(self, start, end):
+        self.offset, self.max_rows = int(start), int(end) - int(start) + 1
+        return self
+
+    def execute(self):
+        return self.engine._execute(self)
+
+class _Negated:
+    def __init__(self, query):
+        self.query = query
+
+    def is_(self, column, value):
+        return self.query._filter('not.is', column, value)
+
+class SQLiteRPC:
+    def __init__(self, engine, name, params):
+        self.engine = engine
+        self.name = name
+        self.params = params or {}
+
+    def execute(self):
+        return self.engine._rpc(self)
+
+class LocalAuth:
+    """
+    Stand-in for supabase.auth on the single-shop install.
+
+    The API checks no access tokens there (AUTH_REQUIRED is off by default),
+    so signing in only lets the frontend through: the password is compared
+    with LOCAL_LOGIN_PASSWORD when one is set, and the session is local.
+    """
+
+    def __init__(self, password=None):
+        self.password = password
+
+    def sign_in_with_password(self, credentials):
+        if self.password and not hmac.compare_digest(str(credentials.get('password')), self.password):
+            return SimpleNamespace(user=None, session=None)
+        return self._session(credentials.get('email'))
+
+    def refresh_session(self, refresh_token):
+        if refresh_token != LOCAL_TOKEN:
+            return SimpleNamespace(user=None, session=None)
+        return self._session(None)
+
+    @staticmethod
+    def _session(email):
+        return SimpleNamespace(
+            user=SimpleNamespace(id='local', email=email),
+            session=SimpleNamespace(access_token=LOCAL_TOKEN, refresh_token=LOCAL_TOKEN)
+        )
+
+class SQLiteEngine:
+    """Drop-in replacement for the Supabase client backed by a SQLite file."""
+
+    def __init__(self, path, login_password=None):
+        # Shared-cache tables report "locked" at once instead of waiting like a file
+        # database does, so statements on the in-memory database take turns
+        self._statement_lock = threading.RLock() if path == ':memory:' else nullcontext()
+        if path == ':memory:':
+            # Every thread gets its own connection, so share one named in-memory database
+            path = f"file:inventory-{id(self)}?mode=memory&cache=shared"
+        self.path = path
+        self.auth = LocalAuth(login_password)
+        self.calls = Counter()
+        self.functions = {
+            'summary_metrics': _summary_metrics,
+            'create_sale_with_stitching': self._create_sale_with_stitching,
+            'reserve_stock': self._reserve_stock,
+            'change_head': _change_head
+        }
+        self._local = threading.local()
+        self._columns = {}
+        self._booleans = {}
+        # Keeps a shared in-memory database alive and applies the schema
+        self._keeper = self._connect()
+
+    def table(self, name):
+        return SQLiteQuery(self, name)
+
+    def rpc(self, name, params=None):
+        return SQLiteRPC(self, name, params)
+
+    # Connections
+    def _connect(self):
+        connection = sqlite3.connect(self.path, uri=self.path.startswith('file:'), check_same_thread=False, timeout=30)
+        connection.row_factory = sqlite3.Row
+        connection.execute('pragma busy_timeout = 30000')
+        if not self.path.startswith('file:'):
+            connection.execute('pragma journal_mode = wal')
+            connection.execute('pragma synchronous = normal')
+        if not self._columns:
+            self._migrate(connection)
+            with open(SCHEMA_PATH) as f:
+                connection.executescript(f.read())
+            self._load_columns(connection)
+        return connection
+
+    @staticmethod
+    def _migrate(connection):
+        """Add the updated_at column to tables created before change tracking."""
+        with connection:
+            for table in PRIMARY_KEYS:
+                columns = {row['name'] for row in connection.execute(f'pragma table_xinfo("{table}")')}
+                if columns and 'updated_at' not in columns:
+                    connection.execute(f'alter table "{table}" add column updated_at text')
+                    connection.execute(f'update "{table}" set updated_at = ?', [_now()])
+
+    def _connection(self):
+        connection = getattr(self._local, 'connection', None)
+        if connection is None:
+            connection = self._local.connection = self._connect()
+        return connection
+
+    def _load_columns(self, connection):
+        for table in list(PRIMARY_KEYS) + [TOMBSTONES]:
+            info = connection.execute(f'pragma table_xinfo("{table}")').fetchall()
+            self._columns[table] = {row['name'] for row in info}
+            self._booleans[table] = {row['name'] for row in info if row['type'].lower() == 'boolean'}
+        self._columns['monthly_sales'] = {'month', 'total_orders', 'total_sales'}
+        self._booleans['monthly_sales'] = set()
+
+    # Execution
+    def _execute(self, query):
+        started = time.perf_counter()
+        self.calls[f"{query.table}.{query.action}"] += 1
+        response = self._run(query)
+        QUERY_LATENCY.labels(query.table, query.action).observe(time.perf_counter() - started)
+        QUERY_ROWS.labels(query.table, query.action).inc(len(response.data))
+        return response
+
+    def _run(self, query):
+        table = self._table(query.table)
+        connection = self._connection()
+        where, params = self._where(table, query.filters)
+
+        with self._statement_lock, connection:
+            if query.action == 'insert':
+                payload = query.payload if isinstance(query.payload, list) else [query.payload]
+                rows = [self._insert(connection, table, row) for row in payload]
+                return SQLiteResponse(self._rows(table, rows))
+
+            if query.action == 'update':
+                values = self._values(table, query.payload)
+                if not values:
+                    raise Exception("Update payload is empty")
+                if table in PRIMARY_KEYS:
+                    values['updated_at'] = _now()
+                assignments = ', '.join(f'"{column}" = ?' for column in values)
+                rows = connection.execute(
+                    f'update "{table}" set {assignments}{where} returning *', list(values.values()) + params
+                ).fetchall()
+                return SQLiteResponse(self._rows(table, rows))
+
+            if query.action == 'delete':
+                rows = connection.execute(f'delete from "{table}"{where} returning *', params).fetchall()
+                self._record_deleted(connection, table, rows)
+                return SQLiteResponse(self._rows(table, rows))
+
+            columns = self._projection(table, query.columns)
+            sql = f'select {columns} from "{table}"{where}'
+            if query.order_by:
+                sql += ' order by ' + ', '.join(
+                    f'"{self._column(table, column)}"{" desc" if desc else ""}'
+                    f'{"" if nullsfirst is None else " nulls first" if nullsfirst else " nulls last"}'
+                    for column, desc, nullsfirst in query.order_by
+                )
+            if query.max_rows is not None:
+                sql += f' limit {int(query.max_rows)}'
+                if query.offset:
+                    sql += f' offset {int(query.offset)}'
+            rows = connection.execute(sql, params).fetchall()
+
+            count = None
+            if query.count:
+                count = connection.execute(f'select count(*) from "{table}"{where}', params).fetchone()[0]
+            return SQLiteResponse(self._rows(table, rows), count)
+
+    def _rpc(self, call):
+        self.calls[f"rpc.{call.name}"] += 1
+        if call.name not in self.functions:
+            raise Exception(f"Could not find the function public.{call.name}")
+        connection = self._connection()
+        with self._statement_lock, connection:
+            return SQLiteResponse(self.functions[call.name](connection, call.params))
+
+    def _insert(self, connection, table, row):
+        """Insert one row and return it as stored."""
+        row = self._values(table, row)
+        if table in PRIMARY_KEYS:
+            row['updated_at'] = _now()
+        columns = ', '.join(f'"{column}"' for column in row)
+        placeholders = ', '.join('?' for _ in row)
+        sql = f'insert into "{table}" ({columns}) values ({placeholders}) returning *' if row else f'insert into "{table}" default values returning *'
+        return connection.execute(sql, list(row.values())).fetchone()
+
+    @staticmethod
+    def _record_deleted(connection, table, rows):
+        """Leave a tombstone for each deleted row, in the delete's transaction."""
+        key = PRIMARY_KEYS.get(table)
+        if key is None or not rows:
+            return
+        deleted_at = _now()
+        connection.executemany(
+            f'insert into "{TOMBSTONES}" (table_name, row_id, deleted_at) values (?, ?, ?)',
+            [(table, row[key], deleted_at) for row in rows]
+        )
+
+    # SQL functions from sql/
+    def _create_sale_with_stitching(self, connection, params):
+        """SQLite version of sql/create_sale_with_stitching.sql, run in the rpc's transaction."""
+        sale = self._insert(connection, 'sales', {'stitching': True, **params['sale_data']})
+        stitching = self._insert(
+            connection, 'stitching', {**params['stitching_data'], 'item_id': sale['item_id']}
+        )
+        return {
+            "sale": self._rows('sales', [sale])[0],
+            "stitching": self._rows('stitching', [stitching])[0]
+        }
+
+    def _reserve_stock(self, connection, params):
+        """SQLite version of sql/reserve_stock.sql."""
+        amount = int(params['amount'])
+        rows = connection.execute(
+            'update stock set quantity = quantity - ?, sold = quantity - ? <= 0, updated_at = ? '
+            'where item_id = ? and quantity >= ? returning *',
+            [amount, amount, _now(), params['stock_item_id'], amount]
+        ).fetchall()
+        return self._rows('stock', rows)
+
+    # SQL building
+    def _table(self, name):
+        if name not in self._columns:
+            raise Exception(f"Could not find the table 'public.{name}'")
+        return name
+
+    def _column(self, table, column):
+        # Column names become SQL identifiers, so only known ones are accepted
+        if column not in self._columns[table]:
+            raise Exception(f"Could not find the '{column}' column of '{table}'")
+        return column
+
+    def _projection(self, table, columns):
+        if columns.strip() == '*':
+            return '*'
+        return ', '.join(f'"{self._column(table, name.strip())}"' for name in columns.split(','))
+
+    def _where(self, table, filters):
+        clauses, params = [], []
+        for operator, name, value in filters:
+            clause, clause_params = self._condition(table, operator, name, value)
+            clauses.append(clause)
+            params.extend(clause_params)
+        where = ' where ' + ' and '.join(clauses) if clauses else ''
+        return where, params
+
+    def _condition(self, table, operator, name, value):
+        """Return (sql, params) for one filter, or an and/or group of them."""
+        if operator in ('and', 'or'):
+            parts = [self._condition(table, *condition) for condition in value]
+            sql = f' {operator} '.join(part[0] for part in parts)
+            return f'({sql})', [param for part in parts for param in part[1]]
+
+        negate = operator.startswith('not.')
+        operator = operator[4:] if negate else operator
+        column = f'"{self._column(table, name)}"'
+        boolean = name in self._booleans[table]
+        if operator in OPERATORS:
+            sql, params = f'{column} {OPERATORS[operator]} ?', [_sql_value(value, boolean)]
+        elif operator == 'ilike':
+            # SQLite's like is case-insensitive; * is PostgREST's wildcard
+            sql, params = f'{column} like ?', [str(value).replace('*', '%')]
+        elif operator == 'in':
+            if not value:
+                sql, params = '0', []
+            else:
+                sql = f'{column} in ({", ".join("?" for _ in value)})'
+                params = [_sql_value(item, boolean) for item in value]
+        elif operator == 'is':
+            if value in (None, 'null'):
+                sql, params = f'{column} is null', []
+            else:
+                sql, params = f'{column} is ?', [_sql_value(value, boolean)]
+        else:
+            raise Exception(f"Unsupported filter: {operator}")
+        return (f'not ({sql})' if negate else sql), params
+
+    def _values(self, table, row):
+        booleans = self._booleans[table]
+        return {
+            self._column(table, column): _sql_value(value, column in booleans)
+            for column, value in row.items()
+        }
+
+    def _rows(self, table, rows):
+        booleans = self._booleans[table]
+        result = []
+        for row in rows:
+            row = dict(row)
+            for column in booleans:
+                if row.get(column) is not None:
+                    row[column] = bool(row[column])
+            result.append(row)
+        return result
+
+    # Benchmark and seeding helpers, shared with benchmarks.fake_supabase.FakeSupabase
+    def load(self, name, rows):
+        """Insert seed rows in one transaction."""
+        table = self._table(name)
+        connection = self._connection()
+        stamp = {'updated_at': _now()} if table in PRIMARY_KEYS else {}
+        with connection:
+            for row in rows:
+                row = {**self._values(table, row), **stamp}
+                columns = ', '.join(f'"{column}"' for column in row)
+                connection.execute(
+                    f'insert into "{table}" ({columns}) values ({", ".join("?" for _ in row)})', list(row.values())
+                )
+
+    def reset_calls(self):
+        self.calls.clear()
+
+    def random_id(self, name, rng):
+        """A random existing primary key of `name`."""
+        key = PRIMARY_KEYS[name]
+        connection = self._connection()
+        low, high = connection.execute(f'select min("{key}"), max("{key}") from "{name}"').fetchone()
+        row = connection.execute(
+            f'select "{key}" from "{name}" where "{key}" >= ? order by "{key}" limit 1', [rng.randint(low, high)]
+        ).fetchone()
+        return row[0]
+
+    def max_id(self, name):
+        key = PRIMARY_KEYS[name]
+        return self._connection().execute(f'select max("{key}") from "{name}"').fetchone()[0]
+
+def _now():
+    """Change-tracking timestamp, ISO 8601 in UTC so it sorts as text."""
+    return datetime.now(timezone.utc).isoformat(timespec='microseconds')
+
+def _sql_value(value, boolean=False):
+    if isinstance(value, bool):
+        return int(value)
+    if boolean and value in ('true', 'false'):
+        return int(value == 'true')
+    return value
+
+def _summary_metrics(connection, params):
+    """SQLite version of sql/summary_metrics.sql."""
+    row = connection.execute('''
+        select s.cnt, t.cnt, coalesce(s.revenue, 0) + coalesce(t.revenue, 0)
+        from (select count(*) as cnt, sum(selling_price) as revenue from sales) s,
+             (select count(*) as cnt, sum(selling_price) as revenue from stitching) t
+    ''').fetchone()
+    return [{
+        "total_sales": row[0],
+        "total_stitching_orders": row[1],
+        "total_revenue": row[2]
+    }]
+
+def _change_head(connection, params):
+    """SQLite version of change_head in sql/change_tracking.sql."""
+    table = params['target_table']
+    if table not in PRIMARY_KEYS:
+        raise Exception(f"Table {table} is not change tracked")
+    newest = connection.execute(f'select max(updated_at) from "{table}"').fetchone()[0]
+    tombstone = connection.execute(
+        f'select deleted_at, change_id from "{TOMBSTONES}" where table_name = ? '
+        'order by deleted_at desc, change_id desc limit 1', [table]
+    ).fetchone()
+    return {
+        "updated_at": newest,
+        "deleted_at": tombstone[0] if tombstone else None,
+        "change_id": tombstone[1] if tombstone else None
+    }
+
+def parse_logic(text):
+    """
+    Parse the body of an or_() filter into a list of conditions.
+
+    Conditions are (operator, column, value) tuples, nested groups are
+    ('and'|'or', None, [conditions]); operators are prefixed with 'not.' when
+    negated.
+    """
+    conditions, position = _parse_list(text, 0)
+    if position != len(text):
+        raise Exception(f"Unsupported logic tree: {text}")
+    return conditions
+
+def _parse_list(text, position):
+    conditions = []
+    while True:
+        condition, position = _parse_condition(text, position)
+        conditions.append(condition)
+        if position < len(text) and text[position] == ',':
+            position += 1
+            continue
+        return conditions, position
+
+def _parse_condition(text, position):
+    for group in ('and', 'or'):
+        if text.startswith(f'{group}(', position):
+            conditions, position = _parse_list(text, position + len(group) + 1)
+            if position >= len(text) or text[position] != ')':
+                raise Exception(f"Unsupported logic tree: {text}")
+            return (group, None, conditions), position + 1
+
+    column, position = _read_until(text, position, '.')
+    operator, position = _read_until(text, position + 1, '.')
+    if operator == 'not':
+        operator, position = _read_until(text, position + 1, '.')
+        operator = f'not.{operator}'
+    value, position = _read_value(text, position + 1)
+    return (operator, column, value), position
+
+def _read_until(text, position, stop):
+    end = text.find(stop, position)
+    if end < 0:
+        raise Exception(f"Unsupported logic tree: {text}")
+    return text[position:end], end
+
+def _read_value(text, position):
+    if position < len(text) and text[position] == '"':
+        value, position = [], position + 1
+        while text[position] != '"':
+            if text[position] == '\\':
+                position += 1
+            value.append(text[position])
+            position += 1
+        return ''.join(value), position + 1
+    end = position
+    while end < len(text) and text[end] not in ',)':
+        end += 1
+    value = text[position:end]
+    return (None if value == 'null' else value), end
@@ -1,7 +1,14 @@
 from datetime import datetime
 from config import supabase
+from services.pagination import fetch_page, iter_pages
+from services.events import notify_write
+from services.cache import record_cache
+from services.changes import change_feed
+from services.bulk import validate_rows, insert_in_chunks
 
 class StitchingManager:
+    REQUIRED_FIELDS = ['stitching_preference', 'tailor_price', 'selling_price', 'expected_date', 'cust_name']
+
     @staticmethod
     def validate_stitching_data(data, required_fields):
         """Validate if all required fields are present in the data."""
@@ -14,8 +21,7 @@ class StitchingManager:
         """Create a new stitching record."""
         try:
             # Validate required fields
-            required_fields = ['stitching_preference', 'tailor_price', 'selling_price', 'expected_date', 'cust_name']
-            self.validate_stitching_data(data, required_fields)
+            self.validate_stitching_data(data, self.REQUIRED_FIELDS)
 
             # Check for item_id only if linked to sales
             if 'item_id' in data and data['item_id']:
@@ -24,44 +30,107 @@ class StitchingManager:
                     raise ValueError(f"Invalid item_id: {data['item_id']} - No matching sale found.")
 
             result = supabase.table('stitching').insert(data).execute()
+            notify_write('stitching', 'insert', result.data)
             return result.data[0]
         except Exception as e:
             raise Exception(f"Error creating stitching record: {str(e)}")
 
+    def create_stitching_records(self, items):
+        """Create many stitching records, inserted in chunks, reporting per-row errors."""
+        try:
+            valid, errors = validate_rows(
+                items, lambda data: self.validate_stitching_data(data, self.REQUIRED_FIELDS)
+            )
+
+            # Check all linked sales with one query
+            item_ids = {str(data['item_id']) for _, data in valid if data.get('item_id')}
+            known_ids = set()
+            if item_ids:
+                sale_check = supabase.table('sales').select('item_id').in_('item_id', list(item_ids)).execute()
+                known_ids = {str(row['item_id']) for row in sale_check.data}
+
+            linked = []
+            for index, data in valid:
+                if data.get('item_id') and str(data['item_id']) not in known_ids:
+                    errors.append({
+                        "index": index,
+                        "error": f"Invalid item_id: {data['item_id']} - No matching sale found."
+                    })
+                else:
+                    linked.append((index, data))
+
+            inserted, insert_errors = insert_in_chunks('stitching', linked)
+            return {
+                "items": [record for _, record in inserted],
+                "errors": sorted(errors + insert_errors, key=lambda error: error['index'])
+            }
+        except ValueError:
+            raise
+        except Exception as e:
+            raise Exception(f"Error creating stitching records: {str(e)}")
+
 
-    def get_all_stitching_records(self):
-        """Retrieve all stitching records."""
+    def get_all_stitching_records(self, cursor=None, limit=None, filters=None, sort=None, descending=False):
+        """Retrieve a page of stitching records, filtered and sorted in the database (see services/search.py)."""
         try:
-            result = supabase.table('stitching').select('*').execute()
-            return result.data
+            return fetch_page('stitching', 'stitching_id', cursor, limit, filters=filters, sort=sort, descending=descending)
+        except ValueError:
+            raise
         except Exception as e:
             raise Exception(f"Error retrieving stitching records: {str(e)}")
 
+    def export_stitching_records(self, page_size=None):
+        """Yield all stitching records, one page at a time."""
+        return iter_pages('stitching', 'stitching_id', page_size)
+
+    def get_stitching_changes(self, cursor=None, since=None, limit=None):
+        """Retrieve the stitching records inserted, updated or deleted since a cursor or timestamp."""
+        try:
+            return change_feed.changes_since('stitching', cursor, since, limit)
+        except ValueError:
+            raise
+        except Exception as e:
+            raise Exception(f"Error retrieving stitching changes: {str(e)}")
+
     def get_stitching_record_by_id(self, stitching_id):
         """Retrieve a specific stitching record by ID."""
         try:
-            result = supabase.table('stitching').select('*').eq('stitching_id', stitching_id).execute()
-            if not result.data:
-                raise ValueError(f"Stitching record with ID {stitching_id} not found")
-            return result.data[0]
+            return record_cache.get_or_load('stitching', stitching_id, lambda: self._load_stitching_record(stitching_id))
+        except ValueError:
+            raise
         except Exception as e:
             raise Exception(f"Error retrieving stitching record: {str(e)}")
 
+    def _load_stitching_record(self, stitching_id):
+        """Fetch a single stitching row from the database."""
+        result = supabase.table('stitching').select('*').eq('stitching_id', stitching_id).execute()
+        if not result.data:
+            raise ValueError(f"Stitching record with ID {stitching_id} not found")
+        return result.data[0]
+
     def update_stitching_record(self, stitching_id, data):
         """Update an existing stitching record."""
         try:
-            # Verify item exists
-            self.get_stitching_record_by_id(stitching_id)
+            # A single conditional update, no rows back means the record does not exist
             result = supabase.table('stitching').update(data).eq('stitching_id', stitching_id).execute()
+            if not result.data:
+                raise ValueError(f"Stitching record with ID {stitching_id} not found")
+            notify_write('stitching', 'update', result.data)
             return result.data[0]
+        except ValueError:
+            raise
         except Exception as e:
             raise Exception(f"Error updating stitching record: {str(e)}")
 
     def delete_stitching_record(self, stitching_id):
         """Delete a stitching record."""
         try:
-            self.get_stitching_record_by_id(stitching_id)  # Will raise ValueError if not found
             result = supabase.table('stitching').delete().eq('stitching_id', stitching_id).execute()
+            if not result.data:
+                raise ValueError(f"Stitching record with ID {stitching_id} not found")
+            notify_write('stitching', 'delete', result.data)
             return result.data[0]
+        except ValueError:
+            raise
         except Exception as e:
             raise Exception(f"Error deleting stitching record: {str(e)}")
@@ -1,7 +1,18 @@
+import time
+import random
 from datetime import datetime
-from config import supabase
+from config import supabase, STOCK_RESERVE_RETRIES, STOCK_RESERVE_BACKOFF
+from services.pagination import fetch_page, iter_pages
+from services.events import notify_write
+from services.cache import record_cache
+from services.changes import change_feed
+from services.bulk import validate_rows, insert_in_chunks
+from services.rpc import missing_function
 
 class StockManager:
+    REQUIRED_FIELDS = ['vendor_id', 'selling_price', 'cost_price', 
+                       'item_name', 'quantity', 'size']
+
     @staticmethod
     def validate_stock_data(data, required_fields):
         """Validate if all required fields are present in the data"""
@@ -15,70 +26,186 @@ class StockManager:
         """Calculate margin from selling price and cost price"""
         return selling_price - cost_price
 
+    def prepare_stock_item(self, data):
+        """Validate a stock item and fill in its default values."""
+        self.validate_stock_data(data, self.REQUIRED_FIELDS)
+            
+        # Remove margin from the payload if present
+        data.pop('margin', None)
+
+        # Set default values
+        data['order_date'] = data.get('order_date', datetime.now().isoformat())
+        data['sold'] = data.get('sold', False)
+        return data
+
     def create_stock_item(self, data):
         """Create a new stock item."""
         try:
-            required_fields = ['vendor_id', 'selling_price', 'cost_price', 
-                            'item_name', 'quantity', 'size']
-            
-            self.validate_stock_data(data, required_fields)
-            
-            # Remove margin from the payload if present
-            data.pop('margin', None)
-
-            # Set default values
-            data['order_date'] = data.get('order_date', datetime.now().isoformat())
-            data['sold'] = data.get('sold', False)
+            self.prepare_stock_item(data)
 
             result = supabase.table('stock').insert(data).execute()
+            notify_write('stock', 'insert', result.data)
             return result.data[0]
         except Exception as e:
             raise Exception(f"Error creating stock item: {str(e)}")
 
-    def get_all_stock(self):
-        """Retrieve all stock items"""
+    def create_stock_items(self, items):
+        """Create many stock items, inserted in chunks, reporting per-row errors."""
+        try:
+            valid, errors = validate_rows(items, self.prepare_stock_item)
+            inserted, insert_errors = insert_in_chunks('stock', valid)
+            return {
+                "items": [record for _, record in inserted],
+                "errors": sorted(errors + insert_errors, key=lambda error: error['index'])
+            }
+        except ValueError:
+            raise
+        except Exception as e:
+            raise Exception(f"Error creating stock items: {str(e)}")
+
+    def get_all_stock(self, cursor=None, limit=None):
+        """Retrieve a page of stock items"""
         try:
-            result = supabase.table('stock').select('*').execute()
-            return result.data
+            return fetch_page('stock', 'item_id', cursor, limit)
+        except ValueError:
+            raise
         except Exception as e:
             raise Exception(f"Error retrieving stock items: {str(e)}")
 
+    def export_stock(self, page_size=None):
+        """Yield all stock items, one page at a time."""
+        return iter_pages('stock', 'item_id', page_size)
+
+    def get_stock_changes(self, cursor=None, since=None, limit=None):
+        """Retrieve the stock items inserted, updated or deleted since a cursor or timestamp."""
+        try:
+            return change_feed.changes_since('stock', cursor, since, limit)
+        except ValueError:
+            raise
+        except Exception as e:
+            raise Exception(f"Error retrieving stock changes: {str(e)}")
+
     def get_stock_by_id(self, item_id):
         """Retrieve a specific stock item by ID"""
         try:
-            result = supabase.table('stock').select('*').eq('item_id', item_id).execute()
-            if not result.data:
-                raise ValueError(f"Stock item with ID {item_id} not found")
-            return result.data[0]
+            return record_cache.get_or_load('stock', item_id, lambda: self._load_stock(item_id))
+        except ValueError:
+            raise
         except Exception as e:
             raise Exception(f"Error retrieving stock item: {str(e)}")
 
+    def _load_stock(self, item_id):
+        """Fetch a single stock row from the database."""
+        result = supabase.table('stock').select('*').eq('item_id', item_id).execute()
+        if not result.data:
+            raise ValueError(f"Stock item with ID {item_id} not found")
+        return result.data[0]
+
     def update_stock_item(self, item_id, data):
         """Update an existing stock item"""
         try:
-            # Verify item exists
-            existing_item = self.get_stock_by_id(item_id)
-            
-            # Update margin if price fields are modified
-            if 'selling_price' in data or 'cost_price' in data:
-                selling_price = data.get('selling_price', existing_item['selling_price'])
-                cost_price = data.get('cost_price', existing_item['cost_price'])
-                # data['margin'] = self.calculate_margin(selling_price, cost_price)
-            
+            # A single conditional update, no rows back means the item does not exist
             result = supabase.table('stock').update(data).eq('item_id', item_id).execute()
+            if not result.data:
+                raise ValueError(f"Stock item with ID {item_id} not found")
+
+            notify_write('stock', 'update', result.data)
             return result.data[0]
             
+        except ValueError:
+            raise
         except Exception as e:
             raise Exception(f"Error updating stock item: {str(e)}")
 
     def delete_stock_item(self, item_id):
         """Delete a stock item"""
         try:
-            # Verify item exists
-            self.get_stock_by_id(item_id)  # Will raise ValueError if not found
-            
             result = supabase.table('stock').delete().eq('item_id', item_id).execute()
+            if not result.data:
+                raise ValueError(f"Stock item with ID {item_id} not found")
+
+            notify_write('stock', 'delete', result.data)
             return result.data[0]
             
+        except ValueError:
+            raise
+        except Exception as e:
+            raise Exception(f"Error deleting stock item: {str(e)}")
+
+    # Cleared when the database lacks sql/reserve_stock.sql, until restart
+    atomic_reserve = True
+
+    def reserve_stock(self, item_id, quantity=1):
+        """Take units out of a stock item, safe against other counters selling it at once."""
+        try:
+            return self._adjust_stock(item_id, self._units(quantity))
+        except ValueError:
+            raise
         except Exception as e:
-            raise Exception(f"Error deleting stock item: {str(e)}")
\ No newline at end of file
+            raise Exception(f"Error reserving stock: {str(e)}")
+
+    def release_stock(self, item_id, quantity=1):
+        """Put reserved units back, e.g. when the sale they were taken for failed."""
+        try:
+            return self._adjust_stock(item_id, -self._units(quantity))
+        except ValueError:
+            raise
+        except Exception as e:
+            raise Exception(f"Error releasing stock: {str(e)}")
+
+    @staticmethod
+    def _units(quantity):
+        """Whole number of units to move, ValueError otherwise."""
+        if isinstance(quantity, bool) or not str(quantity).isdigit() or int(quantity) < 1:
+            raise ValueError(f"Invalid quantity: {quantity}")
+        return int(quantity)
+
+    def _adjust_stock(self, item_id, amount):
+        """Take `amount` units (negative puts them back) with one atomic call when possible."""
+        if StockManager.atomic_reserve:
+            try:
+                result = supabase.rpc('reserve_stock', {'stock_item_id': item_id, 'amount': amount}).execute()
+            except Exception as e:
+                if not missing_function(e):
+                    raise
+                StockManager.atomic_reserve = False
+            else:
+                if not result.data:
+                    self._raise_short(item_id, amount)
+                notify_write('stock', 'update', result.data)
+                return result.data[0]
+        return self._adjust_stock_optimistic(item_id, amount)
+
+    def _adjust_stock_optimistic(self, item_id, amount):
+        """
+        Read the quantity, then update only if it is still the same.
+
+        The quantity works as the row's version: a counter that lost the race
+        updates no row and tries again on the fresh quantity, backing off with
+        jitter, so concurrent sales neither oversell nor wait on a lock.
+        """
+        for attempt in range(STOCK_RESERVE_RETRIES):
+            current = self._load_stock(item_id)
+            quantity = current.get('quantity')
+            if quantity is None:
+                # eq('quantity', ...) never matches NULL, so the update could only retry
+                raise ValueError(f"Stock item {item_id} has no quantity recorded")
+            if quantity < amount:
+                self._raise_short(item_id, amount, current)
+            remaining = quantity - amount
+            result = supabase.table('stock').update({'quantity': remaining, 'sold': remaining <= 0}) \
+                .eq('item_id', item_id).eq('quantity', quantity).execute()
+            if result.data:
+                notify_write('stock', 'update', result.data)
+                return result.data[0]
+            time.sleep(STOCK_RESERVE_BACKOFF * (2 ** attempt) * random.uniform(0.5, 1.5))
+        raise Exception(f"Stock item {item_id} changed {STOCK_RESERVE_RETRIES} times while reserving, try again")
+
+    def _raise_short(self, item_id, amount, current=None):
+        """Explain why no units could be taken: the item is missing or has too few."""
+        current = current or self._load_stock(item_id)
+        if current.get('quantity') is None:
+            raise ValueError(f"Stock item {item_id} has no quantity recorded")
+        raise ValueError(
+            f"Stock item {item_id} has {current.get('quantity') or 0} units left, {amount} requested"
+        )
@@ -0,0 +1,248 @@
+"""
+Inventory report: margin by vendor, size and item, stock aging, unsold value
+and low-stock alerts.
+
+Only the columns the report needs are fetched, into one pyarrow table, and
+every figure is computed with pyarrow compute kernels and group_by rather
+than a Python loop over the rows. The table is kept in memory, and before
+each report the stock rows changed since are read from the change feed and
+merged into it, so writes from any worker or from Supabase show up at once
+while a report after a sale reruns the kernels without fetching the table.
+"""
+import threading
+from datetime import date
+from concurrent.futures import ThreadPoolExecutor
+from config import supabase, LOW_STOCK_THRESHOLD, STOCK_REPORT_FETCH_WORKERS
+from services.changes import change_feed
+from services.pagination import iter_pages, resolve_page_size
+
+STOCK_COLUMNS = 'item_id, vendor_id, item_name, size, quantity, cost_price, selling_price, order_date, sold'
+
+# Upper bounds (days since order_date, inclusive) of the aging buckets; the last bucket is open
+AGING_BOUNDS = (30, 60, 90, 180)
+
+MARGIN_DIMENSIONS = ('vendor_id', 'size', 'item_name')
+
+# Fetches disjoint item_id ranges of the stock table side by side on a cold report
+_fetch_pool = ThreadPoolExecutor(max_workers=STOCK_REPORT_FETCH_WORKERS)
+
+# Projected stock table and the change feed cursor it is current up to
+_snapshot = {'table': None, 'cursor': None}
+_snapshot_lock = threading.Lock()
+
+def stock_report(low_stock_threshold=None, limit=None, today=None):
+    """
+    Return the inventory report for the whole stock table.
+
+    Unsold rows (sold is false) are the stock on hand: their quantity counts
+    towards the unsold totals and the aging buckets, and those with at most
+    `low_stock_threshold` units are listed as low-stock alerts, lowest first,
+    up to `limit` of them.
+    """
+    threshold = _threshold(low_stock_threshold)
+    alert_limit = resolve_page_size(limit)
+    today = today or date.today()
+
+    try:
+        import pyarrow as pa
+        import pyarrow.compute as pc
+    except ImportError:
+        raise Exception("Stock analytics require the pyarrow package")
+
+    data = _stock_table(pa, pc)
+    quantity = pc.fill_null(data['quantity'], 0)
+    cost = pc.fill_null(data['cost_price'], 0.0)
+    selling = pc.fill_null(data['selling_price'], 0.0)
+    unsold = pc.invert(pc.fill_null(data['sold'], False))
+    on_hand = pc.if_else(unsold, quantity, 0)
+    margin = pc.subtract(selling, cost)
+
+    frame = pa.table({
+        'vendor_id': data['vendor_id'],
+        'size': data['size'],
+        'item_name': data['item_name'],
+        'margin': margin,
+        'selling_price': selling,
+        'unsold': pc.cast(unsold, pa.int64()),
+        'on_hand': on_hand,
+        'on_hand_cost': pc.multiply(on_hand, cost),
+        'on_hand_value': pc.multiply(on_hand, selling),
+        'on_hand_margin': pc.multiply(on_hand, margin),
+        'age_bucket': _age_buckets(pa, pc, data['order_date'], today)
+    })
+
+    return {
+        "as_of": today.isoformat(),
+        "summary": _summary(pc, frame),
+        "margin_by": {column: _margin_by(pc, frame, column) for column in MARGIN_DIMENSIONS},
+        "aging": _aging(pc, frame),
+        "low_stock": _low_stock(pc, data, unsold, quantity, threshold, alert_limit)
+    }
+
+def _threshold(value):
+    if value is None or value == '':
+        return LOW_STOCK_THRESHOLD
+    try:
+        threshold = int(value)
+    except (TypeError, ValueError):
+        raise ValueError(f"Invalid low_stock threshold: {value}")
+    if threshold < 0:
+        raise ValueError(f"Invalid low_stock threshold: {value}")
+    return threshold
+
+def _stock_table(pa, pc):
+    """Return the projected stock table with the changes since the last report merged in."""
+    schema = pa.schema([
+        ('item_id', pa.int64()),
+        ('vendor_id', pa.int64()),
+        ('item_name', pa.string()),
+        ('size', pa.string()),
+        ('quantity', pa.int64()),
+        ('cost_price', pa.float64()),
+        ('selling_price', pa.float64()),
+        ('order_date', pa.string()),
+        ('sold', pa.bool_())
+    ])
+    with _snapshot_lock:
+        if _snapshot['table'] is None:
+            # Taken first, so a write made during the fetch is merged again rather than missed
+            cursor = change_feed.head_cursor('stock')
+            _snapshot['table'] = _fetch_stock(pa, schema)
+            _snapshot['cursor'] = cursor
+        upserted, deleted, _snapshot['cursor'] = change_feed.pull_changes('stock', _snapshot['cursor'])
+        if upserted or deleted:
+            changes = {row['item_id']: row for row in upserted}
+            changes.update((item_id, None) for item_id in deleted)
+            _snapshot['table'] = _merge(pa, pc, schema, _snapshot['table'], changes)
+        return _snapshot['table']
+
+def _fetch_stock(pa, schema):
+    """
+    Fetch the report columns of every stock row into one table.
+
+    The item_id range is split into one slice per worker and the slices are
+    paged through concurrently, so a cold report waits for about
+    1/STOCK_REPORT_FETCH_WORKERS of the round trips a single scan would make.
+    """
+    def edge(descending):
+        rows = supabase.table('stock').select('item_id').order('item_id', desc=descending).limit(1).execute().data
+        return rows[0]['item_id'] if rows else None
+
+    low, high = [lookup.result() for lookup in (_fetch_pool.submit(edge, False), _fetch_pool.submit(edge, True))]
+    if low is None:
+        return schema.empty_table()
+
+    step = (high - low) // STOCK_REPORT_FETCH_WORKERS + 1
+    bounds = [
+        [('gte', 'item_id', start), ('lt', 'item_id', start + step)]
+        for start in range(low, high + 1, step)
+    ]
+
+    def fetch_slice(filters):
+        pages = iter_pages('stock', 'item_id', columns=STOCK_COLUMNS, filters=filters)
+        return [pa.Table.from_pylist(rows, schema=schema) for rows in pages if rows]
+
+    slices = [table for tables in _fetch_pool.map(fetch_slice, bounds) for table in tables]
+    return pa.concat_tables(slices or [schema.empty_table()]).combine_chunks()
+
+def _merge(pa, pc, schema, table, changes):
+    """Replace the rows of the changed item_ids with their written versions, dropping deleted ones."""
+    written = [row for row in changes.values() if row is not None]
+    kept = table.filter(pc.invert(pc.is_in(table['item_id'], pa.array(list(changes), pa.int64()))))
+    return pa.concat_tables([kept, pa.Table.from_pylist(written, schema=schema)]).combine_chunks()
+
+def _age_buckets(pa, pc, order_dates, today):
+    """Index into AGING_BOUNDS of each row's age in days, -1 when it has no valid order date."""
+    parsed = pc.strptime(pc.utf8_slice_codeunits(order_dates, 0, 10), format='%Y-%m-%d', unit='s', error_is_null=True)
+    days = pc.cast(pc.cast(parsed, pa.date32()), pa.int32())
+    age = pc.subtract(pa.scalar((today - date(1970, 1, 1)).days, pa.int32()), days)
+    bucket = pa.scalar(0, pa.int32())
+    for bound in AGING_BOUNDS:
+        bucket = pc.add(bucket, pc.cast(pc.greater(age, bound), pa.int32()))
+    return pc.fill_null(bucket, -1)
+
+def _summary(pc, frame):
+    def total(column):
+        return pc.sum(frame[column]).as_py() or 0
+
+    return {
+        "items": frame.num_rows,
+        "unsold_items": total('unsold'),
+        "unsold_units": total('on_hand'),
+        "unsold_cost": round(total('on_hand_cost'), 2),
+        "unsold_value": round(total('on_hand_value'), 2),
+        "unsold_margin": round(total('on_hand_margin'), 2)
+    }
+
+def _margin_by(pc, frame, column):
+    """Margin of every value of `column`, highest margin on hand first."""
+    grouped = frame.group_by(column).aggregate([
+        ([], 'count_all'),
+        ('margin', 'mean'),
+        ('margin', 'sum'),
+        ('selling_price', 'sum'),
+        ('on_hand', 'sum'),
+        ('on_hand_margin', 'sum')
+    ])
+    margin_pct = pc.if_else(
+        pc.greater(grouped['selling_price_sum'], 0),
+        pc.multiply(pc.divide(grouped['margin_sum'], grouped['selling_price_sum']), 100),
+        0.0
+    )
+    grouped = grouped.append_column('margin_pct', margin_pct).sort_by([
+        ('on_hand_margin_sum', 'descending'), ('margin_mean', 'descending')
+    ])
+    return [
+        {
+            column: row[column],
+            "items": row['count_all'],
+            "avg_margin": round(row['margin_mean'] or 0, 2),
+            "margin_pct": round(row['margin_pct'], 2),
+            "unsold_units": row['on_hand_sum'],
+            "unsold_margin": round(row['on_hand_margin_sum'], 2)
+        }
+        for row in grouped.to_pylist()
+    ]
+
+def _aging(pc, frame):
+    """Units and value on hand per aging bucket, oldest last, undated stock at the end."""
+    on_hand = frame.filter(pc.greater(frame['on_hand'], 0))
+    grouped = on_hand.group_by('age_bucket').aggregate([
+        ([], 'count_all'),
+        ('on_hand', 'sum'),
+        ('on_hand_cost', 'sum'),
+        ('on_hand_value', 'sum')
+    ])
+    found = {row['age_bucket']: row for row in grouped.to_pylist()}
+
+    labels = []
+    lower = 0
+    for bound in AGING_BOUNDS:
+        labels.append(f"{lower}-{bound}")
+        lower = bound + 1
+    labels.append(f"{lower}+")
+
+    buckets = []
+    for index, label in list(enumerate(labels)) + [(-1, 'unknown')]:
+        row = found.get(index)
+        if row is None and index == -1:
+            continue
+        buckets.append({
+            "age_days": label,
+            "items": row['count_all'] if row else 0,
+            "units": row['on_hand_sum'] if row else 0,
+            "cost": round(row['on_hand_cost_sum'], 2) if row else 0.0,
+            "value": round(row['on_hand_value_sum'], 2) if row else 0.0
+        })
+    return buckets
+
+def _low_stock(pc, data, unsold, quantity, threshold, limit):
+    """Unsold items with at most `threshold` units, fewest first."""
+    low = data.filter(pc.and_(unsold, pc.less_equal(quantity, threshold)))
+    items = low.sort_by([('quantity', 'ascending'), ('item_id', 'ascending')]).slice(0, limit)
+    return {
+        "threshold": threshold,
+        "count": low.num_rows,
+        "items": items.select(['item_id', 'vendor_id', 'item_name', 'size', 'quantity', 'order_date']).to_pylist()
+    }
+
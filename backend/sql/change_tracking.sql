@@ -0,0 +1,108 @@
+-- Change tracking behind the delta-sync feeds (services/changes.py).
+-- Every table gets an updated_at stamped on insert and update, and every
+-- delete leaves a tombstone in deleted_rows, whether the write came from any
+-- API worker or straight from the Supabase dashboard. Run once in the
+-- Supabase SQL editor. Tombstones older than the oldest cursor a client still
+-- polls with can be deleted.
+--
+-- Both stamps are taken when the row is written, not when its transaction
+-- commits; the feeds stay CHANGE_FEED_LAG seconds behind them, so keep write
+-- transactions shorter than that.
+
+create table if not exists deleted_rows (
+    change_id bigserial primary key,
+    table_name text not null,
+    row_id bigint not null,
+    deleted_at timestamptz not null default clock_timestamp()
+);
+-- The feeds page through (deleted_at, change_id) within a table
+drop index if exists deleted_rows_table_idx;
+drop index if exists deleted_rows_deleted_at_idx;
+create index if not exists deleted_rows_position_idx on deleted_rows (table_name, deleted_at, change_id);
+
+create or replace function touch_updated_at()
+returns trigger
+language plpgsql
+as $$
+begin
+    new.updated_at := clock_timestamp();
+    return new;
+end;
+$$;
+
+-- tg_argv[0] names the primary key column of the table
+create or replace function record_deleted_row()
+returns trigger
+language plpgsql
+as $$
+begin
+    insert into deleted_rows (table_name, row_id)
+    values (tg_table_name, (to_jsonb(old) ->> tg_argv[0])::bigint);
+    return old;
+end;
+$$;
+
+alter table stock add column if not exists updated_at timestamptz not null default clock_timestamp();
+alter table sales add column if not exists updated_at timestamptz not null default clock_timestamp();
+alter table stitching add column if not exists updated_at timestamptz not null default clock_timestamp();
+alter table billing add column if not exists updated_at timestamptz not null default clock_timestamp();
+
+-- The feeds page through (updated_at, primary key)
+create index if not exists stock_updated_at_idx on stock (updated_at, item_id);
+create index if not exists sales_updated_at_idx on sales (updated_at, item_id);
+create index if not exists stitching_updated_at_idx on stitching (updated_at, stitching_id);
+create index if not exists billing_updated_at_idx on billing (updated_at, bill_id);
+
+drop trigger if exists stock_touch on stock;
+create trigger stock_touch before insert or update on stock
+    for each row execute function touch_updated_at();
+drop trigger if exists sales_touch on sales;
+create trigger sales_touch before insert or update on sales
+    for each row execute function touch_updated_at();
+drop trigger if exists stitching_touch on stitching;
+create trigger stitching_touch before insert or update on stitching
+    for each row execute function touch_updated_at();
+drop trigger if exists billing_touch on billing;
+create trigger billing_touch before insert or update on billing
+    for each row execute function touch_updated_at();
+
+drop trigger if exists stock_tombstone on stock;
+create trigger stock_tombstone after delete on stock
+    for each row execute function record_deleted_row('item_id');
+drop trigger if exists sales_tombstone on sales;
+create trigger sales_tombstone after delete on sales
+    for each row execute function record_deleted_row('item_id');
+drop trigger if exists stitching_tombstone on stitching;
+create trigger stitching_tombstone after delete on stitching
+    for each row execute function record_deleted_row('stitching_id');
+drop trigger if exists billing_tombstone on billing;
+create trigger billing_tombstone after delete on billing
+    for each row execute function record_deleted_row('bill_id');
+
+-- Newest updated_at and newest tombstone of one table in a single round trip,
+-- read by the ETags of the list routes (services/etags.py)
+create or replace function change_head(target_table text)
+returns json
+language plpgsql
+stable
+as $$
+declare
+    newest timestamptz;
+    tombstone deleted_rows;
+begin
+    if target_table not in ('stock', 'sales', 'stitching', 'billing') then
+        raise exception 'Table % is not change tracked', target_table;
+    end if;
+    execute format('select max(updated_at) from %I', target_table) into newest;
+    select * into tombstone
+    from deleted_rows
+    where table_name = target_table
+    order by deleted_at desc, change_id desc
+    limit 1;
+    return json_build_object(
+        'updated_at', newest,
+        'deleted_at', tombstone.deleted_at,
+        'change_id', tombstone.change_id
+    );
+end;
+$$;
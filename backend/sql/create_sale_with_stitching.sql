@@ -0,0 +1,32 @@
+-- Create a sale and its stitching order in one call and one transaction.
+-- Used by SalesManager.create_sale via supabase.rpc('create_sale_with_stitching')
+-- when the sale needs stitching. Run once in the Supabase SQL editor.
+--
+-- `sale_data` holds the sales columns, `stitching_data` the stitching columns except
+-- item_id, which is taken from the new sale. Returns {"sale": ..., "stitching": ...}.
+
+create or replace function create_sale_with_stitching(sale_data jsonb, stitching_data jsonb)
+returns jsonb
+language plpgsql
+as $$
+declare
+    new_sale sales;
+    new_stitching stitching;
+begin
+    insert into sales (item_name, cost_price, selling_price, mode, cust_name, order_date,
+                       expected_date, stitching, shipping, cust_address, additional_details)
+    select item_name, cost_price, selling_price, mode, cust_name, order_date,
+           expected_date, coalesce(r.stitching, true), shipping, cust_address, additional_details
+    from jsonb_populate_record(null::sales, sale_data) r
+    returning * into new_sale;
+
+    insert into stitching (item_id, item_name, cust_name, stitching_preference, tailor_price,
+                           selling_price, order_date, expected_date, additional_details)
+    select new_sale.item_id, item_name, cust_name, stitching_preference, tailor_price,
+           selling_price, order_date, expected_date, additional_details
+    from jsonb_populate_record(null::stitching, stitching_data) r
+    returning * into new_stitching;
+
+    return jsonb_build_object('sale', to_jsonb(new_sale), 'stitching', to_jsonb(new_stitching));
+end;
+$$;
@@ -0,0 +1,21 @@
+-- Take units out of a stock item in one atomic statement.
+-- Used by StockManager.reserve_stock via supabase.rpc('reserve_stock'), also
+-- for the stock behind a sale (SalesManager.create_sale). Run once in the
+-- Supabase SQL editor.
+--
+-- The row is only updated while it still has `amount` units, so two counters
+-- selling the same item can never take the last unit twice. Returns the
+-- updated row, or no row when the item is missing or short. A negative
+-- amount puts units back.
+
+create or replace function reserve_stock(stock_item_id bigint, amount integer)
+returns setof stock
+language sql
+as $$
+    update stock
+    set quantity = quantity - amount,
+        sold = quantity - amount <= 0
+    where item_id = stock_item_id
+      and quantity >= amount
+    returning *;
+$$;
@@ -0,0 +1,25 @@
+-- Indexes behind the filters, sorting and prefix search of the sales and
+-- stitching lists (services/search.py). Run once in the Supabase SQL editor.
+
+-- Sorted pages are ordered by (column, primary key)
+create index if not exists sales_order_date_idx on sales (order_date, item_id);
+create index if not exists sales_expected_date_idx on sales (expected_date, item_id);
+create index if not exists sales_cust_name_idx on sales (cust_name, item_id);
+create index if not exists sales_item_name_idx on sales (item_name, item_id);
+create index if not exists sales_mode_idx on sales (mode);
+
+create index if not exists stitching_order_date_idx on stitching (order_date, stitching_id);
+create index if not exists stitching_expected_date_idx on stitching (expected_date, stitching_id);
+create index if not exists stitching_cust_name_idx on stitching (cust_name, stitching_id);
+create index if not exists stitching_item_name_idx on stitching (item_name, stitching_id);
+
+-- Case-insensitive prefix search (ilike 'term%')
+create extension if not exists pg_trgm;
+create index if not exists sales_cust_name_trgm_idx on sales using gin (cust_name gin_trgm_ops);
+create index if not exists sales_item_name_trgm_idx on sales using gin (item_name gin_trgm_ops);
+create index if not exists stitching_cust_name_trgm_idx on stitching using gin (cust_name gin_trgm_ops);
+create index if not exists stitching_item_name_trgm_idx on stitching using gin (item_name gin_trgm_ops);
+
+-- Bills of a customer's sales and stitching orders (services/customers.py)
+create index if not exists billing_item_id_idx on billing (item_id);
+create index if not exists billing_stitching_id_idx on billing (stitching_id);
@@ -0,0 +1,97 @@
+-- Schema for the embedded SQLite storage engine (STORAGE_ENGINE=sqlite).
+-- Mirrors the Supabase tables the managers use; applied on first connection.
+-- The engine stamps updated_at and writes deleted_rows itself, like the
+-- triggers of sql/change_tracking.sql.
+
+create table if not exists stock (
+    item_id integer primary key autoincrement,
+    vendor_id integer,
+    item_name text,
+    size text,
+    quantity integer,
+    cost_price numeric,
+    selling_price numeric,
+    margin numeric generated always as (selling_price - cost_price) virtual,
+    order_date text,
+    sold boolean default 0,
+    updated_at text
+);
+
+create table if not exists sales (
+    item_id integer primary key autoincrement,
+    item_name text,
+    cost_price numeric,
+    selling_price numeric,
+    margin numeric generated always as (selling_price - cost_price) virtual,
+    mode text,
+    cust_name text,
+    order_date text,
+    expected_date text,
+    stitching boolean default 0,
+    shipping text,
+    cust_address text,
+    additional_details text,
+    updated_at text
+);
+
+create table if not exists stitching (
+    stitching_id integer primary key autoincrement,
+    item_id integer,
+    item_name text,
+    cust_name text,
+    stitching_preference text,
+    tailor_price numeric,
+    selling_price numeric,
+    order_date text,
+    expected_date text,
+    additional_details text,
+    updated_at text
+);
+
+create table if not exists billing (
+    bill_id integer primary key autoincrement,
+    item_id integer,
+    total_amount numeric,
+    bill_date text,
+    stitching_id integer,
+    updated_at text
+);
+
+create table if not exists deleted_rows (
+    change_id integer primary key autoincrement,
+    table_name text not null,
+    row_id integer not null,
+    deleted_at text not null
+);
+
+create index if not exists stock_order_date_idx on stock (order_date);
+create index if not exists sales_order_date_idx on sales (order_date);
+create index if not exists sales_expected_date_idx on sales (expected_date);
+create index if not exists stitching_item_id_idx on stitching (item_id);
+create index if not exists stitching_order_date_idx on stitching (order_date);
+create index if not exists stitching_expected_date_idx on stitching (expected_date);
+-- Sorting and prefix search of the sales and stitching lists
+create index if not exists sales_cust_name_idx on sales (cust_name collate nocase);
+create index if not exists sales_item_name_idx on sales (item_name collate nocase);
+create index if not exists stitching_cust_name_idx on stitching (cust_name collate nocase);
+create index if not exists stitching_item_name_idx on stitching (item_name collate nocase);
+create index if not exists billing_item_id_idx on billing (item_id);
+create index if not exists billing_stitching_id_idx on billing (stitching_id);
+create index if not exists billing_bill_date_idx on billing (bill_date);
+-- Change feeds (services/changes.py)
+create index if not exists stock_updated_at_idx on stock (updated_at, item_id);
+create index if not exists sales_updated_at_idx on sales (updated_at, item_id);
+create index if not exists stitching_updated_at_idx on stitching (updated_at, stitching_id);
+create index if not exists billing_updated_at_idx on billing (updated_at, bill_id);
+-- The feeds page through (deleted_at, change_id) within a table
+drop index if exists deleted_rows_table_idx;
+drop index if exists deleted_rows_deleted_at_idx;
+create index if not exists deleted_rows_position_idx on deleted_rows (table_name, deleted_at, change_id);
+
+create view if not exists monthly_sales as
+    select substr(order_date, 1, 7) as month,
+           count(*) as total_orders,
+           sum(selling_price) as total_sales
+    from sales
+    group by substr(order_date, 1, 7)
+    order by month;
@@ -0,0 +1,21 @@
+-- Dashboard summary metrics computed inside the database.
+-- Used by HomeAnalytics.get_summary_metrics via supabase.rpc('summary_metrics').
+-- Run once in the Supabase SQL editor.
+
+create or replace function summary_metrics()
+returns table (
+    total_sales bigint,
+    total_stitching_orders bigint,
+    total_revenue numeric
+)
+language sql
+stable
+as $$
+    select
+        s.cnt as total_sales,
+        t.cnt as total_stitching_orders,
+        coalesce(s.revenue, 0) + coalesce(t.revenue, 0) as total_revenue
+    from
+        (select count(*) as cnt, sum(selling_price) as revenue from sales) s,
+        (select count(*) as cnt, sum(selling_price) as revenue from stitching) t;
+$$;
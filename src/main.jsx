@@ -1,8 +1,66 @@
 import { StrictMode } from 'react'
 import { createRoot } from 'react-dom/client'
+import axios from 'axios'
 import './index.css'
 import App from './App.jsx'
 
+// The API verifies the Supabase access token on every request
+axios.interceptors.request.use((config) => {
+  const token = localStorage.getItem('access_token')
+  if (token) {
+    config.headers.Authorization = `Bearer ${token}`
+  }
+  return config
+})
+
+const REFRESH_URL = `${import.meta.env.VITE_BACKEND_URL || ''}/api/auth/refresh`
+
+// Shared by every request that fails while a refresh is in flight
+let refreshing = null
+
+const refreshSession = async () => {
+  const refreshToken = localStorage.getItem('refresh_token')
+  if (!refreshToken) {
+    throw new Error('No refresh token')
+  }
+  const response = await axios.post(REFRESH_URL, { refresh_token: refreshToken }, { skipAuthRefresh: true })
+  localStorage.setItem('access_token', response.data.session.access_token)
+  localStorage.setItem('refresh_token', response.data.session.refresh_token)
+}
+
+const logoutToLogin = () => {
+  localStorage.removeItem('access_token')
+  localStorage.removeItem('refresh_token')
+  localStorage.removeItem('user_email')
+  localStorage.removeItem('user_id')
+  if (window.location.pathname !== '/login') {
+    window.location.assign('/login')
+  }
+}
+
+// An expired access token is refreshed once and the request retried; otherwise back to login
+axios.interceptors.response.use(
+  (response) => response,
+  async (error) => {
+    const { config, response } = error
+    if (response?.status !== 401 || !config || config.skipAuthRefresh) {
+      return Promise.reject(error)
+    }
+    if (config.retriedAfterRefresh) {
+      logoutToLogin()
+      return Promise.reject(error)
+    }
+    try {
+      refreshing = refreshing || refreshSession().finally(() => { refreshing = null })
+      await refreshing
+    } catch {
+      logoutToLogin()
+      return Promise.reject(error)
+    }
+    return axios({ ...config, retriedAfterRefresh: true })
+  }
+)
+
 createRoot(document.getElementById('root')).render(
   <StrictMode>
     <App />
@@ -47,6 +47,7 @@ export default function Login() {
 
       // ✅ Store user details in localStorage
       localStorage.setItem("access_token", data.session.access_token);
+      localStorage.setItem("refresh_token", data.session.refresh_token);
       localStorage.setItem("user_email", data.user.email);
       localStorage.setItem("user_id", data.user.id);
 
@@ -3,6 +3,7 @@ import axios from "axios";
 import { toast } from "sonner";
 import Table from "../components/Table";
 import Modal from "../components/Modal";
+import fetchAllPages from "../utils/fetchAllPages";
 
 const API_URL = `${import.meta.env.VITE_BACKEND_URL || ""}/api/sales`;
 
@@ -41,10 +42,8 @@ const SalesPage = () => {
   // Fetch sales data
   const fetchSales = () => {
     setLoading(true);
-    axios
-      .get(API_URL)
-      .then((response) => {
-        const salesData = response.data.data || [];
+    fetchAllPages(API_URL)
+      .then((salesData) => {
         // Sort by order_date in descending order (newest first)
         const sortedSales = salesData.sort(
           (a, b) => new Date(b.order_date) - new Date(a.order_date)
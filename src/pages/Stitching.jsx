@@ -3,6 +3,7 @@ import axios from "axios";
 import { toast } from "sonner";
 import Table from "../components/Table";
 import Modal from "../components/Modal";
+import fetchAllPages from "../utils/fetchAllPages";
 
 const API_URL = `${import.meta.env.VITE_BACKEND_URL || ""}/api/stitching`;
 
@@ -58,10 +59,8 @@ const StitchingPage = () => {
   // Fetch stitching orders data
   const fetchStitchingOrders = () => {
     setLoading(true);
-    axios
-      .get(API_URL)
-      .then((response) => {
-        const ordersData = response.data.data || [];
+    fetchAllPages(API_URL)
+      .then((ordersData) => {
         // Sort by order_date in descending order (newest first)
         const sortedOrders = ordersData.sort(
           (a, b) => new Date(b.order_date) - new Date(a.order_date)
@@ -0,0 +1,19 @@
+import axios from "axios";
+
+// The list endpoints return one page at a time; follow next_cursor until the last page
+const PAGE_SIZE = 1000;
+
+const fetchAllPages = async (url) => {
+  const rows = [];
+  let cursor = null;
+  do {
+    const params = { limit: PAGE_SIZE };
+    if (cursor !== null) params.cursor = cursor;
+    const response = await axios.get(url, { params });
+    rows.push(...(response.data.data || []));
+    cursor = response.data.next_cursor ?? null;
+  } while (cursor !== null);
+  return rows;
+};
+
+export default fetchAllPages;